@@ -0,0 +1,56 @@
+"""
+Tamanho e custo de parse dos detalhes de um filme: documento completo do TMDb (credits,
+watch/providers e release_dates de todos os países) contra a projeção que
+/api/tmdb/movie/<id>/ devolve (ver favorites/projections.py).
+
+Usa os documentos do TMDb falso; `--fixture` aceita um JSON real salvo de
+/movie/{id}?append_to_response=credits,watch/providers,release_dates.
+
+Uso:
+    python -m benchmarks.detail_projection --movies 200
+"""
+import argparse
+import json
+import os
+import time
+
+
+def measure(documents, repeat):
+    payloads = [json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode() for document in documents]
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            json.loads(payload)
+        best = min(best, time.perf_counter() - start)
+    return sum(map(len, payloads)) / len(payloads), best / len(payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixture', help='JSON de detalhes salvo do TMDb real')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from benchmarks.fake_tmdb import movie_detail
+    from favorites.projections import project_movie_detail
+
+    if args.fixture:
+        with open(args.fixture, encoding='utf-8') as fixture:
+            documents = [json.load(fixture)]
+    else:
+        documents = [movie_detail(movie_id) for movie_id in range(1, args.movies + 1)]
+    projected = [project_movie_detail(document) for document in documents]
+
+    print(f"{'formato':<12} {'bytes/filme':>12} {'parse µs':>10}")
+    for name, docs in (('completo', documents), ('projeção', projected)):
+        size, parse_time = measure(docs, args.repeat)
+        print(f"{name:<12} {size:>12.0f} {parse_time * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
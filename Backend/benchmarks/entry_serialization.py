@@ -0,0 +1,79 @@
+"""
+Linhas/s da serialização das listas do usuário: UserMovieEntrySerializer (ModelSerializer,
+com instâncias e select_related) contra o caminho rápido de /api/movies/ e da lista
+pública (.values() + UserMovieEntryRowSerializer + FastJSONRenderer).
+
+Cria um banco de teste com `--rows` entradas para um usuário, confere que os dois caminhos
+geram exatamente os mesmos bytes e mede cada um (consulta + serialização + JSON).
+
+Uso:
+    python -m benchmarks.entry_serialization --rows 5000 --repeat 5
+"""
+import argparse
+import os
+import time
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5, help='execuções por caminho (vale a mais rápida)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.renderers import JSONRenderer
+
+    from favorites.models import Movie, User, UserMovieEntry
+    from favorites.renderers import FastJSONRenderer, orjson
+    from favorites.serializers import UserMovieEntryRowSerializer, UserMovieEntrySerializer
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = User.objects.create(id='benchmark', email='benchmark@exemplo.com', name='Benchmark')
+        Movie.objects.bulk_create([
+            Movie(tmdb_id=i, title=f"Filme nº {i} — edição", poster_path=None if i % 10 == 0 else f"/p{i}.jpg",
+                  vote_average=(i % 100) / 10)
+            for i in range(1, args.rows + 1)
+        ], batch_size=1000)
+        UserMovieEntry.objects.bulk_create([
+            UserMovieEntry(user=user, movie_id=i, is_favorite=i % 2 == 0,
+                           is_watch_later=i % 3 == 0, is_watched=i % 3 == 1)
+            for i in range(1, args.rows + 1)
+        ], batch_size=1000)
+        entries = UserMovieEntry.objects.filter(user=user).order_by('-added_at', '-id')
+
+        def model_serializer():
+            return JSONRenderer().render(UserMovieEntrySerializer(entries.select_related('movie'), many=True).data)
+
+        def row_serializer():
+            rows = UserMovieEntryRowSerializer()
+            return FastJSONRenderer().render(rows.many(rows.values(entries).iterator(chunk_size=2000)))
+
+        model_time, model_output = best_of(args.repeat, model_serializer)
+        row_time, row_output = best_of(args.repeat, row_serializer)
+        assert model_output == row_output, "os dois caminhos geraram JSON diferente"
+
+        print(f"{args.rows} linhas, {len(row_output) / 1024:.0f} KiB, orjson {'sim' if orjson else 'não'}")
+        print(f"{'caminho':<22} {'ms':>9} {'linhas/s':>12}")
+        for name, elapsed in (('ModelSerializer', model_time), ('values() + linhas', row_time)):
+            print(f"{name:<22} {elapsed * 1000:>9.1f} {args.rows / elapsed:>12.0f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
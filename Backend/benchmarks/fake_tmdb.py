@@ -0,0 +1,289 @@
+"""
+Servidor HTTP local que imita a API v3 do TMDb, para benchmarks e testes sem rede.
+
+Responde com as fixtures gravadas em FIXTURES_DIR quando existem (ex: /3/movie/popular ->
+fixtures/movie/popular.json; /3/movie/popular?page=2 -> fixtures/movie/popular.page2.json) e, para o resto, gera respostas sintéticas determinísticas
+no mesmo formato do TMDb. Latência e taxa de erros são configuráveis.
+
+Uso:
+    python -m benchmarks.fake_tmdb --port 9000 --latency 0.1
+    TMDB_BASE_URL=http://127.0.0.1:9000/3 python manage.py runserver
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+PAGE_SIZE = 20
+TOTAL_PAGES = 500
+GENRES = [
+    (28, "Ação"), (12, "Aventura"), (16, "Animação"), (35, "Comédia"), (80, "Crime"),
+    (99, "Documentário"), (18, "Drama"), (10751, "Família"), (14, "Fantasia"), (36, "História"),
+    (27, "Terror"), (10402, "Música"), (9648, "Mistério"), (10749, "Romance"), (878, "Ficção científica"),
+    (53, "Thriller"), (10752, "Guerra"), (37, "Faroeste"),
+]
+PROVIDERS = [(8, "Netflix"), (119, "Amazon Prime Video"), (337, "Disney Plus"), (1899, "Max"), (307, "Globoplay")]
+WORDS = ["noite", "cidade", "última", "missão", "coração", "estrela", "sombra", "viagem", "ação", "sonho"]
+
+
+def movie_summary(movie_id):
+    rnd = random.Random(movie_id)
+    year = 1980 + movie_id % 45
+    title = f"{WORDS[movie_id % len(WORDS)].capitalize()} {WORDS[(movie_id // 7) % len(WORDS)]} {movie_id}"
+    return {
+        "adult": False,
+        "backdrop_path": f"/backdrop{movie_id}.jpg",
+        "genre_ids": sorted({GENRES[movie_id % len(GENRES)][0], GENRES[(movie_id * 7) % len(GENRES)][0]}),
+        "id": movie_id,
+        "original_language": "en",
+        "original_title": f"Original {title}",
+        "overview": f"Sinopse do filme {title}. " * 3,
+        "popularity": round(rnd.uniform(1, 5000), 3),
+        "poster_path": f"/poster{movie_id}.jpg",
+        "release_date": f"{year}-{1 + movie_id % 12:02d}-{1 + movie_id % 28:02d}",
+        "title": title,
+        "video": False,
+        "vote_average": round(rnd.uniform(3, 9), 1),
+        "vote_count": rnd.randint(0, 30000),
+    }
+
+
+def movie_detail(movie_id):
+    movie = movie_summary(movie_id)
+    movie.pop("genre_ids")
+    movie.update({
+        "genres": [{"id": gid, "name": name} for gid, name in GENRES if gid in movie_summary(movie_id)["genre_ids"]],
+        "runtime": 80 + movie_id % 100,
+        "status": "Released",
+        "tagline": "",
+        "credits": {
+            "cast": [
+                {"id": movie_id * 100 + i, "name": f"Ator {i}", "character": f"Personagem {i}",
+                 "order": i, "profile_path": f"/p{movie_id}_{i}.jpg"}
+                for i in range(60)
+            ],
+            "crew": [{"id": movie_id * 1000 + i, "name": f"Equipe {i}", "job": "Director" if i == 0 else "Writer"}
+                     for i in range(40)],
+        },
+        "watch/providers": {
+            "results": {
+                country: {
+                    "link": f"https://www.themoviedb.org/movie/{movie_id}/watch?locale={country}",
+                    "flatrate": [
+                        {"provider_id": pid, "provider_name": name, "logo_path": f"/logo{pid}.jpg"}
+                        for pid, name in PROVIDERS if (movie_id + pid) % 3 == 0
+                    ],
+                }
+                for country in ("BR", "US", "GB", "DE", "FR", "PT", "ES", "IT", "MX", "AR")
+            },
+        },
+        "release_dates": {
+            "results": [
+                {"iso_3166_1": country, "release_dates": [{"certification": "14", "type": 3,
+                                                           "release_date": movie["release_date"] + "T00:00:00.000Z"}]}
+                for country in ("BR", "US", "GB", "DE", "FR", "PT", "ES", "IT", "MX", "AR")
+            ],
+        },
+    })
+    return movie
+
+
+def movie_videos(movie_id):
+    if movie_id % 10 == 0:
+        return {"id": movie_id, "results": []}
+    return {
+        "id": movie_id,
+        "results": [
+            {"id": f"v{movie_id}a", "key": f"teaser{movie_id}", "name": "Teaser", "site": "YouTube",
+             "type": "Teaser", "official": True},
+            {"id": f"v{movie_id}b", "key": f"trailer{movie_id}", "name": "Trailer Oficial", "site": "YouTube",
+             "type": "Trailer", "official": movie_id % 3 != 0},
+        ],
+    }
+
+
+def movie_page(seed, page):
+    page = max(1, min(page, TOTAL_PAGES))
+    first = (zlib.crc32(seed.encode('utf-8')) % 1000) * 10 + (page - 1) * PAGE_SIZE + 1
+    return {
+        "page": page,
+        "results": [movie_summary(movie_id) for movie_id in range(first, first + PAGE_SIZE)],
+        "total_pages": TOTAL_PAGES,
+        "total_results": TOTAL_PAGES * PAGE_SIZE,
+    }
+
+
+def synthesize(path, query):
+    """Gera a resposta sintética para `path` (sem o prefixo /3). Retorna None se não conhece a rota."""
+    page = int(query.get("page", ["1"])[0] or 1)
+    if match := re.fullmatch(r"/movie/(\d+)", path):
+        return movie_detail(int(match.group(1)))
+    if match := re.fullmatch(r"/movie/(\d+)/videos", path):
+        return movie_videos(int(match.group(1)))
+    if path in ("/movie/popular", "/movie/top_rated", "/movie/now_playing", "/movie/upcoming",
+                "/discover/movie", "/trending/movie/day", "/trending/movie/week"):
+        # Ordena a seed para que a mesma consulta dê sempre a mesma página
+        seed = path + json.dumps(sorted((k, v) for k, v in query.items() if k not in ("page", "api_key")))
+        return movie_page(seed, page)
+    if path == "/search/movie":
+        return movie_page(path + query.get("query", [""])[0].lower(), page)
+    if path == "/genre/movie/list":
+        return {"genres": [{"id": gid, "name": name} for gid, name in GENRES]}
+    if path == "/configuration/languages":
+        return [{"iso_639_1": "pt", "english_name": "Portuguese", "name": "Português"},
+                {"iso_639_1": "en", "english_name": "English", "name": "English"}]
+    if path == "/watch/providers/movie":
+        return {"results": [{"provider_id": pid, "provider_name": name, "logo_path": f"/logo{pid}.jpg",
+                             "display_priority": i} for i, (pid, name) in enumerate(PROVIDERS)]}
+    return None
+
+
+class FakeTMDbServer:
+    """
+    Servidor falso do TMDb numa thread. `latency` (segundos) é somada a cada resposta;
+    `error_rate` e `rate_limit_rate` são as frações de respostas 500 e 429 (com Retry-After).
+    `queue_errors` programa as próximas respostas (para testes determinísticos).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, fixtures_dir=FIXTURES_DIR, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.request_log = []
+        self._queued_errors = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/3"
+
+    @property
+    def request_count(self):
+        return len(self.request_log)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def queue_errors(self, status, count=1, retry_after=None):
+        """As próximas `count` requisições recebem `status` (ex: 429 com `retry_after`, 500, 404)."""
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        with self._lock:
+            self._queued_errors.extend([(status, headers)] * count)
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def load_fixture(self, path, page=1):
+        if self.fixtures_dir is None:
+            return None
+        # Páginas gravadas separadamente têm prioridade sobre a fixture da rota
+        candidates = [f"{path.strip('/')}.page{page}.json"] if page > 1 else []
+        for name in candidates + [path.strip('/') + '.json']:
+            fixture = self.fixtures_dir / name
+            if fixture.is_file():
+                return json.loads(fixture.read_text(encoding='utf-8'))
+        return None
+
+    def respond(self, raw_path):
+        """Retorna (status, headers, corpo) para um GET em `raw_path`."""
+        url = urlsplit(raw_path)
+        path = url.path[2:] if url.path.startswith('/3/') else url.path
+        query = parse_qs(url.query)
+        with self._lock:
+            self.request_log.append(path)
+            queued = self._queued_errors.pop(0) if self._queued_errors else None
+
+        if self.latency:
+            time.sleep(self.latency)
+        if queued is not None:
+            status, headers = queued
+            return status, headers, {"status_code": status, "status_message": "Erro programado"}
+        roll = self._roll()
+        if roll < self.rate_limit_rate:
+            return 429, {'Retry-After': str(self.retry_after)}, {"status_code": 25, "status_message": "Rate limit"}
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, {}, {"status_code": 11, "status_message": "Internal error"}
+
+        data = self.load_fixture(path, int(query.get("page", ["1"])[0] or 1))
+        if data is None:
+            data = synthesize(path, query)
+        if data is None:
+            return 404, {}, {"status_code": 34, "status_message": "The resource you requested could not be found."}
+        return 200, {}, data
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                status, headers, data = server.respond(self.path)
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json;charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.0, help='latência por resposta (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fração de respostas 429')
+    args = parser.parse_args()
+
+    server = FakeTMDbServer(args.host, args.port, args.latency, args.error_rate, args.rate_limit_rate)
+    print(f"Fake TMDb em {server.url} (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
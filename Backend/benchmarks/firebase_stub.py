@@ -0,0 +1,19 @@
+"""
+Stub do Firebase para testes e benchmarks: aceita qualquer token no formato
+"<uid>:<sufixo>[:<email>]" sem chamar o Google nem validar assinatura.
+
+    with firebase_stub():
+        client.credentials(HTTP_AUTHORIZATION='Bearer usuario1:x')
+"""
+from unittest import mock
+
+
+def fake_verify_id_token(id_token, *args, **kwargs):
+    uid, _, rest = id_token.partition(':')
+    email = rest.split(':')[1] if ':' in rest else f"{uid}@exemplo.com"
+    return {'uid': uid, 'email': email, 'name': 'Fulano', 'exp': 4102444800}
+
+
+def firebase_stub():
+    """Patch de firebase_admin.auth.verify_id_token usado por favorites.auth (context manager)."""
+    return mock.patch('favorites.auth.auth.verify_id_token', side_effect=fake_verify_id_token)
@@ -0,0 +1,93 @@
+"""
+Gerador de carga HTTP para comparar deploys do backend (ex: WSGI x ASGI).
+
+Dispara `--concurrency` requisições simultâneas durante `--duration` segundos contra cada
+`--base` informado, alternando entre os caminhos de `--path`. Um "{n}" no caminho vira um
+contador crescente (ex: /api/tmdb/movie/{n}/), útil para forçar misses no cache do TMDb.
+
+Uso (com o docker-compose, ver README):
+    python -m benchmarks.http_load \\
+        --base http://127.0.0.1:8000 --base http://127.0.0.1:8001 \\
+        --path /api/tmdb/movie/{n}/ --concurrency 200 --duration 20
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'rps': total / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_load(base, paths, concurrency, duration, counter_start=1):
+    counter = itertools.count(counter_start)
+    cycle = itertools.cycle(paths)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path = next(cycle).replace('{n}', str(next(counter)))
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code < 500
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def print_table(results):
+    print(f"{'base':<32} {'req':>8} {'erros':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for base, r in results.items():
+        print(f"{base:<32} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base', action='append', required=True, help='URL base do backend (repetível)')
+    parser.add_argument('--path', action='append', required=True, help='caminho a requisitar (repetível)')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=15.0, help='segundos por base')
+    args = parser.parse_args()
+
+    results = {}
+    for i, base in enumerate(args.base):
+        # Cada base usa ids diferentes em "{n}", para que uma não aqueça o cache da outra
+        results[base] = asyncio.run(run_load(base, args.path, args.concurrency, args.duration, i * 10_000_000 + 1))
+    print_table(results)
+
+
+if __name__ == '__main__':
+    main()
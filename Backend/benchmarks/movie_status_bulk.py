@@ -0,0 +1,104 @@
+"""
+Vazão de /api/movie-status/bulk/ comparada a uma requisição por filme em /api/movie-status/.
+
+Cria um banco de teste (como o `manage.py test`), autentica um usuário direto no cliente da
+API (sem Firebase) e, para cada tamanho em `--sizes`, envia um lote misto de operações:
+marca filmes novos, troca de lista, desmarca e apaga. O modo sequencial repete as mesmas
+operações uma por requisição (limitado a `--single-limit`, para não levar minutos).
+
+Uso:
+    python -m benchmarks.movie_status_bulk --sizes 1000,10000
+"""
+import argparse
+import os
+import random
+import time
+
+
+def build_operations(size, seed=0):
+    # ~70% marcam (criando ou trocando de lista), ~30% desmarcam; ids repetem para exercitar a ordem
+    rnd = random.Random(seed)
+    movie_ids = range(1, max(2, size // 2) + 1)
+    operations = []
+    for _ in range(size):
+        tmdb_id = rnd.choice(movie_ids)
+        operations.append({
+            'tmdb_id': tmdb_id,
+            'list_type': rnd.choice(['is_favorite', 'is_watch_later', 'is_watched']),
+            'status': rnd.random() < 0.7,
+            'movie_data': {'title': f"Filme {tmdb_id}", 'poster_path': f"/poster{tmdb_id}.jpg", 'rating': 7.5},
+        })
+    return operations
+
+
+def run_bulk(client, operations):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.post('/api/movie-status/bulk/', {'operations': operations}, format='json')
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.content[:500]
+    return elapsed, len(queries)
+
+
+def run_single(client, operations):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for operation in operations:
+            response = client.post('/api/movie-status/', operation, format='json')
+            assert response.status_code in (200, 201), response.content[:500]
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help='tamanhos de lote separados por vírgula')
+    parser.add_argument('--single-limit', type=int, default=1000, help='máximo de operações no modo sequencial')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from favorites.models import User, UserMovieEntry
+
+    setup_test_environment()
+    # Lotes grandes com movie_data podem passar do limite padrão do Django (2,5 MB)
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = None
+    sizes = [int(value) for value in args.sizes.split(',') if value.strip()]
+    # Mede também lotes acima do limite da API (MOVIE_STATUS_BULK_MAX_OPERATIONS)
+    settings.MOVIE_STATUS_BULK_MAX_OPERATIONS = max(sizes + [settings.MOVIE_STATUS_BULK_MAX_OPERATIONS])
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = User.objects.create(id='benchmark', email='benchmark@exemplo.com', name='Benchmark')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        print(f"{'modo':<12} {'operações':>10} {'tempo s':>9} {'ops/s':>10} {'queries':>8}")
+        for size in sizes:
+            operations = build_operations(size)
+            runs = [('bulk', operations, run_bulk)]
+            if args.single_limit:
+                runs.append(('sequencial', operations[:args.single_limit], run_single))
+            for mode, ops, run in runs:
+                UserMovieEntry.objects.all().delete()
+                elapsed, queries = run(client, ops)
+                print(f"{mode:<12} {len(ops):>10} {elapsed:>9.2f} {len(ops) / elapsed:>10.0f} {queries:>8}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Suíte de benchmarks do backend, sem rede: sobe o TMDb falso, troca a verificação do Firebase
+pelo stub (benchmarks/firebase_stub.py), cria um banco de teste com usuários, listas e listas
+compartilhadas e roda os cenários dentro do processo, pelo cliente de teste do Django (toda a
+pilha de middlewares, autenticação e views). Para cada endpoint, mostra vazão, latência
+p50/p95/p99 e consultas ao banco por requisição.
+
+Cenários:
+    browse       /tmdb/popular/, /tmdb/trending/{day,week}/ e /tmdb/discover/ com filtros
+    search       busca enquanto o usuário digita (prefixos crescentes do mesmo termo)
+    detail       página do filme: detalhes e trailer
+    toggle       marca e desmarca filmes nas listas (/movie-status/) e lê /movies/
+    public-list  lista compartilhada pública (/public-list/<id>/)
+
+O resultado pode ser gravado como referência (--save-baseline) e comparado numa execução
+seguinte (--baseline): endpoints com p95 ou vazão piores que a tolerância, ou com mais
+consultas por requisição, são marcados como regressão e o comando sai com status 1.
+
+Uso:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --scenario detail --scenario toggle --requests 500 --concurrency 8
+    python -m benchmarks.suite --latency 0.05 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict, namedtuple
+from unittest import mock
+from urllib.parse import urlsplit
+
+from benchmarks.http_load import percentile
+
+SCENARIOS = ('browse', 'search', 'detail', 'toggle', 'public-list')
+LIST_TYPES = ('is_favorite', 'is_watch_later', 'is_watched')
+SEARCH_TERMS = ('noite', 'cidade', 'missão', 'coração', 'estrela', 'sombra', 'viagem', 'sonho')
+DISCOVER_GENRES = (28, 12, 35, 18, 27, 878)
+
+Request = namedtuple('Request', ['method', 'path', 'body', 'token'])
+Sample = namedtuple('Sample', ['endpoint', 'elapsed', 'queries', 'ok'])
+
+
+class Workload:
+    """Gera as requisições de cada cenário a partir de uma seed (a mesma seed, a mesma sequência)."""
+
+    def __init__(self, users, shared_lists, movie_ids):
+        self.users = users
+        self.shared_lists = shared_lists
+        self.movie_ids = movie_ids
+
+    def browse(self, rnd):
+        choice = rnd.random()
+        if choice < 0.4:
+            return [Request('GET', '/api/tmdb/popular/', None, None)]
+        if choice < 0.7:
+            return [Request('GET', f"/api/tmdb/trending/{rnd.choice(['day', 'week'])}/", None, None)]
+        genre, sort_by = rnd.choice(DISCOVER_GENRES), rnd.choice(['popularity.desc', 'vote_average.desc'])
+        return [Request('GET', f"/api/tmdb/discover/?with_genres={genre}&sort_by={sort_by}", None, None)]
+
+    def search(self, rnd):
+        # Uma requisição por tecla a partir da segunda letra, como o campo de busca do frontend
+        term = rnd.choice(SEARCH_TERMS)
+        return [Request('GET', f"/api/search-tmdb/?query={term[:size]}", None, None) for size in range(2, len(term) + 1)]
+
+    def detail(self, rnd):
+        movie_id = rnd.choice(self.movie_ids)
+        return [
+            Request('GET', f"/api/tmdb/movie/{movie_id}/", None, None),
+            Request('GET', f"/api/tmdb/movie/{movie_id}/videos/", None, None),
+        ]
+
+    def toggle(self, rnd):
+        token, movie_id = rnd.choice(self.users), rnd.choice(self.movie_ids)
+        body = {
+            'tmdb_id': movie_id,
+            'list_type': rnd.choice(LIST_TYPES),
+            'status': rnd.random() < 0.6,
+            'movie_data': {'title': f"Filme {movie_id}", 'poster_path': f"/poster{movie_id}.jpg", 'rating': 7.0},
+        }
+        return [
+            Request('POST', '/api/movie-status/', body, token),
+            Request('GET', f"/api/movies/?list_type={body['list_type']}", None, token),
+        ]
+
+    def public_list(self, rnd):
+        return [Request('GET', f"/api/public-list/{rnd.choice(self.shared_lists)}/", None, None)]
+
+    def requests_for(self, scenario, rnd):
+        return getattr(self, scenario.replace('-', '_'))(rnd)
+
+
+def seed_database(users, entries_per_user, movies, seed):
+    """Usuários com listas e uma lista compartilhada cada; retorna (tokens, ids das listas, ids de filmes)."""
+    from favorites.models import Movie, SharedList, User, UserMovieEntry
+
+    rnd = random.Random(seed)
+    movie_ids = list(range(1, movies + 1))
+    Movie.objects.bulk_create([Movie(tmdb_id=movie_id, title=f"Filme {movie_id}") for movie_id in movie_ids])
+    tokens, shared_lists, entries = [], [], []
+    for index in range(users):
+        user = User.objects.create(id=f"bench{index}", email=f"bench{index}@exemplo.com", name="Fulano")
+        tokens.append(f"{user.id}:token")
+        shared_lists.append(str(SharedList.objects.create(user=user).id))
+        for movie_id in rnd.sample(movie_ids, min(entries_per_user, movies)):
+            flag = rnd.choice(LIST_TYPES)
+            entries.append(UserMovieEntry(user=user, movie_id=movie_id, **{flag: True}))
+    UserMovieEntry.objects.bulk_create(entries, batch_size=500)
+    return tokens, shared_lists, movie_ids
+
+
+def endpoint_name(method, path):
+    from django.urls import resolve
+
+    match = resolve(urlsplit(path).path)
+    return f"{method} {match.url_name}"
+
+
+def run_scenario(workload, scenario, total, concurrency, seed):
+    """Roda `total` interações do cenário em `concurrency` threads; retorna (amostras, segundos)."""
+    from django.db import connection, reset_queries
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    plans = [workload.requests_for(scenario, random.Random(f"{seed}:{scenario}:{i}")) for i in range(total)]
+    samples, lock = [], threading.Lock()
+    next_plan = iter(plans)
+
+    def worker():
+        client = Client()
+        local = []
+        try:
+            while True:
+                with lock:
+                    plan = next(next_plan, None)
+                if plan is None:
+                    break
+                for request in plan:
+                    headers = {'HTTP_AUTHORIZATION': f"Bearer {request.token}"} if request.token else {}
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        if request.method == 'POST':
+                            response = client.post(request.path, json.dumps(request.body), content_type='application/json', **headers)
+                        else:
+                            response = client.get(request.path, **headers)
+                        elapsed = time.perf_counter() - start
+                    local.append(Sample(endpoint_name(request.method, request.path), elapsed, len(queries), response.status_code < 400))
+        finally:
+            connection.close()
+            with lock:
+                samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+    report = {}
+    for endpoint, group in sorted(by_endpoint.items()):
+        latencies = sorted(sample.elapsed for sample in group)
+        report[endpoint] = {
+            'requests': len(group),
+            'errors': sum(not sample.ok for sample in group),
+            'rps': len(group) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'queries': sum(sample.queries for sample in group) / len(group),
+        }
+    return report
+
+
+def compare(report, baseline, tolerance, noise_ms):
+    """Regressões de cada endpoint em relação à referência: lista de (endpoint, motivo)."""
+    regressions = []
+    for scenario, endpoints in report.items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get(scenario, {}).get(endpoint)
+            if previous is None:
+                continue
+            key = f"{scenario} {endpoint}"
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and current['p95_ms'] - previous['p95_ms'] > noise_ms:
+                regressions.append((key, f"p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms"))
+            if current['rps'] < previous['rps'] * (1 - tolerance):
+                regressions.append((key, f"req/s {previous['rps']:.1f} -> {current['rps']:.1f}"))
+            if current['queries'] > previous['queries'] + 0.5:
+                regressions.append((key, f"consultas {previous['queries']:.1f} -> {current['queries']:.1f}"))
+            if current['errors'] > previous['errors']:
+                regressions.append((key, f"erros {previous['errors']} -> {current['errors']}"))
+    return regressions
+
+
+def print_report(report):
+    print(f"{'cenário':<12} {'endpoint':<30} {'req':>6} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for scenario, endpoints in report.items():
+        for endpoint, r in endpoints.items():
+            print(f"{scenario:<12} {endpoint:<30} {r['requests']:>6} {r['errors']:>6} {r['rps']:>8.1f} "
+                  f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['queries']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='cenário a rodar (repetível; padrão: todos)')
+    parser.add_argument('--requests', type=int, default=200, help='interações por cenário')
+    parser.add_argument('--concurrency', type=int, default=4, help='threads por cenário')
+    parser.add_argument('--warmup', type=int, default=20, help='interações por cenário antes da medição (descartadas)')
+    parser.add_argument('--latency', type=float, default=0.0, help='latência do TMDb falso (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 500 do TMDb falso')
+    parser.add_argument('--tmdb-rate', type=float, default=1000, help='limite de chamadas/s ao TMDb falso (o de produção é TMDB_RATE_LIMIT)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--entries', type=int, default=200, help='filmes nas listas de cada usuário')
+    parser.add_argument('--movies', type=int, default=2000, help='filmes no catálogo (ids usados nos cenários)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', help='grava o resultado como referência neste JSON')
+    parser.add_argument('--baseline', help='compara com a referência gravada neste JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='piora relativa aceita em p95 e req/s')
+    parser.add_argument('--noise-ms', type=float, default=5.0, help='piora absoluta de p95 abaixo da qual não há regressão')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment
+
+    from benchmarks.fake_tmdb import FakeTMDbServer
+    from benchmarks.firebase_stub import firebase_stub
+    from favorites.tmdb import TMDbRateLimiter, tmdb_client
+    from favorites.tmdb_cache import tmdb_cache
+
+    setup_test_environment()
+    if connection.vendor == 'sqlite':
+        # SQLite em arquivo: o banco em memória recusa escritas concorrentes das threads
+        test_db = tempfile.NamedTemporaryFile(prefix='bench-', suffix='.sqlite3', delete=False)
+        test_db.close()
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = test_db.name
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        tokens, shared_lists, movie_ids = seed_database(args.users, args.entries, args.movies, args.seed)
+        workload = Workload(tokens, shared_lists, movie_ids)
+        server = FakeTMDbServer(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+        limiter = TMDbRateLimiter(rate=args.tmdb_rate, burst=max(1, int(args.tmdb_rate)), cache_alias='', metrics=tmdb_client.metrics)
+        with server, firebase_stub(), mock.patch.object(tmdb_client, 'limiter', limiter), \
+                override_settings(TMDB_BASE_URL=server.url):
+            report = {}
+            for scenario in args.scenario or SCENARIOS:
+                tmdb_cache.clear()
+                if args.warmup:
+                    run_scenario(workload, scenario, args.warmup, args.concurrency, f"aquecimento:{args.seed}")
+                samples, elapsed = run_scenario(workload, scenario, args.requests, args.concurrency, args.seed)
+                report[scenario] = summarize(samples, elapsed)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print_report(report)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        print(f"\nReferência gravada em {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stored:
+            regressions = compare(report, json.load(stored), args.tolerance, args.noise_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) em relação a {args.baseline}:")
+            for endpoint, reason in regressions:
+                print(f"  {endpoint}: {reason}")
+            raise SystemExit(1)
+        print(f"\nSem regressões em relação a {args.baseline} (tolerância {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Bytes trafegados por endpoint: resposta crua, com gzip, com brotli e na revalidação (304).
+
+Sobe o TMDb falso, cria um banco de teste e faz, para cada caminho, um GET sem compressão,
+um com "Accept-Encoding: gzip", um com "br" (se o pacote brotli estiver instalado) e um
+condicional com o ETag recebido. Conta corpo + cabeçalhos da resposta, como sairiam na rede.
+
+Uso:
+    python -m benchmarks.wire_size
+    python -m benchmarks.wire_size --path /api/tmdb/movie/550/ --path /api/tmdb/popular/
+"""
+import argparse
+import os
+
+DEFAULT_PATHS = [
+    '/api/tmdb/movie/550/',
+    '/api/tmdb/popular/',
+    '/api/tmdb/discover/?with_genres=28',
+    '/api/tmdb/genres/',
+    '/api/tmdb/movie/551/videos/',
+]
+
+
+def wire_bytes(response):
+    headers = ''.join(f"{name}: {value}\r\n" for name, value in response.items())
+    status_line = f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n"
+    return len(status_line) + len(headers) + 2 + len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', action='append', help='caminho a medir (repetível)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+
+    from benchmarks.fake_tmdb import FakeTMDbServer
+    from favorites.middleware import brotli
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with FakeTMDbServer() as server, override_settings(TMDB_BASE_URL=server.url):
+            client = Client()
+            encodings = [('crua', 'identity'), ('gzip', 'gzip')] + ([('brotli', 'br, gzip')] if brotli else [])
+            print(f"{'caminho':<38}" + ''.join(f"{name:>10}" for name, _ in encodings) + f"{'304':>10}")
+            for path in args.path or DEFAULT_PATHS:
+                sizes = []
+                etag = None
+                for _, accept_encoding in encodings:
+                    response = client.get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+                    assert response.status_code == 200, (path, response.status_code)
+                    sizes.append(wire_bytes(response))
+                    etag = response.get('ETag', etag)
+                revalidated = client.get(path, HTTP_ACCEPT_ENCODING=encodings[-1][1], HTTP_IF_NONE_MATCH=etag or '')
+                assert revalidated.status_code == 304, (path, revalidated.status_code)
+                sizes.append(wire_bytes(revalidated))
+                print(f"{path:<38}" + ''.join(f"{size:>10}" for size in sizes))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
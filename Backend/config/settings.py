@@ -36,10 +36,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "favorites.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "favorites.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
+    "favorites.middleware.CacheControlMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -77,8 +81,25 @@ DATABASES = {
         "PASSWORD": os.environ.get('DB_PASSWORD'),
         "HOST": os.environ.get('DB_HOST'),
         "PORT": os.environ.get('DB_PORT'),
+        # Conexão persistente por worker (segundos; 0 = uma por requisição), testada antes de
+        # ser reaproveitada numa nova requisição
+        "CONN_MAX_AGE": int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
+# Réplicas de leitura: DB_REPLICA_HOSTS="host1,host2:3307" cria os aliases replica1, replica2...
+# com as mesmas credenciais do primário. Só as views de leitura (favorites/db_router.py) usam as
+# réplicas. Nos testes, as réplicas espelham o banco de teste do primário.
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica_host.strip().partition(':')
+    alias = f"replica{index}"
+    DATABASES[alias] = dict(DATABASES["default"], HOST=host, PORT=port or DATABASES["default"]["PORT"], TEST={"MIRROR": "default"})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["favorites.db_router.ReplicaRouter"]
+# Depois de uma escrita, as leituras do usuário ficam no primário por esse tempo (segundos),
+# para ele nunca ver a própria alteração sumir por atraso de replicação
+DB_READ_YOUR_WRITES_TTL = int(os.environ.get('DB_READ_YOUR_WRITES_TTL', '5'))
 
 
 # Password validation
@@ -130,4 +151,160 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173", # A porta do seu 'npm run dev' (para testes)
 ]
 
-TMDB_API_KEY = os.environ.get('TMDB_API_KEY')
\ No newline at end of file
+TMDB_API_KEY = os.environ.get('TMDB_API_KEY')
+
+# Cliente HTTP do TMDb (favorites/tmdb.py)
+TMDB_BASE_URL = os.environ.get('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+TMDB_CONNECT_TIMEOUT = float(os.environ.get('TMDB_CONNECT_TIMEOUT', '3.05'))
+TMDB_READ_TIMEOUT = float(os.environ.get('TMDB_READ_TIMEOUT', '10'))
+TMDB_POOL_MAXSIZE = int(os.environ.get('TMDB_POOL_MAXSIZE', '20'))
+TMDB_MAX_RETRIES = int(os.environ.get('TMDB_MAX_RETRIES', '3'))
+TMDB_RETRY_BACKOFF = float(os.environ.get('TMDB_RETRY_BACKOFF', '0.3'))
+# Prazo (segundos) de uma chamada ao TMDb somando todas as tentativas: não há retry se a próxima
+# tentativa, no pior caso (connect + read timeout), terminaria depois dele. Fica abaixo do
+# timeout do gunicorn (30s) para o worker responder antes de ser morto
+TMDB_TOTAL_TIMEOUT = float(os.environ.get('TMDB_TOTAL_TIMEOUT', '25'))
+# Caminho assíncrono (ASGI): views async + httpx.AsyncClient com HTTP/2 (favorites/async_views.py)
+TMDB_ASYNC_VIEWS = os.environ.get('TMDB_ASYNC_VIEWS') == "True"
+TMDB_HTTP2 = os.environ.get('TMDB_HTTP2', "True") == "True"
+TMDB_ASYNC_MAX_CONNECTIONS = int(os.environ.get('TMDB_ASYNC_MAX_CONNECTIONS', '100'))
+# Por quanto tempo os detalhes de um filme guardados no catálogo local (modelo Movie)
+# respondem /api/tmdb/movie/<id>/ sem chamar o TMDb
+TMDB_CATALOG_DETAIL_TTL = int(os.environ.get('TMDB_CATALOG_DETAIL_TTL', str(24 * 3600)))
+# Busca local (favorites/search_index.py): /search/movie é respondido pelo índice em memória
+# quando o catálogo enche a página pedida (20 filmes); senão a busca vai ao TMDb
+TMDB_SEARCH_INDEX = os.environ.get('TMDB_SEARCH_INDEX', "True") == "True"
+# Discover local (favorites/discover_index.py): filtros e ordenações comuns de /discover/movie
+# respondidos do catálogo quando ele tem pelo menos TMDB_DISCOVER_MIN_CATALOG filmes. Filtros por
+# provedor exigem que ao menos TMDB_DISCOVER_MIN_PROVIDER_COVERAGE do catálogo tenha provedores conhecidos
+TMDB_DISCOVER_INDEX = os.environ.get('TMDB_DISCOVER_INDEX', "True") == "True"
+TMDB_DISCOVER_MIN_CATALOG = int(os.environ.get('TMDB_DISCOVER_MIN_CATALOG', '1000'))
+TMDB_DISCOVER_MIN_PROVIDER_COVERAGE = float(os.environ.get('TMDB_DISCOVER_MIN_PROVIDER_COVERAGE', '0.8'))
+# Intervalo (segundos) entre remontagens dos índices em memória da busca e do discover
+TMDB_CATALOG_INDEX_REFRESH = int(os.environ.get('TMDB_CATALOG_INDEX_REFRESH', '300'))
+# Detalhes do filme (favorites/projections.py): quantas pessoas do elenco vão na resposta
+TMDB_DETAIL_CAST_SIZE = int(os.environ.get('TMDB_DETAIL_CAST_SIZE', '20'))
+# Índice de trailers (favorites/trailers.py): por quanto tempo o trailer escolhido de um filme
+# vale antes de ser buscado de novo no TMDb, e por quanto tempo vale "filme sem trailer"
+TMDB_TRAILER_INDEX_TTL = int(os.environ.get('TMDB_TRAILER_INDEX_TTL', str(7 * 24 * 3600)))
+TMDB_TRAILER_INDEX_NEGATIVE_TTL = int(os.environ.get('TMDB_TRAILER_INDEX_NEGATIVE_TTL', str(24 * 3600)))
+# Endpoint em lote /api/tmdb/movies/batch/: máximo de ids e de chamadas simultâneas ao TMDb
+TMDB_BATCH_MAX_IDS = int(os.environ.get('TMDB_BATCH_MAX_IDS', '40'))
+TMDB_BATCH_CONCURRENCY = int(os.environ.get('TMDB_BATCH_CONCURRENCY', '8'))
+# Máximo de operações por requisição em /api/movie-status/bulk/. O lote inteiro roda numa
+# transação com as entradas envolvidas travadas (SELECT ... FOR UPDATE): o limite segura essa
+# janela em poucas centenas de milissegundos. Importações maiores vão em vários lotes
+MOVIE_STATUS_BULK_MAX_OPERATIONS = int(os.environ.get('MOVIE_STATUS_BULK_MAX_OPERATIONS', '1000'))
+# Comando ingest_tmdb: máximo de requisições por segundo ao TMDb, somando todas as threads
+TMDB_INGEST_RATE_LIMIT = float(os.environ.get('TMDB_INGEST_RATE_LIMIT', '40'))
+
+# Cache das respostas do TMDb (favorites/tmdb_cache.py)
+# Nível 1: LRU em memória por processo. Nível 2 (opcional): backend compartilhado do Django,
+# habilitado quando REDIS_URL está definido (requer o pacote "redis").
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get('REDIS_URL'),
+    }
+TMDB_SHARED_CACHE = "shared" if "shared" in CACHES else None
+# Tokens do Firebase já verificados (favorites/auth.py): ficam em cache até o "exp" do token,
+# limitado a FIREBASE_TOKEN_CACHE_TTL segundos. Com REDIS_URL, o cache e as chaves públicas do
+# Google são compartilhados entre os workers
+FIREBASE_SHARED_CACHE = "shared" if "shared" in CACHES else None
+# A marca de "escreveu há pouco" precisa valer entre os workers: sem REDIS_URL não há onde
+# guardá-la, e com réplicas as leituras de usuários autenticados ficam sempre no primário
+DB_READ_YOUR_WRITES_CACHE = "shared" if "shared" in CACHES else None
+# Limite de chamadas por segundo ao TMDb (favorites/tmdb.py), com rajadas de até
+# TMDB_RATE_LIMIT_BURST. Por processo, ou entre todos os workers com TMDB_RATE_LIMIT_SHARED e
+# REDIS_URL. Uma chamada que teria de esperar mais que TMDB_RATE_LIMIT_MAX_WAIT segundos (limite
+# ou Retry-After de um 429) falha na hora e a view serve a cópia em cache, se houver
+TMDB_RATE_LIMIT = float(os.environ.get('TMDB_RATE_LIMIT', '40'))
+TMDB_RATE_LIMIT_BURST = int(os.environ.get('TMDB_RATE_LIMIT_BURST', '20'))
+TMDB_RATE_LIMIT_CACHE = "shared" if "shared" in CACHES and os.environ.get('TMDB_RATE_LIMIT_SHARED') == "True" else None
+TMDB_RATE_LIMIT_MAX_WAIT = float(os.environ.get('TMDB_RATE_LIMIT_MAX_WAIT', '2'))
+# Circuit breaker: depois de TMDB_CIRCUIT_FAILURE_THRESHOLD falhas seguidas (rede, 429 ou 5xx)
+# as chamadas ao TMDb falham na hora por TMDB_CIRCUIT_RESET_TIMEOUT segundos
+TMDB_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('TMDB_CIRCUIT_FAILURE_THRESHOLD', '5'))
+TMDB_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('TMDB_CIRCUIT_RESET_TIMEOUT', '30'))
+FIREBASE_TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('FIREBASE_TOKEN_CACHE_MAX_ENTRIES', '10000'))
+FIREBASE_TOKEN_CACHE_TTL = int(os.environ.get('FIREBASE_TOKEN_CACHE_TTL', '3600'))
+# Usuários mantidos em memória por processo depois do primeiro login
+FIREBASE_USER_CACHE_MAX_ENTRIES = int(os.environ.get('FIREBASE_USER_CACHE_MAX_ENTRIES', '10000'))
+# Instrumentação (favorites/instrumentation.py): cabeçalho Server-Timing com tempo total, banco,
+# TMDb, tmdb_cache e autenticação de cada requisição (desligado por padrão: mostra a qualquer
+# cliente os tempos internos). Os histogramas por rota ficam em /api/metrics/ (formato do
+# Prometheus), que só responde com METRICS_TOKEN definido e "Authorization: Bearer <token>";
+# /api/tmdb/health/ só mostra os detalhes com o mesmo cabeçalho
+SERVER_TIMING = os.environ.get('SERVER_TIMING', "False") == "True"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Compressão das respostas (favorites/middleware.py): brotli se o pacote opcional "brotli"
+# estiver instalado e o cliente aceitar, senão gzip; respostas menores que o limite vão cruas
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+# Cache-Control por rota (nome da URL) para navegador e CDN. Os dados do TMDb podem ficar em
+# cache compartilhado; as listas do usuário só no navegador dele, sempre revalidadas (ETag -> 304)
+API_CACHE_CONTROL = {
+    'tmdb-genres': 'public, max-age=86400',
+    'tmdb-languages': 'public, max-age=86400',
+    'tmdb-watch-providers': 'public, max-age=86400',
+    'tmdb-popular': 'public, max-age=600, stale-while-revalidate=3600',
+    'tmdb-top-rated': 'public, max-age=600, stale-while-revalidate=3600',
+    'tmdb-now-playing': 'public, max-age=600, stale-while-revalidate=3600',
+    'tmdb-upcoming': 'public, max-age=600, stale-while-revalidate=3600',
+    'tmdb-trending': 'public, max-age=600, stale-while-revalidate=3600',
+    'tmdb-movie-detail': 'public, max-age=3600, stale-while-revalidate=86400',
+    'tmdb-movie-videos': 'public, max-age=3600, stale-while-revalidate=86400',
+    'tmdb-movie-batch': 'public, max-age=3600',
+    'tmdb-discover': 'public, max-age=300',
+    'search-tmdb': 'public, max-age=300',
+    'user-movie-list': 'private, no-cache',
+}
+# Snapshots das listas públicas (favorites/public_lists.py). Sem REDIS_URL cada processo tem
+# os seus, e a invalidação só alcança o processo que recebeu a alteração: o TTL limita por quanto
+# tempo os outros servem a cópia antiga (e por quanto tempo os dados do catálogo ficam velhos)
+PUBLIC_LIST_CACHE = "shared" if "shared" in CACHES else "default"
+PUBLIC_LIST_SNAPSHOT_TTL = int(os.environ.get('PUBLIC_LIST_SNAPSHOT_TTL', '300'))
+TMDB_CACHE_MAX_ENTRIES = int(os.environ.get('TMDB_CACHE_MAX_ENTRIES', '2000'))
+# Janela (segundos após expirar) em que a cópia antiga é servida enquanto um refresh roda em background,
+# e janela em que ela ainda é servida se o TMDb estiver fora do ar / respondendo 5xx.
+TMDB_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get('TMDB_CACHE_STALE_WHILE_REVALIDATE', '3600'))
+TMDB_CACHE_STALE_IF_ERROR = int(os.environ.get('TMDB_CACHE_STALE_IF_ERROR', str(24 * 3600)))
+TMDB_CACHE_REFRESH_WORKERS = int(os.environ.get('TMDB_CACHE_REFRESH_WORKERS', '4'))
+# Tempo máximo que um worker espera outro worker terminar a mesma busca no cache compartilhado
+TMDB_CACHE_LOCK_WAIT = float(os.environ.get('TMDB_CACHE_LOCK_WAIT', '2'))
+
+# Ranking de chaves mais pedidas do cache do TMDb, lido pelo comando prewarm_tmdb. Cada processo
+# grava suas contagens a cada TMDB_PREWARM_FLUSH_INTERVAL segundos; sem REDIS_URL o ranking é por
+# processo e o comando só aquece as listas e os detalhes delas
+TMDB_PREWARM_TRACK = os.environ.get('TMDB_PREWARM_TRACK', "True") == "True"
+TMDB_PREWARM_TRACK_MAX_KEYS = int(os.environ.get('TMDB_PREWARM_TRACK_MAX_KEYS', '1000'))
+TMDB_PREWARM_FLUSH_INTERVAL = float(os.environ.get('TMDB_PREWARM_FLUSH_INTERVAL', '60'))
+TMDB_PREWARM_HALF_LIFE = float(os.environ.get('TMDB_PREWARM_HALF_LIFE', '3600'))
+TMDB_PREWARM_CACHE = "shared" if "shared" in CACHES else "default"
+
+# Ao servir a página n de uma lista do TMDb (?page=), busca a página n+1 em background
+TMDB_PREFETCH_NEXT_PAGE = os.environ.get('TMDB_PREFETCH_NEXT_PAGE', "True") == "True"
+
+# TTL (segundos) por endpoint do TMDb; ids numéricos aparecem como {id}
+TMDB_CACHE_TTLS = {
+    "default": 600,
+    "/genre/movie/list": 24 * 3600,
+    "/configuration/languages": 24 * 3600,
+    "/watch/providers/movie": 24 * 3600,
+    "/movie/popular": 3 * 3600,
+    "/movie/top_rated": 3 * 3600,
+    "/movie/now_playing": 3 * 3600,
+    "/movie/upcoming": 3 * 3600,
+    "/trending/movie/day": 3600,
+    "/trending/movie/week": 3 * 3600,
+    "/movie/{id}": 6 * 3600,
+    "/movie/{id}/videos": 24 * 3600,
+    "/search/movie": 15 * 60,
+    "/discover/movie": 30 * 60,
+}
\ No newline at end of file
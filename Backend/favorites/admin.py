@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import User, UserMovieEntry, SharedList
+from .models import User, Movie, UserMovieEntry, SharedList
 
 admin.site.register(User)
+admin.site.register(Movie)
 admin.site.register(UserMovieEntry)
 admin.site.register(SharedList)
\ No newline at end of file
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class FavoritesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'favorites'
+
+    def ready(self):
+        # Liga o catálogo local de filmes, o índice de trailers, a busca e o discover locais ao cache do TMDb
+        from . import catalog, discover_index, search_index, trailers
+        catalog.connect()
+        trailers.connect()
+        search_index.connect()
+        discover_index.connect()
+        # Registra o receiver que volta as leituras ao primário a cada requisição
+        from . import db_router  # noqa: F401
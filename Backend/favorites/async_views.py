@@ -0,0 +1,196 @@
+import asyncio
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+
+from .tmdb import (
+    batch_status,
+    build_batch_response,
+    build_discover_request,
+    movie_detail_request,
+    movie_list_request,
+    movie_videos_request,
+    parse_movie_ids,
+    parse_page,
+    pick_official_trailer,
+    trending_request,
+    upstream_status,
+)
+from .projections import movie_detail_projection, parse_fields, select_fields
+from .renderers import FastJSONRenderer
+from .tmdb_cache import tmdb_cache
+from .trailers import trailer_index, videos_document
+
+# Views assíncronas do proxy do TMDb, usadas no lugar das views do DRF quando
+# TMDB_ASYNC_VIEWS está ativo (deploy ASGI, ver gunicorn.conf.py). Mesmas rotas,
+# mesmos parâmetros e o mesmo formato de resposta das views em views.py.
+
+
+def json_response(data, status=200, headers=None):
+    # Mesmo renderer das views do DRF: os dois deploys devolvem os mesmos bytes (e o mesmo ETag)
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, headers=headers, content_type='application/json'
+    )
+
+
+class AsyncTMDbProxyView(View):
+    error_message = "Falha na API do TMDb"
+    error_status = 503
+
+    def get_tmdb_request(self, request, **kwargs):
+        """Retorna (endpoint, params) da chamada ao TMDb."""
+        raise NotImplementedError
+
+    def transform(self, data, request, **kwargs):
+        return data
+
+    def error_response(self, exc):
+        return json_response({"error": f"{self.error_message}: {exc}"}, status=self.error_status)
+
+    async def fetch(self, endpoint, params):
+        return await tmdb_cache.afetch(endpoint, params)
+
+    async def get(self, request, **kwargs):
+        endpoint, params = self.get_tmdb_request(request, **kwargs)
+        try:
+            data, cache_status = await self.fetch(endpoint, params)
+        except (httpx.HTTPError, requests.RequestException) as e:
+            return self.error_response(e)
+        return json_response(self.transform(data, request, **kwargs), headers={"X-Cache": cache_status})
+
+
+class AsyncTMDbPageView(AsyncTMDbProxyView):
+    """Listas paginadas com ?page= (ver TMDbCache.fetch_page)."""
+
+    async def get(self, request, **kwargs):
+        try:
+            self.page = parse_page(request.GET.get("page"))
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+        return await super().get(request, **kwargs)
+
+    async def fetch(self, endpoint, params):
+        return await tmdb_cache.afetch_page(endpoint, params, self.page)
+
+
+class AsyncTMDbSearchView(AsyncTMDbProxyView):
+    error_message = "Falha ao contatar API do TMDb"
+
+    async def get(self, request, **kwargs):
+        if not request.GET.get("query"):
+            return json_response({"error": "O parâmetro 'query' é obrigatório."}, status=400)
+        return await super().get(request, **kwargs)
+
+    def get_tmdb_request(self, request):
+        return "/search/movie", {"query": request.GET["query"], "language": "pt-BR"}
+
+
+class AsyncTMDbPopularView(AsyncTMDbPageView):
+    def get_tmdb_request(self, request):
+        return movie_list_request("popular")
+
+
+class AsyncTMDbNowPlayingView(AsyncTMDbPageView):
+    def get_tmdb_request(self, request):
+        return movie_list_request("now_playing")
+
+
+class AsyncTMDbTopRatedView(AsyncTMDbPageView):
+    def get_tmdb_request(self, request):
+        return movie_list_request("top_rated")
+
+
+class AsyncTMDbUpcomingView(AsyncTMDbPageView):
+    def get_tmdb_request(self, request):
+        return movie_list_request("upcoming")
+
+
+class AsyncTMDbTrendingView(AsyncTMDbProxyView):
+    async def get(self, request, time_window):
+        try:
+            trending_request(time_window)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+        return await super().get(request, time_window=time_window)
+
+    def get_tmdb_request(self, request, time_window):
+        return trending_request(time_window)
+
+
+class AsyncTMDbGenreListView(AsyncTMDbProxyView):
+    def get_tmdb_request(self, request):
+        return "/genre/movie/list", {"language": "pt-BR"}
+
+
+class AsyncTMDbLanguagesView(AsyncTMDbProxyView):
+    def get_tmdb_request(self, request):
+        return "/configuration/languages", None
+
+
+class AsyncTMDbWatchProvidersView(AsyncTMDbProxyView):
+    def get_tmdb_request(self, request):
+        return "/watch/providers/movie", {"language": "pt-BR", "watch_region": "BR"}
+
+
+class AsyncTMDbDiscoverView(AsyncTMDbPageView):
+    def get_tmdb_request(self, request):
+        return build_discover_request(request.GET)
+
+
+class AsyncTMDbMovieDetailView(AsyncTMDbProxyView):
+    def get_tmdb_request(self, request, movie_id):
+        return movie_detail_request(movie_id)
+
+    def error_response(self, exc):
+        # 404 só quando o TMDb diz que o filme não existe; falhas do TMDb são 503
+        error_status = upstream_status(exc)
+        if error_status == 404:
+            return json_response({"error": "Filme não encontrado."}, status=error_status)
+        return super().error_response(exc)
+
+    def transform(self, data, request, movie_id):
+        return select_fields(movie_detail_projection(movie_id, data), parse_fields(request.GET.get('fields')))
+
+
+class AsyncTMDbMovieVideosView(AsyncTMDbProxyView):
+    def get_tmdb_request(self, request, movie_id):
+        return movie_videos_request(movie_id)
+
+    def transform(self, data, request, **kwargs):
+        return pick_official_trailer(data)
+
+
+class AsyncTMDbMovieBatchView(View):
+    async def get(self, request):
+        try:
+            movie_ids = parse_movie_ids(request.GET.getlist('ids'), settings.TMDB_BATCH_MAX_IDS)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+
+        semaphore = asyncio.Semaphore(settings.TMDB_BATCH_CONCURRENCY)
+
+        async def fetch(movie_id, part):
+            request_for = movie_detail_request if part == "details" else movie_videos_request
+            async with semaphore:
+                try:
+                    data, _ = await tmdb_cache.afetch(*request_for(movie_id))
+                    if part == "details":
+                        data = movie_detail_projection(movie_id, data)
+                    return data, None
+                except (httpx.HTTPError, requests.RequestException) as e:
+                    return None, e
+
+        # Trailers já indexados saem de uma consulta só
+        indexed = await sync_to_async(trailer_index.lookup)(movie_ids)
+        jobs = [(movie_id, "details") for movie_id in movie_ids]
+        jobs += [(movie_id, "videos") for movie_id in movie_ids if movie_id not in indexed]
+        fetched = dict(zip(jobs, await asyncio.gather(*(fetch(movie_id, part) for movie_id, part in jobs))))
+        for movie_id, trailer in indexed.items():
+            fetched[(movie_id, "videos")] = videos_document(movie_id, trailer), None
+        batch = build_batch_response(movie_ids, fetched)
+        http_status, headers = batch_status(batch)
+        return json_response(batch, status=http_status, headers=headers)
@@ -3,9 +3,23 @@ from firebase_admin import credentials, auth
 from rest_framework import authentication
 from rest_framework import exceptions
 from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from cachecontrol import CacheControl
+from cachecontrol.cache import BaseCache
+from .instrumentation import record_auth
 from .models import User
+from .tmdb_cache import CacheEntry, LRUCache, SingleFlight
+import datetime
+import hashlib
+import logging
 import os
 import json
+import time
+
+logger = logging.getLogger(__name__)
 
 key_filename = os.environ.get('FIREBASE_SERVICE_ACCOUNT_PATH')
 key_path = os.path.join(settings.BASE_DIR, key_filename)
@@ -18,8 +32,163 @@ except FileNotFoundError:
 except ValueError as e:
     pass
 
+# Certificados públicos que assinam os ID tokens do Firebase
+ID_TOKEN_CERT_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+
+# Tokens já verificados: hash do token -> claims, válidas no máximo até o "exp" do próprio
+# token. Nível 1 em memória por processo; nível 2 no cache compartilhado, se houver. O usuário
+# não fica aqui: sai do user_cache (ver get_or_provision_user), que é esvaziado quando o
+# usuário muda ou é apagado, em vez de ficar preso ao token até ele expirar.
+class VerifiedTokenCache:
+    def __init__(self):
+        self.local = LRUCache(settings.FIREBASE_TOKEN_CACHE_MAX_ENTRIES)
+
+    @property
+    def shared(self):
+        alias = settings.FIREBASE_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def key(id_token):
+        return 'firebase-claims:' + hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        """Retorna as claims se o token já foi verificado e ainda não expirou, senão None."""
+        key = self.key(id_token)
+        entry = self.local.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.data
+
+        shared = self.shared
+        stored = shared.get(key) if shared is not None else None
+        if stored is None:
+            return None
+        claims, expires_at = stored
+        if expires_at <= time.time():
+            return None
+        self.local.set(key, CacheEntry(claims, time.time(), expires_at))
+        return claims
+
+    def set(self, id_token, claims):
+        now = time.time()
+        expires_at = min(claims.get('exp', now), now + settings.FIREBASE_TOKEN_CACHE_TTL)
+        if expires_at <= now:
+            return
+        key = self.key(id_token)
+        self.local.set(key, CacheEntry(claims, now, expires_at))
+        shared = self.shared
+        if shared is not None:
+            shared.set(key, (claims, expires_at), max(1, int(expires_at - now)))
+
+    def clear(self):
+        self.local.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+# Guarda as chaves públicas do Google (certificados que assinam os tokens) no cache
+# compartilhado do Django, respeitando o Cache-Control da resposta: os workers baixam as
+# chaves uma vez só, em vez de cada processo buscar as suas.
+class SharedCertificateCache(BaseCache):
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key):
+        return self.cache.get('firebase-certs:' + key)
+
+    def set(self, key, value, expires=None):
+        if isinstance(expires, datetime.datetime):
+            expires = (expires - datetime.datetime.now(expires.tzinfo)).total_seconds()
+        self.cache.set('firebase-certs:' + key, value, None if expires is None else max(1, int(expires)))
+
+    def delete(self, key):
+        self.cache.delete('firebase-certs:' + key)
+
+
+def _certificate_request():
+    # Transporte que o firebase_admin usa para baixar os certificados (já com cache HTTP por
+    # processo), ou None se o app do Firebase não foi inicializado
+    try:
+        app = firebase_admin.get_app()
+    except ValueError:
+        return None
+    return auth._get_client(app)._token_verifier.request
+
+
+def share_public_keys():
+    """Troca o cache HTTP dos certificados do firebase_admin pelo cache compartilhado, se houver."""
+    alias = settings.FIREBASE_SHARED_CACHE
+    certificate_request = _certificate_request()
+    if alias and certificate_request is not None:
+        CacheControl(certificate_request.session, cache=SharedCertificateCache(caches[alias]))
+
+
+def prewarm_public_keys():
+    """Baixa os certificados antes da primeira requisição (chamado ao iniciar cada worker)."""
+    certificate_request = _certificate_request()
+    if certificate_request is None:
+        return
+    try:
+        certificate_request(url=ID_TOKEN_CERT_URL)
+    except Exception:
+        logger.warning("Falha ao pré-carregar as chaves públicas do Firebase", exc_info=True)
+
+
+share_public_keys()
+
+
+# Usuários já provisionados neste processo (uid -> User). Uma entrada só é usada enquanto o
+# email e o nome batem com as claims do token; se mudarem no Firebase, o usuário é atualizado.
+user_cache = LRUCache(settings.FIREBASE_USER_CACHE_MAX_ENTRIES)
+# Requisições simultâneas do mesmo usuário novo fazem um único upsert neste processo
+user_provisioning = SingleFlight()
+
+
+def upsert_user(uid, email, name):
+    """
+    Cria o usuário ou atualiza email e nome num único INSERT ... ON CONFLICT (ON DUPLICATE KEY
+    UPDATE no MySQL), sem a corrida entre get e create de requisições simultâneas.
+    """
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['id']
+    User.objects.bulk_create(
+        [User(id=uid, email=email, name=name)], update_conflicts=True, update_fields=['email', 'name'], **options
+    )
+    return User.objects.get(id=uid)
+
+
+def get_or_provision_user(uid, email, name):
+    user = user_cache.get(uid)
+    if user is not None and user.email == email and user.name == name:
+        return user
+    try:
+        user = user_provisioning.do(uid, lambda: upsert_user(uid, email, name))
+    except (IntegrityError, User.DoesNotExist):
+        # O email do token já pertence a outro uid no banco
+        raise exceptions.AuthenticationFailed('Este email já está vinculado a outra conta.')
+    user_cache.set(uid, user)
+    return user
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.delete(instance.pk)
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
+        # Tempo de autenticação no Server-Timing e em /api/metrics/ (só requisições com token)
+        started = time.perf_counter()
+        try:
+            return self._authenticate(request)
+        finally:
+            if request.META.get('HTTP_AUTHORIZATION'):
+                record_auth(time.perf_counter() - started)
+
+    def _authenticate(self, request):
         # 1. Pega o token do header "Authorization"
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         if not auth_header:
@@ -30,25 +199,23 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         if not id_token:
             return None
 
-        try:
-            # 3. Valida o token com o Firebase Admin
-            decoded_token = auth.verify_id_token(id_token)
-        except Exception as e:
-            raise exceptions.AuthenticationFailed(f'Token inválido: {e}')
+        # 3. Token já verificado antes: reaproveita as claims; senão, valida com o Firebase Admin
+        decoded_token = verified_tokens.get(id_token)
+        if decoded_token is None:
+            try:
+                decoded_token = auth.verify_id_token(id_token)
+            except Exception as e:
+                raise exceptions.AuthenticationFailed(f'Token inválido: {e}')
 
-        if not decoded_token:
-            return None
-        
-        # 4. Pega o UID (ID do Firebase)
+            if not decoded_token:
+                return None
+            verified_tokens.set(id_token, decoded_token)
+
+        # 4. Pega o UID (ID do Firebase), o email e o nome
         uid = decoded_token.get('uid')
         email = decoded_token.get('email')
-        
-        try:
-            # 5. Tenta encontrar o usuário no banco de dados
-            user = User.objects.get(id=uid)
-            return (user, None)
-        
-        except User.DoesNotExist:
-            # 6. Se for o primeiro login, cria o usuário no banco de dados
-            user = User.objects.create(id=uid, email=email)
-            return (user, None)
\ No newline at end of file
+        name = decoded_token.get('name')
+
+        # 5. Busca o usuário (no cache do processo ou no banco), criando-o no primeiro login
+        user = get_or_provision_user(uid, email, name)
+        return (user, None)
@@ -0,0 +1,264 @@
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Movie
+from .tmdb import TMDbMetrics, movie_detail_request
+from .tmdb_cache import TMDbCache, tmdb_cache
+
+logger = logging.getLogger(__name__)
+
+# Catálogo local de filmes (modelo Movie), alimentado pelas respostas do proxy do TMDb.
+
+# Endpoints do TMDb cujas respostas trazem uma lista de filmes em "results"
+MOVIE_LIST_ENDPOINTS = {
+    "/movie/popular",
+    "/movie/top_rated",
+    "/movie/now_playing",
+    "/movie/upcoming",
+    "/trending/movie/day",
+    "/trending/movie/week",
+    "/discover/movie",
+    "/search/movie",
+}
+
+# Campos presentes nas listas do TMDb; runtime e o documento completo só vêm em /movie/{id}
+SUMMARY_FIELDS = [
+    'title', 'original_title', 'overview', 'poster_path', 'backdrop_path', 'original_language',
+    'adult', 'genre_ids', 'release_date', 'popularity', 'vote_average', 'vote_count', 'fetched_at',
+]
+DETAIL_FIELDS = SUMMARY_FIELDS + ['runtime', 'watch_provider_ids', 'details', 'details_fetched_at']
+# Colunas de Movie necessárias para montar um filme no formato das listas do TMDb
+SUMMARY_COLUMNS = [
+    'tmdb_id', 'title', 'original_title', 'overview', 'poster_path', 'backdrop_path', 'original_language',
+    'adult', 'genre_ids', 'release_date', 'popularity', 'vote_average', 'vote_count',
+]
+PAGE_SIZE = 20
+
+
+def parse_release_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def movie_from_tmdb(data, now):
+    """Converte um filme no formato do TMDb (lista ou detalhes) num Movie não salvo."""
+    genre_ids = data.get('genre_ids')
+    if genre_ids is None:
+        genre_ids = [genre['id'] for genre in data.get('genres', [])]
+    return Movie(
+        tmdb_id=data['id'],
+        title=(data.get('title') or data.get('original_title') or '')[:255],
+        original_title=(data.get('original_title') or '')[:255],
+        overview=data.get('overview') or '',
+        poster_path=data.get('poster_path'),
+        backdrop_path=data.get('backdrop_path'),
+        original_language=data.get('original_language') or '',
+        adult=bool(data.get('adult', False)),
+        genre_ids=genre_ids,
+        release_date=parse_release_date(data.get('release_date')),
+        runtime=data.get('runtime'),
+        popularity=data.get('popularity') or 0,
+        vote_average=data.get('vote_average') or 0,
+        vote_count=data.get('vote_count') or 0,
+        fetched_at=now,
+    )
+
+
+def movie_summary(row):
+    """Inverso de movie_from_tmdb: um dict de Movie.values(*SUMMARY_COLUMNS) no formato das listas do TMDb."""
+    return {
+        "adult": row['adult'],
+        "backdrop_path": row['backdrop_path'],
+        "genre_ids": row['genre_ids'],
+        "id": row['tmdb_id'],
+        "original_language": row['original_language'],
+        "original_title": row['original_title'],
+        "overview": row['overview'],
+        "popularity": row['popularity'],
+        "poster_path": row['poster_path'],
+        "release_date": row['release_date'].isoformat() if row['release_date'] else "",
+        "title": row['title'],
+        "video": False,
+        "vote_average": row['vote_average'],
+        "vote_count": row['vote_count'],
+    }
+
+
+def results_page(results, page, total_results=None):
+    """Resposta paginada no formato do TMDb; `results` já é a página pedida se `total_results` for dado."""
+    if total_results is None:
+        total_results = len(results)
+        results = results[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    return {
+        "page": page,
+        "results": results,
+        "total_pages": -(-total_results // PAGE_SIZE),
+        "total_results": total_results,
+    }
+
+
+def movie_summaries(movie_ids):
+    """Filmes de `movie_ids` no formato das listas do TMDb, na mesma ordem (ids fora do catálogo ficam de fora)."""
+    rows = {row['tmdb_id']: row for row in Movie.objects.filter(tmdb_id__in=movie_ids).values(*SUMMARY_COLUMNS)}
+    return [movie_summary(rows[movie_id]) for movie_id in movie_ids if movie_id in rows]
+
+
+def bulk_upsert_movies(movies, update_fields, batch_size=500):
+    # Um INSERT ... ON DUPLICATE KEY UPDATE por lote. Ids repetidos no lote: vale o último.
+    movies = list({movie.tmdb_id: movie for movie in movies}.values())
+    if not movies:
+        return 0
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['tmdb_id']
+    Movie.objects.bulk_create(
+        movies, batch_size=batch_size, update_conflicts=True, update_fields=update_fields, **options
+    )
+    return len(movies)
+
+
+def upsert_movie_summaries(results):
+    now = timezone.now()
+    return bulk_upsert_movies(
+        [movie_from_tmdb(item, now) for item in results if item.get('id')], SUMMARY_FIELDS
+    )
+
+
+def watch_provider_ids(data, region='BR'):
+    """Ids dos provedores de `region` em data["watch/providers"] (qualquer modalidade), ou None se não vieram."""
+    providers = data.get('watch/providers')
+    if providers is None:
+        return None
+    offers = (providers.get('results') or {}).get(region) or {}
+    return sorted({
+        provider['provider_id']
+        for entries in offers.values() if isinstance(entries, list)
+        for provider in entries
+    })
+
+
+def upsert_movie_details(data):
+    now = timezone.now()
+    movie = movie_from_tmdb(data, now)
+    movie.watch_provider_ids = watch_provider_ids(data)
+    movie.details = data
+    movie.details_fetched_at = now
+    return bulk_upsert_movies([movie], DETAIL_FIELDS)
+
+
+def ensure_movie(tmdb_id, movie_data):
+    """
+    Garante que o filme existe no catálogo, criando-o com os dados enviados pelo frontend
+    se ainda não existir. Dados que já vieram do TMDb nunca são sobrescritos.
+    """
+    ensure_movies({tmdb_id: movie_data})
+
+
+def ensure_movies(movie_data_by_id, batch_size=500):
+    """Versão em lote de ensure_movie: {tmdb_id: movie_data} num INSERT ... IGNORE por lote."""
+    Movie.objects.bulk_create([
+        Movie(
+            tmdb_id=tmdb_id,
+            title=(movie_data.get('title') or 'N/A')[:255],
+            poster_path=movie_data.get('poster_path', ''),
+            vote_average=movie_data.get('rating') or 0,
+        )
+        for tmdb_id, movie_data in movie_data_by_id.items()
+    ], batch_size=batch_size, ignore_conflicts=True)
+
+
+def fresh_details(tmdb_id):
+    """Documento completo do filme se foi buscado no TMDb há menos de TMDB_CATALOG_DETAIL_TTL."""
+    fresh_since = timezone.now() - datetime.timedelta(seconds=settings.TMDB_CATALOG_DETAIL_TTL)
+    return (
+        Movie.objects
+        .filter(tmdb_id=tmdb_id, details_fetched_at__gte=fresh_since)
+        .values_list('details', flat=True)
+        .first()
+    )
+
+
+def is_standard_detail_request(path, params):
+    # Só a chamada de detalhes padrão (mesmo idioma e append_to_response) vai para o catálogo
+    movie_id = path.rsplit('/', 1)[-1]
+    return movie_id.isdigit() and TMDbCache.normalize(path, params) == TMDbCache.normalize(
+        *movie_detail_request(int(movie_id))
+    )
+
+
+def record_tmdb_payload(path, params, data):
+    """Listener do tmdb_cache: atualiza o catálogo com cada resposta nova do TMDb."""
+    endpoint = TMDbMetrics.endpoint_name(path)
+    if endpoint == '/movie/{id}' and is_standard_detail_request(path, params):
+        upsert_movie_details(data)
+    elif endpoint in MOVIE_LIST_ENDPOINTS and isinstance(data, dict):
+        upsert_movie_summaries(data.get('results') or [])
+
+
+def detail_source(path, params):
+    """Fonte do tmdb_cache para /movie/{id}: responde do catálogo enquanto os detalhes estão frescos."""
+    if not is_standard_detail_request(path, params):
+        return None
+    return fresh_details(int(path.rsplit('/', 1)[-1]))
+
+
+class CatalogIndex:
+    """
+    Base dos índices em memória sobre o catálogo (busca, discover). Guarda o índice atual e o
+    remonta em segundo plano, no executor do tmdb_cache, a cada TMDB_CATALOG_INDEX_REFRESH segundos.
+    """
+    name = "catálogo"
+
+    def __init__(self):
+        self._index = None
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def build(self):
+        raise NotImplementedError
+
+    @property
+    def index(self):
+        """Índice atual, ou None enquanto o primeiro ainda está sendo montado."""
+        index = self._index
+        if index is None or time.monotonic() - self._built_at > settings.TMDB_CATALOG_INDEX_REFRESH:
+            self.rebuild_in_background()
+        return index
+
+    def rebuild(self):
+        index = self.build()
+        self._index, self._built_at = index, time.monotonic()
+        return index
+
+    def rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild():
+            try:
+                started = time.perf_counter()
+                index = self.rebuild()
+                logger.info("Índice de %s montado: %d filmes em %.2fs", self.name, len(index), time.perf_counter() - started)
+            except Exception:
+                logger.warning("Falha ao montar o índice de %s", self.name, exc_info=True)
+            finally:
+                self._rebuilding = False
+                close_old_connections()
+
+        tmdb_cache.executor.submit(rebuild)
+
+
+def connect():
+    tmdb_cache.add_listener(record_tmdb_payload)
+    tmdb_cache.add_source('/movie/{id}', detail_source)
@@ -0,0 +1,93 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+# Leituras nas réplicas do MySQL (DATABASE_REPLICAS). Por padrão tudo vai para o primário; só as
+# views de leitura marcadas com ReplicaReadMixin liberam as réplicas, e só para a requisição
+# corrente. Depois de uma escrita, o usuário fica preso ao primário por DB_READ_YOUR_WRITES_TTL
+# segundos (read_your_writes.pin), para nunca ler da réplica uma lista mais velha que a própria
+# alteração. Sem cache compartilhado (DB_READ_YOUR_WRITES_CACHE) a marca não alcançaria os outros
+# workers, e então as leituras de usuários autenticados ficam sempre no primário.
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+@receiver(request_started)
+def reset_replica_reads(sender, **kwargs):
+    # No WSGI a thread (e o contexto) é reaproveitada entre requisições
+    _replica_reads.set(False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReadYourWrites:
+    """Usuários que escreveram há pouco, no cache compartilhado para valer entre workers."""
+
+    @property
+    def cache(self):
+        if settings.DB_READ_YOUR_WRITES_CACHE is None:
+            return None
+        return caches[settings.DB_READ_YOUR_WRITES_CACHE]
+
+    @staticmethod
+    def key(user_id):
+        return f'db-primary:{user_id}'
+
+    def pin(self, user_id):
+        cache = self.cache
+        if settings.DATABASE_REPLICAS and cache is not None:
+            cache.set(self.key(user_id), 1, settings.DB_READ_YOUR_WRITES_TTL)
+
+    def is_pinned(self, user_id):
+        if not settings.DATABASE_REPLICAS:
+            return False
+        cache = self.cache
+        # Sem cache compartilhado não dá para saber se outro worker recebeu uma escrita
+        return cache is None or cache.get(self.key(user_id)) is not None
+
+
+read_your_writes = ReadYourWrites()
+
+
+def use_replicas(enabled=True):
+    """Libera (ou volta a proibir) as réplicas no restante da requisição corrente."""
+    _replica_reads.set(enabled)
+
+
+class ReplicaReadMixin:
+    """
+    Views do DRF cujos GETs podem ler das réplicas. Em viewsets, `replica_actions` limita
+    as ações (ex: {'list', 'retrieve'}). A autenticação roda antes, sempre no primário.
+    """
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        use_replicas(self.reads_from_replica(request))
+
+    def reads_from_replica(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if self.replica_actions is not None and getattr(self, 'action', None) not in self.replica_actions:
+            return False
+        user_id = getattr(request.user, 'pk', None)
+        return not (user_id and read_your_writes.is_pinned(user_id))
@@ -0,0 +1,262 @@
+import bisect
+import datetime
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+
+from .catalog import PAGE_SIZE, CatalogIndex, movie_summaries, results_page
+from .models import Movie
+from .tmdb import MAX_PAGE
+from .tmdb_cache import tmdb_cache
+
+# Discover local: responde /discover/movie com os filtros e ordenações mais usados pelo
+# frontend a partir de índices em memória sobre o catálogo (listas de posições por gênero,
+# ano, idioma e provedor, e campos ordenados para nota, votos e data de lançamento).
+# Qualquer parâmetro que o índice não conhece faz a chamada seguir para o TMDb.
+
+# Parâmetros que build_discover_request sempre envia, com os valores que o catálogo atende
+FIXED_PARAMS = {
+    'language': 'pt-BR',
+    'watch_region': 'BR',
+    'certification_country': 'BR',
+    'include_adult': 'false',
+    'include_video': 'false',
+}
+# Ordenações suportadas (sort_by=<campo>.<asc|desc>) -> campo ordenado do índice
+SORT_FIELDS = {
+    'popularity': 'popularity',
+    'vote_average': 'vote_average',
+    'vote_count': 'vote_count',
+    'primary_release_date': 'release_date',
+    # Aproximação: o catálogo só guarda a data de lançamento principal
+    'release_date': 'release_date',
+}
+# Filtros de intervalo: parâmetro -> (campo ordenado, conversor do valor)
+RANGE_PARAMS = {
+    'vote_average.gte': ('vote_average', float),
+    'vote_average.lte': ('vote_average', float),
+    'vote_count.gte': ('vote_count', int),
+    'vote_count.lte': ('vote_count', int),
+    'primary_release_date.gte': ('release_date', lambda value: datetime.date.fromisoformat(value).toordinal()),
+    'primary_release_date.lte': ('release_date', lambda value: datetime.date.fromisoformat(value).toordinal()),
+    'release_date.gte': ('release_date', lambda value: datetime.date.fromisoformat(value).toordinal()),
+    'release_date.lte': ('release_date', lambda value: datetime.date.fromisoformat(value).toordinal()),
+}
+
+
+def parse_id_list(value):
+    """"28,12" -> ('all', [28, 12]); "28|12" -> ('any', [28, 12]), como no TMDb."""
+    mode = 'any' if '|' in value else 'all'
+    return mode, [int(item) for item in value.replace('|', ',').split(',') if item.strip()]
+
+
+def parse_discover_params(params):
+    """
+    Traduz os parâmetros de /discover/movie num dicionário de filtros do DiscoverIndex,
+    ou None se algum parâmetro (ou valor) não pode ser respondido localmente.
+    """
+    if isinstance(params, dict):
+        params = list(params.items())
+    keys = [key for key, _ in params or []]
+    if len(keys) != len(set(keys)):
+        return None
+
+    query = {'page': 1, 'sort': ('popularity', True), 'ranges': []}
+    try:
+        for key, value in params or []:
+            value = str(value).strip()
+            if not value:
+                continue
+            if key in FIXED_PARAMS:
+                if value != FIXED_PARAMS[key]:
+                    return None
+            elif key == 'page':
+                query['page'] = int(value)
+                if not 1 <= query['page'] <= MAX_PAGE:
+                    return None
+            elif key == 'sort_by':
+                field, _, direction = value.rpartition('.')
+                if field not in SORT_FIELDS or direction not in ('asc', 'desc'):
+                    return None
+                query['sort'] = (SORT_FIELDS[field], direction == 'desc')
+            elif key == 'with_genres':
+                query['genres'] = parse_id_list(value)
+            elif key == 'without_genres':
+                query['without_genres'] = parse_id_list(value)[1]
+            elif key == 'with_watch_providers':
+                query['providers'] = parse_id_list(value)
+            elif key == 'with_original_language':
+                query['languages'] = [code.strip() for code in value.replace('|', ',').split(',') if code.strip()]
+            elif key in ('primary_release_year', 'year'):
+                query['year'] = int(value)
+            elif key in RANGE_PARAMS:
+                field, convert = RANGE_PARAMS[key]
+                bound = convert(value)
+                low, high = (bound, None) if key.endswith('.gte') else (None, bound)
+                query['ranges'].append((field, low, high))
+            else:
+                return None
+    except ValueError:
+        return None
+    return query
+
+
+class SortedField:
+    """Posições dos filmes em ordem crescente de um campo (filmes sem valor ficam de fora)."""
+
+    def __init__(self, values):
+        order = sorted((position for position, value in enumerate(values) if value is not None),
+                       key=lambda position: (values[position], position))
+        self.order = array('i', order)
+        self.keys = [values[position] for position in order]
+        self.rank = array('i', [-1]) * len(values)
+        for rank, position in enumerate(order):
+            self.rank[position] = rank
+
+    def between(self, low=None, high=None):
+        start = 0 if low is None else bisect.bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect.bisect_right(self.keys, high)
+        return set(self.order[start:end])
+
+    def top(self, candidates, descending, limit):
+        """As `limit` primeiras posições de `candidates` nesta ordem; filmes sem valor vão para o fim."""
+        if len(candidates) * 8 < len(self.order):
+            # Poucos candidatos: mais barato ordenar só eles
+            ranked = sorted((p for p in candidates if self.rank[p] >= 0), key=self.rank.__getitem__, reverse=descending)
+            ranked = ranked[:limit]
+        else:
+            ranked = []
+            for position in (reversed(self.order) if descending else self.order):
+                if position in candidates:
+                    ranked.append(position)
+                    if len(ranked) == limit:
+                        break
+        if len(ranked) < limit:
+            ranked += sorted(p for p in candidates if self.rank[p] < 0)[:limit - len(ranked)]
+        return ranked
+
+
+class DiscoverIndex:
+    """
+    Índice imutável do discover. Os filmes são numerados por popularidade decrescente, então
+    a posição de um filme já é a sua ordem em sort_by=popularity.desc.
+    """
+
+    def __init__(self, rows):
+        self.movie_ids = array('i')
+        self.by_genre = defaultdict(set)
+        self.by_year = defaultdict(set)
+        self.by_language = defaultdict(set)
+        self.by_provider = defaultdict(set)
+        self.with_providers = 0
+        values = {'vote_average': [], 'vote_count': [], 'release_date': []}
+        for position, row in enumerate(rows):
+            self.movie_ids.append(row['tmdb_id'])
+            for genre_id in row['genre_ids'] or []:
+                self.by_genre[genre_id].add(position)
+            self.by_language[row['original_language']].add(position)
+            if row['watch_provider_ids'] is not None:
+                self.with_providers += 1
+                for provider_id in row['watch_provider_ids']:
+                    self.by_provider[provider_id].add(position)
+            release_date = row['release_date']
+            if release_date:
+                self.by_year[release_date.year].add(position)
+            values['release_date'].append(release_date.toordinal() if release_date else None)
+            values['vote_average'].append(row['vote_average'])
+            values['vote_count'].append(row['vote_count'])
+        self.fields = {name: SortedField(field_values) for name, field_values in values.items()}
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    @property
+    def provider_coverage(self):
+        return self.with_providers / len(self) if len(self) else 0.0
+
+    @staticmethod
+    def _combine(postings, mode, ids):
+        sets = [postings.get(item, set()) for item in ids]
+        if not sets:
+            return set()
+        return set().union(*sets) if mode == 'any' else set.intersection(*sets)
+
+    def filter(self, query):
+        """Posições dos filmes que passam por todos os filtros de `query`."""
+        candidates = None
+
+        def narrow(positions):
+            nonlocal candidates
+            candidates = set(positions) if candidates is None else candidates & positions
+
+        if 'genres' in query:
+            narrow(self._combine(self.by_genre, *query['genres']))
+        if 'providers' in query:
+            narrow(self._combine(self.by_provider, *query['providers']))
+        if 'languages' in query:
+            narrow(self._combine(self.by_language, 'any', query['languages']))
+        if 'year' in query:
+            narrow(self.by_year.get(query['year'], set()))
+        for field, low, high in query['ranges']:
+            narrow(self.fields[field].between(low, high))
+        if candidates is None:
+            candidates = set(range(len(self)))
+        if 'without_genres' in query:
+            candidates -= self._combine(self.by_genre, 'any', query['without_genres'])
+        return candidates
+
+    def discover(self, query, limit):
+        """(ids das `limit` primeiras posições na ordem pedida, total de filmes encontrados)."""
+        candidates = self.filter(query)
+        field, descending = query['sort']
+        if field == 'popularity':
+            ranked = (heapq.nsmallest if descending else heapq.nlargest)(limit, candidates)
+        else:
+            ranked = self.fields[field].top(candidates, descending, limit)
+        return [self.movie_ids[position] for position in ranked], len(candidates)
+
+
+class CatalogDiscover(CatalogIndex):
+    name = "discover"
+
+    def build(self):
+        return DiscoverIndex(
+            Movie.objects
+            .filter(fetched_at__isnull=False, adult=False)
+            .order_by('-popularity', 'tmdb_id')
+            .values('tmdb_id', 'genre_ids', 'original_language', 'release_date', 'vote_average',
+                    'vote_count', 'watch_provider_ids')
+            .iterator(chunk_size=2000)
+        )
+
+    def discover_page(self, query):
+        """Página pedida do discover no formato do TMDb, ou None se o catálogo não cobre a consulta."""
+        index = self.index
+        if index is None or len(index) < settings.TMDB_DISCOVER_MIN_CATALOG:
+            return None
+        if 'providers' in query and index.provider_coverage < settings.TMDB_DISCOVER_MIN_PROVIDER_COVERAGE:
+            return None
+        page = query['page']
+        movie_ids, total = index.discover(query, page * PAGE_SIZE)
+        # Só responde páginas completas: uma página curta pode ser só o catálogo que acabou
+        if total < page * PAGE_SIZE:
+            return None
+        return results_page(movie_summaries(movie_ids[(page - 1) * PAGE_SIZE:]), page, total)
+
+
+catalog_discover = CatalogDiscover()
+
+
+def discover_source(path, params):
+    """Fonte do tmdb_cache para /discover/movie: responde dos índices locais quando eles cobrem a consulta."""
+    query = parse_discover_params(params)
+    if query is None:
+        return None
+    return catalog_discover.discover_page(query)
+
+
+def connect():
+    if settings.TMDB_DISCOVER_INDEX:
+        tmdb_cache.add_source('/discover/movie', discover_source)
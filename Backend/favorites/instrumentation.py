@@ -0,0 +1,197 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Instrumentação por requisição: o ServerTimingMiddleware abre um RequestTimings no início de
+# cada requisição, e os ganchos no banco (execute_wrapper), no cliente do TMDb, no tmdb_cache e no
+# FirebaseAuthentication somam nele o que gastaram. Os totais vão para o cabeçalho Server-Timing
+# e para os histogramas de /api/metrics/ (formato de texto do Prometheus, por processo).
+
+
+class RequestTimings:
+    __slots__ = ('started', 'db_queries', 'db_time', 'upstream_calls', 'upstream_time', 'upstream_status', 'cache', 'auth_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.upstream_calls = 0
+        self.upstream_time = 0.0
+        self.upstream_status = None
+        self.cache = {}
+        self.auth_time = None
+
+    def server_timing(self, total):
+        # Durações em milissegundos, como pede o Server-Timing
+        parts = [f'app;dur={total * 1000:.1f}']
+        if self.db_queries:
+            parts.append(f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"')
+        if self.upstream_calls:
+            parts.append(f'tmdb;dur={self.upstream_time * 1000:.1f};desc="{self.upstream_calls} calls, {self.upstream_status}"')
+        if self.cache:
+            parts.append('cache;desc="%s"' % ' '.join(f'{status}={count}' for status, count in sorted(self.cache.items())))
+        if self.auth_time is not None:
+            parts.append(f'auth;dur={self.auth_time * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_db_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # A lista de wrappers sobrevive às reconexões da mesma conexão
+    if record_db_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_db_query)
+
+
+def format_labels(pairs):
+    labels = ','.join(f'{name}="{value}"' for name, value in pairs)
+    return f'{{{labels}}}' if labels else ''
+
+
+class Histogram:
+    """Histograma cumulativo com rótulos, seguro entre threads."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for label_values, (counts, total) in sorted(series.items()):
+            pairs = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{self.name}_bucket{format_labels(pairs + [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(pairs)} {total:.6f}')
+            lines.append(f'{self.name}_count{format_labels(pairs)} {cumulative}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{format_labels(zip(self.labels, label_values))} {value}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+request_duration = Histogram('http_request_duration_seconds', 'Tempo total da requisição', ('route', 'method', 'status'), SECONDS_BUCKETS)
+request_db_duration = Histogram('http_request_db_seconds', 'Tempo no banco por requisição', ('route',), SECONDS_BUCKETS)
+request_db_queries = Histogram('http_request_db_queries', 'Consultas ao banco por requisição', ('route',), QUERY_BUCKETS)
+auth_duration = Histogram('firebase_auth_duration_seconds', 'Tempo de autenticação do token do Firebase', (), SECONDS_BUCKETS)
+tmdb_duration = Histogram('tmdb_request_duration_seconds', 'Tempo das chamadas ao TMDb (com retries)', ('endpoint', 'status'), SECONDS_BUCKETS)
+tmdb_cache_results = Counter('tmdb_cache_results_total', 'Consultas ao tmdb_cache por resultado', ('status',))
+
+METRICS = [request_duration, request_db_duration, request_db_queries, auth_duration, tmdb_duration, tmdb_cache_results]
+
+
+# Métodos que viram rótulo; qualquer outro (o cliente escolhe o método) é contado como "other",
+# para que requisições com métodos inventados não criem séries novas sem limite
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+OTHER_METHOD = 'other'
+
+
+def record_request(route, method, status_code, timings, total):
+    method = method if method in METHODS else OTHER_METHOD
+    request_duration.observe(total, route, method, str(status_code))
+    request_db_duration.observe(timings.db_time, route)
+    request_db_queries.observe(timings.db_queries, route)
+
+
+def record_upstream(endpoint, elapsed, status_code):
+    status = str(status_code) if status_code is not None else 'error'
+    tmdb_duration.observe(elapsed, endpoint, status)
+    timings = _current.get()
+    if timings is not None:
+        timings.upstream_calls += 1
+        timings.upstream_time += elapsed
+        timings.upstream_status = status
+
+
+def record_cache(status):
+    tmdb_cache_results.inc(status)
+    timings = _current.get()
+    if timings is not None:
+        timings.cache[status] = timings.cache.get(status, 0) + 1
+
+
+def record_auth(elapsed):
+    auth_duration.observe(elapsed)
+    timings = _current.get()
+    if timings is not None:
+        timings.auth_time = (timings.auth_time or 0.0) + elapsed
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from favorites.catalog import SUMMARY_FIELDS, bulk_upsert_movies, movie_from_tmdb
+from favorites.tmdb import TokenBucket, tmdb_client
+
+# Listas paginadas do TMDb que alimentam o catálogo local
+SOURCES = {
+    'discover': ('/discover/movie', {'language': 'pt-BR', 'sort_by': 'popularity.desc', 'include_adult': 'false'}),
+    'popular': ('/movie/popular', {'language': 'pt-BR'}),
+    'top_rated': ('/movie/top_rated', {'language': 'pt-BR'}),
+}
+# O TMDb não devolve páginas depois da 500
+TMDB_MAX_PAGES = 500
+
+
+class Checkpoint:
+    """Páginas já gravadas no banco, por fonte, persistidas num arquivo JSON."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.sources = {}
+        if self.path.is_file():
+            self.sources = json.loads(self.path.read_text(encoding='utf-8')).get('sources', {})
+
+    def source(self, name):
+        return self.sources.setdefault(name, {'total_pages': None, 'done': []})
+
+    def done_pages(self, name):
+        return set(self.source(name)['done'])
+
+    def mark_done(self, name, pages):
+        state = self.source(name)
+        state['done'] = sorted(set(state['done']) | set(pages))
+
+    def save(self):
+        # Escrita atômica: um Ctrl+C no meio nunca deixa o checkpoint corrompido
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp_path.write_text(json.dumps({'sources': self.sources}), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.sources = {}
+        if self.path.is_file():
+            self.path.unlink()
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o catálogo local (Movie) paginando /discover/movie, /movie/popular e /movie/top_rated "
+        "em paralelo, com limite global de requisições e checkpoint para retomar após interrupções."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sources', default=','.join(SOURCES), help=f"fontes separadas por vírgula ({', '.join(SOURCES)})")
+        parser.add_argument('--pages', type=int, default=TMDB_MAX_PAGES, help='máximo de páginas por fonte')
+        parser.add_argument('--workers', type=int, default=8, help='threads buscando páginas em paralelo')
+        parser.add_argument('--rate', type=float, default=settings.TMDB_INGEST_RATE_LIMIT, help='máximo de requisições por segundo ao TMDb (somando todas as threads)')
+        parser.add_argument('--batch-size', type=int, default=500, help='filmes por upsert no banco')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.ingest_tmdb_checkpoint.json'))
+        parser.add_argument('--reset', action='store_true', help='ignora o checkpoint e começa do zero')
+
+    def handle(self, *args, **options):
+        sources = [name.strip() for name in options['sources'].split(',') if name.strip()]
+        unknown = set(sources) - set(SOURCES)
+        if unknown:
+            raise CommandError(f"Fonte(s) desconhecida(s): {', '.join(sorted(unknown))}")
+
+        self.max_pages = max(1, min(options['pages'], TMDB_MAX_PAGES))
+        self.batch_size = options['batch_size']
+        self.limiter = TokenBucket(options['rate'])
+        self.checkpoint = Checkpoint(options['checkpoint'])
+        if options['reset']:
+            self.checkpoint.reset()
+
+        self.buffer = []
+        self.buffered_pages = {}
+        self.pages_fetched = 0
+        self.rows_written = 0
+        self.failed_pages = []
+        self.started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='ingest') as executor:
+            # A página 1 de cada fonte diz quantas páginas existem; depois o resto vai em paralelo
+            first_pages = [(name, 1) for name in sources if self.checkpoint.source(name)['total_pages'] is None]
+            self.run_jobs(executor, first_pages)
+            self.flush()
+            pending = []
+            for name in sources:
+                total = min(self.checkpoint.source(name)['total_pages'] or 1, self.max_pages)
+                done = self.checkpoint.done_pages(name)
+                pending += [(name, page) for page in range(1, total + 1) if page not in done]
+            self.run_jobs(executor, pending)
+        self.flush()
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.pages_fetched} páginas e {self.rows_written} filmes em {elapsed:.1f}s "
+            f"({self.pages_fetched / elapsed:.1f} páginas/s, {self.rows_written / elapsed:.1f} filmes/s)"
+        ))
+        if self.failed_pages:
+            self.stderr.write(
+                f"{len(self.failed_pages)} página(s) falharam e serão tentadas de novo na próxima execução: "
+                + ', '.join(f"{name}#{page}" for name, page in self.failed_pages[:20])
+            )
+
+    def fetch_page(self, name, page):
+        path, params = SOURCES[name]
+        self.limiter.acquire()
+        return tmdb_client.get(path, dict(params, page=page))
+
+    def run_jobs(self, executor, jobs):
+        futures = {executor.submit(self.fetch_page, name, page): (name, page) for name, page in jobs}
+        for future in as_completed(futures):
+            name, page = futures[future]
+            try:
+                data = future.result()
+            except requests.RequestException as e:
+                self.failed_pages.append((name, page))
+                self.stderr.write(f"Falha em {name} página {page}: {e}")
+                continue
+            self.pages_fetched += 1
+            state = self.checkpoint.source(name)
+            if state['total_pages'] is None:
+                state['total_pages'] = data.get('total_pages') or 1
+            self.buffer += data.get('results') or []
+            self.buffered_pages.setdefault(name, []).append(page)
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self.buffered_pages:
+            now = timezone.now()
+            movies = [movie_from_tmdb(item, now) for item in self.buffer if item.get('id')]
+            self.rows_written += bulk_upsert_movies(movies, SUMMARY_FIELDS, batch_size=self.batch_size)
+            # Só marca as páginas como feitas depois que os filmes delas estão no banco
+            for name, pages in self.buffered_pages.items():
+                self.checkpoint.mark_done(name, pages)
+            self.checkpoint.save()
+            self.buffer, self.buffered_pages = [], {}
+
+            elapsed = time.perf_counter() - self.started
+            self.stdout.write(
+                f"  {self.pages_fetched} páginas, {self.rows_written} filmes "
+                f"({self.pages_fetched / elapsed:.1f} páginas/s, {self.rows_written / elapsed:.1f} filmes/s)"
+            )
@@ -0,0 +1,96 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from favorites.tmdb import MOVIE_LISTS, TRENDING_WINDOWS, movie_detail_request, movie_list_request, trending_request
+from favorites.tmdb_cache import UPSTREAM_ERRORS, tmdb_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Aquece o cache do TMDb antes que os usuários paguem o MISS: renova as listas (popular, "
+        "now_playing, top_rated, upcoming, trending do dia e da semana), os detalhes dos filmes "
+        "delas e as chaves mais pedidas (ranking de acessos), sempre que estão perto de vencer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='repete a cada ~N segundos, com variação de 10%% (0 = roda uma vez)')
+        parser.add_argument('--ahead', type=int, default=900, help='renova entradas que vencem nos próximos N segundos')
+        parser.add_argument('--details', type=int, default=100, help='máximo de filmes das listas com detalhes aquecidos')
+        parser.add_argument('--hot', type=int, default=200, help='quantas das chaves mais pedidas aquecer')
+        parser.add_argument('--workers', type=int, default=4, help='chamadas simultâneas (o limite de taxa do cliente continua valendo)')
+        parser.add_argument('--jitter', type=float, default=1.0, help='atraso aleatório de até N segundos antes de cada chamada')
+
+    def handle(self, *args, **options):
+        if tmdb_cache.shared is None:
+            self.stderr.write(
+                "Sem cache compartilhado (REDIS_URL): as entradas aquecidas só valem para este processo "
+                "(o catálogo e o índice de trailers no banco continuam sendo atualizados)."
+            )
+        while True:
+            self.prewarm(options)
+            if not options['interval']:
+                break
+            # Processos iniciados juntos se espalham com o tempo
+            time.sleep(options['interval'] * random.uniform(0.9, 1.1))
+            close_old_connections()
+
+    def warm_all(self, requests_to_warm, options):
+        """Aquece (path, params) em paralelo. Retorna {índice: data} e as contagens de cada resultado."""
+        def warm(path, params):
+            time.sleep(random.uniform(0, options['jitter']))
+            try:
+                data, cache_status = tmdb_cache.warm(path, params, ahead=options['ahead'])
+            except UPSTREAM_ERRORS as e:
+                self.stderr.write(f"Falha ao aquecer {tmdb_cache.normalize(path, params)}: {e}")
+                return None, 'failed'
+            finally:
+                # Fontes e listeners do cache podem ter aberto uma conexão nesta thread auxiliar
+                connections.close_all()
+            return data, 'warmed' if cache_status is not None else 'fresh'
+
+        results, counts = {}, {'warmed': 0, 'fresh': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='prewarm') as executor:
+            outcomes = executor.map(lambda request: warm(*request), requests_to_warm)
+            for index, (data, outcome) in enumerate(outcomes):
+                counts[outcome] += 1
+                if data is not None:
+                    results[index] = data
+        return results, counts
+
+    def prewarm(self, options):
+        started = time.perf_counter()
+        lists = [movie_list_request(name) for name in MOVIE_LISTS] + [trending_request(window) for window in TRENDING_WINDOWS]
+        list_data, list_counts = self.warm_all(lists, options)
+
+        # Detalhes dos filmes das listas, na ordem das listas e sem repetir
+        movie_ids = []
+        for index in sorted(list_data):
+            for movie in list_data[index].get('results', []):
+                if movie.get('id') is not None and movie['id'] not in movie_ids:
+                    movie_ids.append(movie['id'])
+        targets = {}
+        for movie_id in movie_ids[:options['details']]:
+            path, params = movie_detail_request(movie_id)
+            targets[tmdb_cache.normalize(path, params)] = (path, params)
+        detail_count = len(targets)
+
+        # Chaves mais pedidas que ainda não estão na rodada
+        listed = {tmdb_cache.normalize(path, params) for path, params in lists}
+        for path, params, _ in tmdb_cache.access.hottest(options['hot']):
+            normalized = tmdb_cache.normalize(path, params)
+            if normalized not in listed:
+                targets.setdefault(normalized, (path, params))
+        _, counts = self.warm_all(list(targets.values()), options)
+
+        elapsed = time.perf_counter() - started
+        warmed = list_counts['warmed'] + counts['warmed']
+        fresh = list_counts['fresh'] + counts['fresh']
+        failed = list_counts['failed'] + counts['failed']
+        self.stdout.write(self.style.SUCCESS(
+            f"{warmed} entradas aquecidas em {elapsed:.1f}s ({len(lists)} listas, {detail_count} detalhes, "
+            f"{len(targets) - detail_count} chaves populares; {fresh} ainda válidas, {failed} falhas)"
+        ))
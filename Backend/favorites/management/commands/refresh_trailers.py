@@ -0,0 +1,87 @@
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from favorites.models import Movie, MovieTrailer
+from favorites.tmdb import movie_videos_request, pick_official_trailer, tmdb_client, upstream_status
+from favorites.trailers import trailer_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Renova o índice de trailers (MovieTrailer): busca de novo os vídeos dos filmes cuja entrada "
+        "vence em breve e indexa os filmes mais populares do catálogo que ainda não estão no índice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=6 * 3600, help='renova entradas que vencem nos próximos N segundos')
+        parser.add_argument('--missing', type=int, default=1000, help='indexa até N filmes do catálogo sem entrada (por popularidade)')
+        parser.add_argument('--limit', type=int, default=5000, help='máximo de filmes por rodada')
+        parser.add_argument('--workers', type=int, default=8, help='chamadas simultâneas ao TMDb (o limite de taxa do cliente continua valendo)')
+        parser.add_argument('--batch-size', type=int, default=500, help='trailers por upsert no banco')
+        parser.add_argument('--interval', type=int, default=0, help='repete a cada N segundos (0 = roda uma vez)')
+
+    def handle(self, *args, **options):
+        while True:
+            self.refresh(options)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+            close_old_connections()
+
+    def due_movie_ids(self, ahead, missing, limit):
+        """Ids com entrada vencendo (as mais antigas primeiro), depois os populares ainda sem entrada."""
+        now = timezone.now()
+        renew_before = Q(trailer__isnull=False, fetched_at__lt=now - datetime.timedelta(seconds=settings.TMDB_TRAILER_INDEX_TTL - ahead))
+        renew_before |= Q(trailer__isnull=True, fetched_at__lt=now - datetime.timedelta(seconds=settings.TMDB_TRAILER_INDEX_NEGATIVE_TTL - ahead))
+        movie_ids = list(
+            MovieTrailer.objects.filter(renew_before).order_by('fetched_at').values_list('tmdb_id', flat=True)[:limit]
+        )
+        if missing and len(movie_ids) < limit:
+            movie_ids += list(
+                Movie.objects
+                .exclude(tmdb_id__in=MovieTrailer.objects.values('tmdb_id'))
+                .order_by('-popularity')
+                .values_list('tmdb_id', flat=True)[:min(missing, limit - len(movie_ids))]
+            )
+        return movie_ids
+
+    @staticmethod
+    def fetch_trailer(movie_id):
+        try:
+            return pick_official_trailer(tmdb_client.get(*movie_videos_request(movie_id)))
+        except requests.HTTPError as e:
+            # Filme removido do TMDb: fica no índice como "sem trailer"
+            if upstream_status(e) == 404:
+                return None
+            raise
+
+    def refresh(self, options):
+        started = time.perf_counter()
+        movie_ids = self.due_movie_ids(options['ahead'], options['missing'], options['limit'])
+        buffer, written, failed = {}, 0, 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='trailers') as executor:
+            futures = {executor.submit(self.fetch_trailer, movie_id): movie_id for movie_id in movie_ids}
+            for future in as_completed(futures):
+                try:
+                    buffer[futures[future]] = future.result()
+                except requests.RequestException as e:
+                    failed += 1
+                    self.stderr.write(f"Falha nos vídeos de {futures[future]}: {e}")
+                    continue
+                if len(buffer) >= options['batch_size']:
+                    written += trailer_index.store(buffer, batch_size=options['batch_size'])
+                    buffer = {}
+        written += trailer_index.store(buffer, batch_size=options['batch_size'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} trailers indexados em {elapsed:.1f}s ({len(movie_ids)} filmes na fila, {failed} falhas)"
+        ))
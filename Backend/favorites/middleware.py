@@ -0,0 +1,158 @@
+import gzip
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .instrumentation import end_request, record_request, start_request
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele as respostas saem só em gzip
+    brotli = None
+
+# Tipos de conteúdo que compensa comprimir
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript')
+# Sufixo que o ETag ganha em cada codificação ("abc" -> "abc-gzip")
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+ETAG_SUFFIX_RE = re.compile(r'-(?:br|gzip)"')
+
+
+def accepted_encodings(header):
+    """Codificações de Accept-Encoding que o cliente aceita (ignora as com q=0)."""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        quality = params.strip().replace(' ', '')
+        if quality.startswith('q=') and not quality[2:].strip('0.'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime fixo: o mesmo conteúdo sempre gera os mesmos bytes
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Comprime com brotli (se o pacote estiver instalado e o cliente aceitar) ou gzip as
+    respostas com mais de COMPRESSION_MIN_SIZE bytes. Diferente do GZipMiddleware do Django,
+    o ETag continua forte: ganha o sufixo da codificação, e o sufixo sai do If-None-Match antes
+    da comparação, para a revalidação (304) funcionar com a cópia comprimida do cliente.
+    Deve ficar no topo do MIDDLEWARE, para comprimir a resposta já pronta.
+    """
+
+    def process_request(self, request):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            suffixes = set(ETAG_SUFFIX_RE.findall(if_none_match))
+            request.etag_suffix = suffixes.pop()[:-1] if len(suffixes) == 1 else ''
+            request.META['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX_RE.sub('"', if_none_match)
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            # Confirma ao cliente a mesma representação (comprimida) que ele já tem
+            suffix = getattr(request, 'etag_suffix', '')
+            if suffix and response.has_header('ETag'):
+                response['ETag'] = self.tag(response['ETag'], suffix)
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            response['ETag'] = self.tag(response['ETag'], ETAG_SUFFIXES[encoding])
+        return response
+
+    @staticmethod
+    def tag(etag, suffix):
+        return etag[:-1] + suffix + '"' if etag.endswith('"') else etag
+
+
+class CacheControlMiddleware(MiddlewareMixin):
+    """
+    Cache-Control por rota (API_CACHE_CONTROL, pelo nome da URL) nos GETs com sucesso que não
+    definiram o seu. Rotas "private" dependem do usuário e recebem Vary: Authorization.
+    Fica depois do ConditionalGetMiddleware, para o 304 levar o mesmo Cache-Control.
+    """
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.has_header('Cache-Control'):
+            return response
+        match = request.resolver_match
+        policy = settings.API_CACHE_CONTROL.get(match.url_name) if match else None
+        if policy:
+            response['Cache-Control'] = policy
+            if 'private' in policy:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Mede cada requisição (tempo total, banco, chamadas ao TMDb, tmdb_cache e autenticação, ver
+    instrumentation.py), registra nos histogramas de /api/metrics/ e, com SERVER_TIMING ativo,
+    devolve os totais no cabeçalho Server-Timing (visível no DevTools do navegador). Fica no topo
+    do MIDDLEWARE. Funciona nos deploys WSGI e ASGI sem forçar troca de contexto.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, timings)
+
+    @staticmethod
+    def finish(request, response, timings):
+        total = time.perf_counter() - timings.started
+        match = request.resolver_match
+        record_request(match.url_name if match and match.url_name else 'unmatched', request.method, response.status_code, timings, total)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(total)
+        return response
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.25 on 2026-10-18 14:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_movie_metadata(apps, schema_editor):
+    # Cria um Movie para cada tmdb_id já salvo, com o título/pôster/nota da entrada mais recente
+    Movie = apps.get_model('favorites', 'Movie')
+    UserMovieEntry = apps.get_model('favorites', 'UserMovieEntry')
+    movies = {}
+    for entry in UserMovieEntry.objects.order_by('added_at').iterator():
+        movies[entry.tmdb_id] = Movie(
+            tmdb_id=entry.tmdb_id,
+            title=entry.title,
+            poster_path=entry.poster_path,
+            vote_average=entry.rating,
+        )
+    Movie.objects.bulk_create(movies.values(), batch_size=500, ignore_conflicts=True)
+    UserMovieEntry.objects.update(movie_id=models.F('tmdb_id'))
+
+
+def copy_movie_metadata_back(apps, schema_editor):
+    # Volta: cada entrada recebe de novo o título/pôster/nota do seu filme
+    Movie = apps.get_model('favorites', 'Movie')
+    UserMovieEntry = apps.get_model('favorites', 'UserMovieEntry')
+    movie = Movie.objects.filter(pk=models.OuterRef('movie_id'))
+    UserMovieEntry.objects.update(
+        title=models.Subquery(movie.values('title')[:1]),
+        poster_path=models.Subquery(movie.values('poster_path')[:1]),
+        rating=models.Subquery(movie.values('vote_average')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Movie',
+            fields=[
+                ('tmdb_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('original_title', models.CharField(blank=True, default='', max_length=255)),
+                ('overview', models.TextField(blank=True, default='')),
+                ('poster_path', models.CharField(blank=True, max_length=255, null=True)),
+                ('backdrop_path', models.CharField(blank=True, max_length=255, null=True)),
+                ('original_language', models.CharField(blank=True, default='', max_length=16)),
+                ('adult', models.BooleanField(default=False)),
+                ('genre_ids', models.JSONField(blank=True, default=list)),
+                ('release_date', models.DateField(blank=True, null=True)),
+                ('runtime', models.IntegerField(blank=True, null=True)),
+                ('popularity', models.FloatField(default=0)),
+                ('vote_average', models.FloatField(default=0)),
+                ('vote_count', models.IntegerField(default=0)),
+                ('details', models.JSONField(blank=True, null=True)),
+                ('details_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usermovieentry',
+            name='movie',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='user_entries', to='favorites.movie'),
+        ),
+        migrations.RunPython(copy_movie_metadata, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usermovieentry',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='user_entries', to='favorites.movie'),
+        ),
+        # Na volta as colunas reaparecem vazias e só ficam obrigatórias depois de preenchidas
+        migrations.AlterField(
+            model_name='usermovieentry',
+            name='title',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='usermovieentry',
+            name='rating',
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, copy_movie_metadata_back),
+        migrations.RemoveField(
+            model_name='usermovieentry',
+            name='poster_path',
+        ),
+        migrations.RemoveField(
+            model_name='usermovieentry',
+            name='rating',
+        ),
+        migrations.RemoveField(
+            model_name='usermovieentry',
+            name='title',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.25 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+def fill_watch_provider_ids(apps, schema_editor):
+    # Extrai os provedores do Brasil dos detalhes que já estão no catálogo
+    Movie = apps.get_model('favorites', 'Movie')
+    movies = []
+    for movie in Movie.objects.filter(details__isnull=False).iterator():
+        providers = (movie.details or {}).get('watch/providers')
+        if providers is None:
+            continue
+        offers = (providers.get('results') or {}).get('BR') or {}
+        movie.watch_provider_ids = sorted({
+            provider['provider_id']
+            for entries in offers.values() if isinstance(entries, list)
+            for provider in entries
+        })
+        movies.append(movie)
+    Movie.objects.bulk_update(movies, ['watch_provider_ids'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0002_movie_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='watch_provider_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_watch_provider_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.25 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0003_movie_watch_provider_ids'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usermovieentry',
+            index=models.Index(fields=['user', 'is_favorite', 'added_at'], name='entry_user_favorite_added'),
+        ),
+        migrations.AddIndex(
+            model_name='usermovieentry',
+            index=models.Index(fields=['user', 'is_watch_later', 'added_at'], name='entry_user_later_added'),
+        ),
+        migrations.AddIndex(
+            model_name='usermovieentry',
+            index=models.Index(fields=['user', 'is_watched', 'added_at'], name='entry_user_watched_added'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0004_user_movie_entry_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieTrailer',
+            fields=[
+                ('tmdb_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('trailer', models.JSONField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.25 on 2026-10-18 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_tmdb_id_back(apps, schema_editor):
+    # Volta: a coluna tmdb_id separada recebe de novo o filme de cada entrada
+    UserMovieEntry = apps.get_model('favorites', 'UserMovieEntry')
+    UserMovieEntry.objects.update(tmdb_id=models.F('movie_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0005_movie_trailer'),
+    ]
+
+    # A entrada guardava o filme duas vezes (tmdb_id e movie_id); fica só a chave estrangeira,
+    # na coluna tmdb_id
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='usermovieentry',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='usermovieentry',
+            name='tmdb_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, copy_tmdb_id_back),
+        migrations.RemoveField(
+            model_name='usermovieentry',
+            name='tmdb_id',
+        ),
+        migrations.AlterField(
+            model_name='usermovieentry',
+            name='movie',
+            field=models.ForeignKey(db_column='tmdb_id', on_delete=django.db.models.deletion.PROTECT, related_name='user_entries', to='favorites.movie'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usermovieentry',
+            unique_together={('user', 'movie')},
+        ),
+    ]
@@ -15,24 +15,74 @@ class User(models.Model):
     def __str__(self):
         return self.email
 
+# Este modelo representa um filme do TMDb no catálogo local.
+# É atualizado a partir das respostas que o proxy do TMDb recebe (ver catalog.py).
+class Movie(models.Model):
+    tmdb_id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    original_title = models.CharField(max_length=255, blank=True, default='')
+    overview = models.TextField(blank=True, default='')
+    poster_path = models.CharField(max_length=255, blank=True, null=True)
+    backdrop_path = models.CharField(max_length=255, blank=True, null=True)
+    original_language = models.CharField(max_length=16, blank=True, default='')
+    adult = models.BooleanField(default=False)
+    genre_ids = models.JSONField(default=list, blank=True)
+    release_date = models.DateField(blank=True, null=True)
+    runtime = models.IntegerField(blank=True, null=True)
+    popularity = models.FloatField(default=0)
+    vote_average = models.FloatField(default=0)
+    vote_count = models.IntegerField(default=0)
+    # Provedores de streaming no Brasil (ids do TMDb); nulo = ainda não buscamos os detalhes
+    watch_provider_ids = models.JSONField(blank=True, null=True)
+    # Documento completo de /movie/{id} (com credits, watch/providers e release_dates)
+    details = models.JSONField(blank=True, null=True)
+    details_fetched_at = models.DateTimeField(blank=True, null=True)
+    # Quando os dados vieram do TMDb pela última vez (nulo = só temos o que o frontend enviou)
+    fetched_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.tmdb_id})"
+
+# Este modelo representa o trailer escolhido de um filme (ver trailers.py): o vídeo de
+# /movie/{id}/videos que pick_official_trailer escolheu, já pronto para servir.
+class MovieTrailer(models.Model):
+    tmdb_id = models.IntegerField(primary_key=True)
+    # Vídeo no formato do TMDb; nulo = o filme não tem trailer (cache negativo)
+    trailer = models.JSONField(blank=True, null=True)
+    # Quando a lista de vídeos foi buscada no TMDb (o comando refresh_trailers renova as mais antigas)
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Trailer de {self.tmdb_id}"
+
 # Este modelo representa uma entrada de filme associada a um usuário.
+# Os metadados do filme (título, pôster, nota) ficam em Movie, compartilhados entre usuários.
 class UserMovieEntry(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='movie_entries')
-    tmdb_id = models.IntegerField()
+    # A coluna continua sendo tmdb_id: o filme da entrada é o próprio id do TMDb
+    movie = models.ForeignKey(Movie, on_delete=models.PROTECT, related_name='user_entries', db_column='tmdb_id')
     is_favorite = models.BooleanField(default=False)
     is_watch_later = models.BooleanField(default=False)
     is_watched = models.BooleanField(default=False)
-    title = models.CharField(max_length=255)
-    poster_path = models.CharField(max_length=255, blank=True, null=True)
-    rating = models.FloatField()
     added_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'tmdb_id') 
+        unique_together = ('user', 'movie')
+        # Uma lista do usuário (?list_type=) em ordem de added_at sai direto do índice; no
+        # InnoDB o índice secundário já carrega o id, que desempata a paginação por cursor
+        indexes = [
+            models.Index(fields=['user', 'is_favorite', 'added_at'], name='entry_user_favorite_added'),
+            models.Index(fields=['user', 'is_watch_later', 'added_at'], name='entry_user_later_added'),
+            models.Index(fields=['user', 'is_watched', 'added_at'], name='entry_user_watched_added'),
+        ]
+
+    @property
+    def tmdb_id(self):
+        return self.movie_id
 
     def __str__(self):
-        return f"{self.title} (para {self.user.email})"
+        return f"{self.movie.title} (para {self.user.email})"
 
 # Este modelo representa uma lista compartilhada de filmes criada por um usuário.
 class SharedList(models.Model):
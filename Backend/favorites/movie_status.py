@@ -0,0 +1,137 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+
+from .catalog import ensure_movie, ensure_movies
+from .models import UserMovieEntry
+
+# Listas do usuário (flags de UserMovieEntry) aceitas em list_type
+LIST_TYPES = ['is_favorite', 'is_watch_later', 'is_watched']
+# "Assistir depois" e "Já assisti" são exclusivas: marcar uma desmarca a outra
+EXCLUSIVE_FLAGS = {'is_watch_later': 'is_watched', 'is_watched': 'is_watch_later'}
+# Ids por consulta em lote (abaixo do limite de parâmetros por consulta do SQLite)
+ID_BATCH_SIZE = 500
+
+
+def chunks(items, size=ID_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def flag_values(list_type):
+    """Colunas gravadas ao marcar `list_type`: a própria flag e a exclusiva dela, desmarcada."""
+    values = {list_type: True}
+    if list_type in EXCLUSIVE_FLAGS:
+        values[EXCLUSIVE_FLAGS[list_type]] = False
+    return values
+
+
+def set_movie_status(user, tmdb_id, list_type, value, movie_data=None):
+    """
+    Marca ou desmarca `list_type` no filme do usuário sem ler a entrada antes: marcar é um
+    único upsert (INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE), desmarcar é um UPDATE
+    seguido de um DELETE condicional, numa transação. Cliques simultâneos não perdem
+    atualizações. Retorna a entrada atualizada (com o filme) ou None se ela foi apagada.
+
+    O filme só é criado no catálogo quando falta (a chave estrangeira falha). A entrada é lida
+    uma vez no fim: a resposta leva o que o upsert não devolve (id e added_at de uma entrada
+    que já existia, as outras flags e os dados do catálogo).
+    """
+    entries = UserMovieEntry.objects.filter(user=user, movie_id=tmdb_id)
+    if value:
+        values = flag_values(list_type)
+
+        def upsert():
+            UserMovieEntry.objects.bulk_create(
+                [UserMovieEntry(user=user, movie_id=tmdb_id, **values)],
+                update_conflicts=True, update_fields=list(values), **upsert_options(),
+            )
+
+        try:
+            with transaction.atomic():
+                upsert()
+        except IntegrityError:
+            # Filme ainda fora do catálogo
+            ensure_movie(tmdb_id, movie_data or {})
+            upsert()
+        entry = entries.select_related('movie').first()
+        if entry is None:
+            # Dentro de uma transação maior a chave estrangeira só é verificada no COMMIT
+            # (PostgreSQL, SQLite): o upsert passou, mas o filme ainda não existe
+            ensure_movie(tmdb_id, movie_data or {})
+            entry = entries.select_related('movie').first()
+        return entry
+
+    with transaction.atomic():
+        entries.update(**{list_type: False})
+        # Sem nenhuma flag marcada a entrada deixa de existir
+        deleted, _ = entries.filter(is_favorite=False, is_watch_later=False, is_watched=False).delete()
+    if deleted:
+        return None
+    return entries.select_related('movie').first()
+
+
+def upsert_options():
+    # MySQL não aceita alvo no ON DUPLICATE KEY UPDATE; os demais bancos exigem
+    if connection.features.supports_update_conflicts_with_target:
+        return {'unique_fields': ['user', 'movie']}
+    return {}
+
+
+def apply_movie_status_operations(user, operations):
+    """
+    Aplica, em ordem e numa única transação, operações já validadas (tmdb_id, list_type,
+    status, movie_data) com as mesmas regras de set_movie_status. As entradas envolvidas são
+    lidas uma vez (travadas), o resultado é calculado em memória e gravado com um
+    bulk_create, um UPDATE por combinação de flags e DELETEs em lote.
+    Retorna, para cada operação, as flags da entrada depois dela, ou None se ela foi apagada.
+    """
+    tmdb_ids = list(dict.fromkeys(operation['tmdb_id'] for operation in operations))
+    with transaction.atomic():
+        existing = {}
+        for batch in chunks(tmdb_ids):
+            rows = (
+                UserMovieEntry.objects.select_for_update()
+                .filter(user=user, movie_id__in=batch)
+                .values_list('movie_id', *LIST_TYPES)
+            )
+            for tmdb_id, *flags in rows:
+                existing[tmdb_id] = dict(zip(LIST_TYPES, flags))
+
+        state = {tmdb_id: dict(flags) for tmdb_id, flags in existing.items()}
+        movie_data = {}
+        results = []
+        for operation in operations:
+            tmdb_id, list_type = operation['tmdb_id'], operation['list_type']
+            flags = state.setdefault(tmdb_id, dict.fromkeys(LIST_TYPES, False))
+            if operation['status']:
+                flags.update(flag_values(list_type))
+                movie_data[tmdb_id] = operation.get('movie_data') or movie_data.get(tmdb_id, {})
+            else:
+                flags[list_type] = False
+            results.append(dict(flags) if any(flags.values()) else None)
+
+        to_create, to_delete, to_update = [], [], defaultdict(list)
+        for tmdb_id, flags in state.items():
+            keep = any(flags.values())
+            if tmdb_id not in existing:
+                if keep:
+                    to_create.append(UserMovieEntry(user=user, movie_id=tmdb_id, **flags))
+            elif not keep:
+                to_delete.append(tmdb_id)
+            elif flags != existing[tmdb_id]:
+                to_update[tuple(flags[flag] for flag in LIST_TYPES)].append(tmdb_id)
+
+        if to_create:
+            ensure_movies({entry.movie_id: movie_data.get(entry.movie_id, {}) for entry in to_create})
+            UserMovieEntry.objects.bulk_create(
+                to_create, batch_size=ID_BATCH_SIZE, update_conflicts=True, update_fields=LIST_TYPES,
+                **upsert_options(),
+            )
+        # Poucas combinações de flags possíveis: um UPDATE ... WHERE tmdb_id IN (...) por combinação
+        for values, ids in to_update.items():
+            for batch in chunks(ids):
+                UserMovieEntry.objects.filter(user=user, movie_id__in=batch).update(**dict(zip(LIST_TYPES, values)))
+        for batch in chunks(to_delete):
+            UserMovieEntry.objects.filter(user=user, movie_id__in=batch).delete()
+    return results
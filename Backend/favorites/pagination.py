@@ -0,0 +1,72 @@
+import datetime
+import uuid
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class UserMovieEntryCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) das entradas do usuário, das mais recentes para as mais
+    antigas. É opcional: sem ?cursor nem ?page_size a resposta continua sendo a lista
+    completa, no formato que o frontend já usa.
+
+    A posição do cursor é o par (added_at, id) da última linha vista. O CursorPagination do
+    DRF guarda só added_at e um deslocamento dentro dos empates, e perde linhas ao voltar
+    uma página quando várias entradas têm o mesmo added_at (ex: importação em lote).
+    """
+    ordering = ('-added_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if self.cursor is not None and self.cursor.position is not None:
+            added_at, entry_id = self.parse_position(self.cursor.position)
+            # Voltando, as linhas mais recentes que a posição; avançando, as mais antigas
+            op = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'added_at__{op}': added_at}) | Q(added_at=added_at, **{f'id__{op}': entry_id})
+            )
+        if reverse:
+            queryset = queryset.order_by('added_at', 'id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = bool(self.page), has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None and bool(self.page)
+        return self.page
+
+    @staticmethod
+    def position_of(row):
+        return f"{row['added_at'].isoformat()}|{row['id']}"
+
+    def parse_position(self, position):
+        try:
+            added_at, _, entry_id = position.partition('|')
+            return datetime.datetime.fromisoformat(added_at), uuid.UUID(entry_id)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.position_of(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.position_of(self.page[0])))
@@ -0,0 +1,66 @@
+from django.conf import settings
+
+from .tmdb_cache import LRUCache
+
+# Projeção dos detalhes de um filme (/movie/{id} com credits, watch/providers e
+# release_dates) para o que a página do filme usa: o documento completo continua no cache do
+# TMDb e no catálogo, mas a resposta leva só o elenco principal, a equipe exibida e os dados
+# do Brasil. O formato é o mesmo do TMDb, só com listas menores.
+
+REGION = 'BR'
+# Campos mantidos de cada pessoa do elenco e da equipe
+CAST_FIELDS = ('id', 'name', 'character', 'profile_path', 'order')
+CREW_FIELDS = ('id', 'name', 'job', 'department', 'profile_path')
+# Funções da equipe mostradas na página do filme (direção e trilha sonora)
+CREW_JOBS = frozenset({'Director', 'Original Music Composer'})
+
+
+def pick(item, fields):
+    return {field: item[field] for field in fields if field in item}
+
+
+def project_movie_detail(data):
+    """Detalhes do filme no formato do TMDb, com elenco, equipe, provedores e classificações reduzidos."""
+    projected = dict(data)
+    credits = data.get('credits')
+    if isinstance(credits, dict):
+        cast = sorted(credits.get('cast') or [], key=lambda person: person.get('order', 0))
+        projected['credits'] = {
+            'cast': [pick(person, CAST_FIELDS) for person in cast[:settings.TMDB_DETAIL_CAST_SIZE]],
+            'crew': [pick(person, CREW_FIELDS) for person in credits.get('crew') or [] if person.get('job') in CREW_JOBS],
+        }
+    providers = data.get('watch/providers')
+    if isinstance(providers, dict):
+        results = providers.get('results') or {}
+        projected['watch/providers'] = {'results': {REGION: results[REGION]} if REGION in results else {}}
+    release_dates = data.get('release_dates')
+    if isinstance(release_dates, dict):
+        projected['release_dates'] = {
+            'results': [entry for entry in release_dates.get('results') or [] if entry.get('iso_3166_1') == REGION],
+        }
+    return projected
+
+
+def select_fields(data, fields):
+    """Só os campos de primeiro nível pedidos em ?fields= (ex: "id,title,credits")."""
+    if not fields:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def parse_fields(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+# O tmdb_cache devolve o mesmo objeto enquanto a entrada do cache não muda: a projeção de cada
+# filme é calculada uma vez por entrada e reaproveitada nas requisições seguintes
+_projections = LRUCache(settings.TMDB_CACHE_MAX_ENTRIES)
+
+
+def movie_detail_projection(movie_id, data):
+    cached = _projections.get(movie_id)
+    if cached is not None and cached[0] is data:
+        return cached[1]
+    projected = project_movie_detail(data)
+    _projections.set(movie_id, (data, projected))
+    return projected
@@ -0,0 +1,95 @@
+import hashlib
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .db_router import read_your_writes
+from .models import SharedList, UserMovieEntry
+from .renderers import FastJSONRenderer
+from .serializers import UserMovieEntryRowSerializer
+
+# Snapshots das listas públicas (/api/public-list/<id>/): o JSON já pronto da lista fica no
+# cache junto com a versão das entradas do dono. Cada alteração nas listas do dono troca a
+# versão (ver invalidate), e o snapshot antigo deixa de valer. Um acerto custa duas leituras
+# no cache e nenhuma consulta ao banco.
+
+# version: (token, momento da última alteração nas listas do dono)
+Snapshot = namedtuple('Snapshot', ['owner_id', 'version', 'content', 'etag'])
+
+
+class PublicListSnapshots:
+    @property
+    def cache(self):
+        return caches[settings.PUBLIC_LIST_CACHE]
+
+    @staticmethod
+    def version_key(owner_id):
+        return f'public-list-version:{owner_id}'
+
+    @staticmethod
+    def snapshot_key(list_id):
+        return f'public-list:{list_id}'
+
+    def current_version(self, owner_id):
+        key = self.version_key(owner_id)
+        version = self.cache.get(key)
+        if version is None:
+            # Primeira leitura (ou a versão saiu do cache): add não sobrescreve a de outro worker
+            self.cache.add(key, (uuid.uuid4().hex, time.time()), None)
+            version = self.cache.get(key)
+        return version
+
+    def invalidate(self, owner_id):
+        """Chamado a cada alteração nas listas de `owner_id`: os snapshots dele deixam de valer."""
+        self.cache.set(self.version_key(owner_id), (uuid.uuid4().hex, time.time()), None)
+
+    def forget(self, list_id):
+        self.cache.delete(self.snapshot_key(list_id))
+
+    @staticmethod
+    def owner_of(list_id):
+        owner_id = SharedList.objects.filter(pk=list_id).values_list('user_id', flat=True).first()
+        if owner_id is None and settings.DATABASE_REPLICAS:
+            # Lista recém-criada que a réplica ainda não recebeu
+            owner_id = SharedList.objects.using('default').filter(pk=list_id).values_list('user_id', flat=True).first()
+        return owner_id
+
+    def get(self, list_id):
+        """Snapshot da lista pública `list_id` (montado se preciso), ou None se ela não existe."""
+        key = self.snapshot_key(list_id)
+        snapshot = self.cache.get(key)
+        if snapshot is not None and self.cache.get(self.version_key(snapshot.owner_id)) == snapshot.version:
+            return snapshot
+
+        if snapshot is not None:
+            owner_id = snapshot.owner_id
+        else:
+            owner_id = self.owner_of(list_id)
+            if owner_id is None:
+                return None
+        # A versão é lida antes das entradas: uma alteração que chegar no meio troca a versão e
+        # o snapshot montado aqui já nasce vencido
+        version = self.current_version(owner_id)
+        # Dono que alterou as listas há pouco: a réplica pode não ter a alteração ainda
+        db = 'default' if read_your_writes.is_pinned(owner_id) else None
+        row_serializer = UserMovieEntryRowSerializer()
+        entries = row_serializer.values(UserMovieEntry.objects.db_manager(db).filter(user=owner_id))
+        content = FastJSONRenderer().render(row_serializer.many(entries.iterator(chunk_size=2000)))
+        etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        snapshot = Snapshot(owner_id, version, content, etag)
+        # O TTL limita por quanto tempo título, pôster e nota do catálogo podem ficar desatualizados
+        self.cache.set(key, snapshot, settings.PUBLIC_LIST_SNAPSHOT_TTL)
+        return snapshot
+
+
+public_lists = PublicListSnapshots()
+
+
+@receiver(post_delete, sender=SharedList)
+def forget_deleted_list(sender, instance, **kwargs):
+    public_lists.forget(instance.pk)
@@ -0,0 +1,149 @@
+import bisect
+import re
+import unicodedata
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+
+from .catalog import PAGE_SIZE, CatalogIndex, movie_summaries, results_page
+from .models import Movie
+from .tmdb_cache import tmdb_cache
+
+# Busca por texto em memória sobre o catálogo local (modelo Movie). Responde /search/movie
+# (usado por /search-tmdb/ e pelo /tmdb/discover/ com "query") sem chamar o TMDb quando o
+# catálogo enche a página pedida; senão a busca segue para o TMDb.
+#
+# A regra é por página, e não por tamanho do catálogo ou número total de resultados, para
+# que a busca letra a letra ("ma", "mat", "matr") fique local assim que o prefixo encontra
+# uma página cheia. O preço: numa resposta local, total_results e total_pages contam só o
+# catálogo, a ordem é título antes de sinopse e depois popularidade (não a relevância do
+# TMDb), e um filme que o catálogo ainda não tem fica de fora da página.
+
+TOKEN_RE = re.compile(r"\w+")
+# Palavras que não discriminam nada numa sinopse; nos títulos elas continuam indexadas
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das e em no na nos nas por para pelo pela com sem ao aos "
+    "que se seu sua the of and in on to".split()
+)
+# Parâmetros de /search/movie que a busca local sabe responder
+SEARCH_PARAMS = {"query", "language", "page"}
+# Tamanho mínimo do último termo para ser tratado como prefixo (digitação em andamento)
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text):
+    """Termos em minúsculas e sem acentos: "Coração" e "coracao" viram o mesmo termo."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    """
+    Índice invertido imutável. Os filmes são numerados por popularidade decrescente, então
+    ordenar as posições encontradas já ordena o resultado por popularidade.
+    """
+
+    def __init__(self, rows):
+        title_postings = defaultdict(list)
+        overview_postings = defaultdict(list)
+        self.movie_ids = array('i')
+        for position, row in enumerate(rows):
+            self.movie_ids.append(row['tmdb_id'])
+            for term in set(tokenize(row['title']) + tokenize(row['original_title'])):
+                title_postings[term].append(position)
+            for term in set(tokenize(row['overview'])):
+                if len(term) > 2 and term not in STOPWORDS:
+                    overview_postings[term].append(position)
+
+        self.title_postings = {term: array('i', positions) for term, positions in title_postings.items()}
+        self.overview_postings = {term: array('i', positions) for term, positions in overview_postings.items()}
+        self.title_terms = sorted(self.title_postings)
+        self.overview_terms = sorted(self.overview_postings)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    @staticmethod
+    def _lookup(terms, postings, term, prefix):
+        if not prefix:
+            return set(postings.get(term, ()))
+        found = set()
+        for candidate in terms[bisect.bisect_left(terms, term):]:
+            if not candidate.startswith(term):
+                break
+            found.update(postings[candidate])
+        return found
+
+    def search(self, query):
+        """
+        Ids dos filmes que contêm todos os termos de `query` (o último como prefixo).
+        Quem tem todos os termos no título vem antes; dentro de cada grupo, por popularidade.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        *head, last = terms
+        lookups = [(term, False) for term in head if term not in STOPWORDS]
+        lookups.append((last, len(last) >= MIN_PREFIX_LENGTH))
+
+        in_title = in_any = None
+        for term, prefix in lookups:
+            title_hits = self._lookup(self.title_terms, self.title_postings, term, prefix)
+            any_hits = title_hits | self._lookup(self.overview_terms, self.overview_postings, term, prefix)
+            in_title = title_hits if in_title is None else in_title & title_hits
+            in_any = any_hits if in_any is None else in_any & any_hits
+            if not in_any:
+                return []
+        ranked = sorted(in_title) + sorted(in_any - in_title)
+        return [self.movie_ids[position] for position in ranked]
+
+
+class CatalogSearch(CatalogIndex):
+    name = "busca"
+
+    def build(self):
+        # Só filmes que vieram do TMDb (os criados pelo frontend não têm sinopse nem popularidade)
+        return SearchIndex(
+            Movie.objects
+            .filter(fetched_at__isnull=False, adult=False)
+            .order_by('-popularity', 'tmdb_id')
+            .values('tmdb_id', 'title', 'original_title', 'overview')
+            .iterator(chunk_size=2000)
+        )
+
+    def search_page(self, query, page):
+        """Página `page` da busca no formato do TMDb, ou None se o catálogo não enche a página."""
+        index = self.index
+        if index is None:
+            return None
+        movie_ids = index.search(query)
+        # Página incompleta: o TMDb pode ter filmes que o catálogo ainda não tem
+        if len(movie_ids) < page * PAGE_SIZE:
+            return None
+
+        page_ids = movie_ids[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        return results_page(movie_summaries(page_ids), page, len(movie_ids))
+
+
+catalog_search = CatalogSearch()
+
+
+def search_source(path, params):
+    """Fonte do tmdb_cache para /search/movie: responde do índice local quando ele cobre a busca."""
+    if isinstance(params, dict):
+        params = list(params.items())
+    keys = [key for key, _ in params or []]
+    if len(keys) != len(set(keys)) or not set(keys) <= SEARCH_PARAMS:
+        return None
+    params = dict(params)
+    page = str(params.get('page', 1))
+    if params.get('language') != 'pt-BR' or not page.isdigit() or int(page) < 1:
+        return None
+    return catalog_search.search_page(params.get('query') or '', int(page))
+
+
+def connect():
+    if settings.TMDB_SEARCH_INDEX:
+        tmdb_cache.add_source('/search/movie', search_source)
@@ -1,5 +1,7 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import User, UserMovieEntry, SharedList
+from .movie_status import LIST_TYPES
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,13 +9,78 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'name']
 
 class UserMovieEntrySerializer(serializers.ModelSerializer):
+    tmdb_id = serializers.IntegerField(source='movie_id', read_only=True)
+    # Metadados vêm do catálogo (Movie), não de uma cópia por usuário
+    title = serializers.CharField(source='movie.title', read_only=True)
+    poster_path = serializers.CharField(source='movie.poster_path', read_only=True, allow_null=True)
+    rating = serializers.FloatField(source='movie.vote_average', read_only=True)
+
     class Meta:
         model = UserMovieEntry
-        fields = '__all__'
+        fields = [
+            'id', 'tmdb_id', 'is_favorite', 'is_watch_later', 'is_watched',
+            'title', 'poster_path', 'rating', 'added_at', 'user',
+        ]
         read_only_fields = ['user', 'id', 'added_at']
 
+def datetime_representation(value):
+    # Mesmo formato do DateTimeField do DRF: fuso atual, ISO 8601 e "Z" para UTC
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class UserMovieEntryRowSerializer:
+    """
+    Caminho de leitura rápido de UserMovieEntrySerializer: converte as linhas de .values()
+    direto nos dicts de saída, sem instanciar modelos nem passar pelos campos do DRF.
+    A saída é idêntica à do UserMovieEntrySerializer (mesmos campos, ordem e formatos).
+    """
+    # campo de saída -> (coluna em .values(), conversão de valores não nulos)
+    FIELDS = {
+        'id': ('id', str),
+        'tmdb_id': ('movie_id', int),
+        'is_favorite': ('is_favorite', bool),
+        'is_watch_later': ('is_watch_later', bool),
+        'is_watched': ('is_watched', bool),
+        'title': ('movie__title', str),
+        'poster_path': ('movie__poster_path', str),
+        'rating': ('movie__vote_average', float),
+        'added_at': ('added_at', datetime_representation),
+        'user': ('user', str),
+    }
+
+    def __init__(self, fields=None):
+        names = [name for name in self.FIELDS if not fields or name in fields]
+        self.fields = [(name, *self.FIELDS[name]) for name in names]
+        # added_at e id sempre vêm do banco: são a posição da paginação por cursor
+        self.columns = list(dict.fromkeys([column for _, column, _ in self.fields] + ['added_at', 'id']))
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row):
+        return {
+            name: None if row[column] is None else convert(row[column])
+            for name, column, convert in self.fields
+        }
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
 class SharedListSerializer(serializers.ModelSerializer):
     class Meta:
         model = SharedList
         fields = '__all__'
-        read_only_fields = ['user','id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['user','id', 'created_at']
+# Entrada de /movie-status/: cada campo é validado e convertido antes de chegar ao banco
+class MovieDataSerializer(serializers.Serializer):
+    title = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    poster_path = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    rating = serializers.FloatField(required=False, allow_null=True)
+
+class MovieStatusSerializer(serializers.Serializer):
+    tmdb_id = serializers.IntegerField(min_value=1)
+    list_type = serializers.ChoiceField(choices=LIST_TYPES)
+    status = serializers.BooleanField()
+    movie_data = MovieDataSerializer(required=False, default=dict)
@@ -1,3 +1,1841 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import importlib.util
+import io
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections, models
+from django.db.migrations.executor import MigrationExecutor
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from benchmarks import fake_tmdb
+from benchmarks.fake_tmdb import FIXTURES_DIR, FakeTMDbServer
+from benchmarks.firebase_stub import fake_verify_id_token, firebase_stub
+
+from . import instrumentation, projections
+from .auth import upsert_user, user_cache, verified_tokens
+from .discover_index import catalog_discover, discover_source
+from .management.commands.refresh_trailers import Command as RefreshTrailersCommand
+from .db_router import ReplicaRouter, read_your_writes, use_replicas
+from .middleware import accepted_encodings
+from .models import Movie, MovieTrailer, SharedList, User, UserMovieEntry
+from .public_lists import public_lists
+from .renderers import FastJSONRenderer
+from .search_index import SearchIndex, catalog_search, tokenize
+from .serializers import UserMovieEntryRowSerializer, UserMovieEntrySerializer
+from .trailers import trailer_index, videos_document
+from .tmdb import (
+    CircuitBreaker, CircuitOpenError, RateLimitExceeded, TMDbMetrics, TMDbRateLimiter, async_tmdb_client,
+    build_discover_request, movie_detail_request, movie_list_request, pick_official_trailer, tmdb_client,
+)
+from .tmdb_cache import AsyncSingleFlight, LRUCache, tmdb_cache
+
+
+class IngestTMDbCommandTests(TestCase):
+    """Comando ingest_tmdb contra o TMDb falso, com as respostas gravadas em benchmarks/fixtures/ingest."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer(fixtures_dir=FIXTURES_DIR / 'ingest').start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.checkpoint = Path(tmp_dir.name) / 'checkpoint.json'
+
+    def ingest(self, *args):
+        out = io.StringIO()
+        call_command(
+            'ingest_tmdb', '--sources', 'popular,top_rated', '--checkpoint', str(self.checkpoint),
+            '--rate', '1000', *args, stdout=out, stderr=io.StringIO(),
+        )
+        return out.getvalue()
+
+    def test_ingests_every_page_of_each_source(self):
+        output = self.ingest()
+
+        self.assertEqual(
+            set(Movie.objects.values_list('tmdb_id', flat=True)), {550, 680, 13, 155, 27205, 278}
+        )
+        movie = Movie.objects.get(tmdb_id=27205)
+        self.assertEqual(movie.title, "A Origem")
+        self.assertEqual(movie.genre_ids, [28, 878, 12])
+        self.assertEqual(str(movie.release_date), "2010-07-15")
+        self.assertEqual(self.server.request_count, 3)
+        self.assertIn("páginas/s", output)
+
+        state = json.loads(self.checkpoint.read_text())['sources']
+        self.assertEqual(state['popular'], {'total_pages': 2, 'done': [1, 2]})
+        self.assertEqual(state['top_rated'], {'total_pages': 1, 'done': [1]})
+
+    def test_resumes_from_checkpoint(self):
+        self.checkpoint.write_text(json.dumps(
+            {'sources': {'popular': {'total_pages': 2, 'done': [1]}, 'top_rated': {'total_pages': 1, 'done': [1]}}}
+        ))
+        self.ingest()
+
+        self.assertEqual(self.server.request_log, ['/movie/popular'])
+        self.assertEqual(set(Movie.objects.values_list('tmdb_id', flat=True)), {155, 27205})
+
+        # Tudo feito: uma nova execução não chama o TMDb
+        self.ingest()
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_reset_ignores_checkpoint(self):
+        self.ingest()
+        self.ingest('--reset')
+        self.assertEqual(self.server.request_count, 6)
+        self.assertEqual(Movie.objects.count(), 6)
+
+
+class TMDbResilienceTests(TestCase):
+    """Limite de taxa, Retry-After e circuit breaker das chamadas ao TMDb, contra o TMDb falso."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=1, TMDB_RETRY_BACKOFF=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2, metrics=tmdb_client.metrics)
+        breaker_patch = mock.patch.object(tmdb_client, 'breaker', self.breaker)
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+        tmdb_client.limiter.paused_until = 0.0
+        tmdb_client.metrics.reset()
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+
+    def test_limiter_spaces_out_calls_above_the_rate(self):
+        limiter = TMDbRateLimiter(rate=20, burst=1, cache_alias='', metrics=TMDbMetrics())
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(limiter.metrics.counters()['throttled'], 4)
+
+    def test_limiter_rejects_calls_that_would_wait_too_long(self):
+        limiter = TMDbRateLimiter(rate=1, burst=1, cache_alias='', metrics=TMDbMetrics())
+        limiter.acquire()
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire(max_wait=0.1)
+        self.assertEqual(limiter.metrics.counters()['rejected'], 1)
+
+    def test_shared_limiter_counts_calls_from_every_worker(self):
+        workers = [TMDbRateLimiter(rate=2, burst=2, cache_alias='default') for _ in range(2)]
+        with mock.patch('favorites.tmdb.time.time', return_value=1_000_000.25):
+            self.assertEqual(workers[0].try_acquire(), 0)
+            self.assertEqual(workers[1].try_acquire(), 0)
+            self.assertAlmostEqual(workers[0].try_acquire(), 0.75)
+            workers[0].pause(5)
+            self.assertAlmostEqual(workers[1].pause_remaining(), 5)
+
+    def test_honours_retry_after_of_a_429(self):
+        self.server.queue_errors(429, retry_after=1)
+        start = time.monotonic()
+        data = tmdb_client.get('/genre/movie/list')
+
+        self.assertIn('genres', data)
+        self.assertGreaterEqual(time.monotonic() - start, 1)
+        self.assertEqual(self.server.request_count, 2)
+        self.assertEqual(tmdb_client.metrics.counters()['rate_limited'], 1)
+
+    def test_retries_stop_at_the_total_timeout(self):
+        self.server.queue_errors(500, count=2)
+        # Uma nova tentativa pode levar até 2s (connect + read timeout): com prazo de 1s não há retry
+        with override_settings(TMDB_MAX_RETRIES=3, TMDB_CONNECT_TIMEOUT=1, TMDB_READ_TIMEOUT=1, TMDB_TOTAL_TIMEOUT=1):
+            with self.assertRaises(requests.HTTPError):
+                tmdb_client.get('/genre/movie/list')
+            self.assertEqual(self.server.request_count, 1)
+            self.assertEqual(tmdb_client.metrics.counters()['retries_out_of_time'], 1)
+
+            with override_settings(TMDB_TOTAL_TIMEOUT=10):
+                self.assertIn('genres', tmdb_client.get('/genre/movie/list'))
+            self.assertEqual(self.server.request_count, 3)
+
+        with mock.patch.object(tmdb_client.session, 'get', side_effect=requests.ConnectionError) as get:
+            with override_settings(TMDB_TOTAL_TIMEOUT=0), self.assertRaises(requests.ConnectionError):
+                tmdb_client.get('/genre/movie/list')
+        self.assertEqual(get.call_count, 1)
+
+    def test_long_retry_after_fails_fast_and_pauses_later_calls(self):
+        self.server.queue_errors(429, retry_after=60)
+        with self.assertRaises(requests.HTTPError):
+            tmdb_client.get('/genre/movie/list')
+        with self.assertRaises(RateLimitExceeded):
+            tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_circuit_opens_after_consecutive_failures_and_recovers(self):
+        self.server.queue_errors(500, count=6)
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.server.request_count, 6)
+
+        # A chamada de teste depois do reset_timeout ainda falha: o circuito volta a abrir
+        self.server.queue_errors(500, count=2)
+        time.sleep(0.25)
+        with self.assertRaises(requests.HTTPError):
+            tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.25)
+        self.assertIn('genres', tmdb_client.get('/genre/movie/list'))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(tmdb_client.metrics.counters()['short_circuited'], 1)
+
+    def test_half_open_call_failing_with_any_exception_does_not_stick(self):
+        self.breaker.state, self.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - 1
+        with mock.patch.object(tmdb_client.session, 'get', side_effect=requests.exceptions.ChunkedEncodingError):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.25)
+        self.assertIn('genres', tmdb_client.get('/genre/movie/list'))
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_cancelled_half_open_call_hands_the_test_to_the_next_call(self):
+        async def cancelled_call():
+            async def hang(*args, **kwargs):
+                await asyncio.sleep(10)
+
+            with mock.patch.object(httpx.AsyncClient, 'get', hang):
+                task = asyncio.ensure_future(async_tmdb_client.get('/genre/movie/list'))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            await async_tmdb_client.aclose()
+
+        with mock.patch.object(async_tmdb_client, 'breaker', self.breaker):
+            self.breaker.state, self.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - 1
+            asyncio.run(cancelled_call())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        # Cancelar não conta como falha do TMDb: o próximo pedido já é a nova chamada de teste
+        self.assertIn('genres', tmdb_client.get('/genre/movie/list'))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unknown_trending_window_is_rejected_before_calling_tmdb(self):
+        self.assertEqual(APIClient().get('/api/tmdb/trending/qualquer-coisa/').status_code, 400)
+        self.assertEqual(self.server.request_count, 0)
+        self.assertEqual(APIClient().get('/api/tmdb/trending/week/').status_code, 200)
+        self.assertEqual(set(tmdb_client.metrics.snapshot()), {'/trending/movie/week'})
+
+    def test_metrics_label_unknown_paths_as_other(self):
+        self.assertEqual(TMDbMetrics.endpoint_name('/movie/550/videos'), '/movie/{id}/videos')
+        self.assertEqual(TMDbMetrics.endpoint_name('/trending/movie/month'), 'other')
+        self.assertEqual(TMDbMetrics.endpoint_name('/tv/1399'), 'other')
+
+    def test_serves_cached_copy_while_circuit_is_open(self):
+        data, _ = tmdb_cache.fetch('/genre/movie/list')
+        tmdb_cache.get_entry(tmdb_cache.normalize('/genre/movie/list', None)).expires_at = time.time() - 10
+        self.breaker.state, self.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic()
+
+        with override_settings(TMDB_CACHE_STALE_WHILE_REVALIDATE=0):
+            stale, cache_status = tmdb_cache.fetch('/genre/movie/list')
+        self.assertEqual((stale, cache_status), (data, 'STALE'))
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_movie_detail_distinguishes_missing_movie_from_upstream_failure(self):
+        client = APIClient()
+        self.server.queue_errors(404)
+        missing = client.get('/api/tmdb/movie/999/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json(), {'error': 'Filme não encontrado.'})
+
+        self.server.queue_errors(500, count=2)
+        failed = client.get('/api/tmdb/movie/998/')
+        self.assertEqual(failed.status_code, 503)
+
+        with override_settings(METRICS_TOKEN='segredo'):
+            health = client.get('/api/tmdb/health/', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(health.json()['circuit'], {'state': 'closed', 'consecutive_failures': 1})
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_health_details_need_the_metrics_token(self):
+        client = APIClient()
+        bare = client.get('/api/tmdb/health/')
+        self.assertEqual((bare.status_code, bare.json()), (200, {'status': 'ok'}))
+        self.assertEqual(client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer outro').status_code, 403)
+
+        client.credentials(HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(client.get('/api/tmdb/health/').json()['circuit'], {'state': 'closed', 'consecutive_failures': 0})
+        self.assertEqual(client.get('/api/metrics/').status_code, 200)
+
+        # Sem METRICS_TOKEN configurado, os detalhes e as métricas ficam fechados
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(client.get('/api/tmdb/health/').json(), {'status': 'ok'})
+            self.assertEqual(client.get('/api/metrics/').status_code, 403)
+
+        # O balanceador continua vendo o 503 com o circuito aberto, mesmo sem o token
+        self.breaker.state, self.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic()
+        bare = APIClient().get('/api/tmdb/health/', HTTP_AUTHORIZATION='Bearer outro')
+        self.assertEqual((bare.status_code, bare.json()), (503, {'status': 'unavailable'}))
+
+
+@override_settings(METRICS_TOKEN='segredo')
+class ServerTimingAndMetricsTests(TestCase):
+    """Cabeçalho Server-Timing, histogramas por rota e /api/metrics/ (instrumentation.py)."""
+
+    def setUp(self):
+        for metric in instrumentation.METRICS:
+            metric.reset()
+        self.addCleanup(lambda: [metric.reset() for metric in instrumentation.METRICS])
+        User.objects.create(id='u1', email='u1@exemplo.com')
+
+    def metrics(self):
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertFalse(self.client.get('/api/tmdb/health/').has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_reports_app_db_and_auth(self):
+        with firebase_stub():
+            response = self.client.get('/api/movies/', HTTP_AUTHORIZATION='Bearer u1')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=\d+\.\d')
+        self.assertRegex(timing, r'db;dur=\d+\.\d;desc="\d+ queries"')
+        self.assertRegex(timing, r'auth;dur=\d+\.\d')
+        self.assertNotIn('tmdb;', timing)
+
+    def test_requests_are_recorded_by_route_method_and_status(self):
+        self.client.get('/api/tmdb/health/')
+        self.client.get('/api/tmdb/health/')
+        self.client.generic('BREW', '/api/tmdb/health/')
+        self.client.get('/nao-existe/')
+        text = self.metrics()
+
+        self.assertIn('http_request_duration_seconds_count{route="tmdb-health",method="GET",status="200"} 2', text)
+        # Métodos inventados pelo cliente não viram rótulos novos
+        self.assertIn('http_request_duration_seconds_count{route="tmdb-health",method="other",status="405"} 1', text)
+        self.assertNotIn('BREW', text)
+        self.assertIn('http_request_duration_seconds_count{route="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('# TYPE http_request_db_queries histogram', text)
+        self.assertIn('# TYPE tmdb_cache_results_total counter', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = instrumentation.Histogram('exemplo_seconds', 'Exemplo', ('route',), (0.1, 1))
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, 'a')
+        self.assertEqual(histogram.render(), [
+            '# HELP exemplo_seconds Exemplo',
+            '# TYPE exemplo_seconds histogram',
+            'exemplo_seconds_bucket{route="a",le="0.1"} 1',
+            'exemplo_seconds_bucket{route="a",le="1"} 3',
+            'exemplo_seconds_bucket{route="a",le="+Inf"} 4',
+            'exemplo_seconds_sum{route="a"} 4.250000',
+            'exemplo_seconds_count{route="a"} 4',
+        ])
+
+
+class TMDbCacheTests(TestCase):
+    """Política do tmdb_cache.fetch: entrada fresca, stale-while-revalidate e stale-if-error, contra o TMDb falso."""
+
+    path = '/genre/movie/list'
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        breaker_patch = mock.patch.object(
+            tmdb_client, 'breaker', CircuitBreaker(failure_threshold=5, reset_timeout=0.2, metrics=tmdb_client.metrics)
+        )
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+        tmdb_client.limiter.paused_until = 0.0
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        self.data, cache_status = tmdb_cache.fetch(self.path)
+        self.assertEqual(cache_status, 'MISS')
+
+    def expire(self, seconds_ago):
+        tmdb_cache.get_entry(tmdb_cache.normalize(self.path)).expires_at = time.time() - seconds_ago
+
+    def test_fresh_entry_is_served_without_calling_tmdb(self):
+        for _ in range(3):
+            self.assertEqual(tmdb_cache.fetch(self.path), (self.data, 'HIT'))
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_stale_entry_is_served_while_one_background_refresh_runs(self):
+        self.expire(10)
+        self.server.latency = 0.3
+        for _ in range(5):
+            self.assertEqual(tmdb_cache.fetch(self.path), (self.data, 'STALE'))
+
+        deadline = time.monotonic() + 3
+        while not tmdb_cache.get_entry(tmdb_cache.normalize(self.path)).is_fresh():
+            self.assertLess(time.monotonic(), deadline, "o refresh em background não terminou")
+            time.sleep(0.02)
+        self.assertEqual(self.server.request_count, 2)
+        self.assertEqual(tmdb_cache.fetch(self.path), (self.data, 'HIT'))
+
+    @override_settings(TMDB_CACHE_STALE_WHILE_REVALIDATE=0)
+    def test_stale_entry_is_served_when_tmdb_fails(self):
+        self.expire(10)
+        with self.assertLogs('favorites.tmdb_cache', 'WARNING'):
+            for error in (500, 429):
+                self.server.queue_errors(error)
+                self.assertEqual(tmdb_cache.fetch(self.path), (self.data, 'STALE'))
+
+        # Um 404 é resposta do TMDb, não falha: não há cópia antiga a servir
+        self.server.queue_errors(404)
+        with self.assertRaises(requests.HTTPError):
+            tmdb_cache.fetch(self.path)
+
+        # Depois de TMDB_CACHE_STALE_IF_ERROR a cópia é velha demais até para uma falha
+        self.server.queue_errors(500)
+        with override_settings(TMDB_CACHE_STALE_IF_ERROR=5), self.assertRaises(requests.HTTPError):
+            tmdb_cache.fetch(self.path)
+
+        self.assertEqual(tmdb_cache.fetch(self.path), (self.data, 'MISS'))
+        self.assertEqual(self.server.request_count, 6)
+
+
+def async_urlconf():
+    """URLconf do deploy ASGI (TMDB_ASYNC_VIEWS=True): as rotas do TMDb usam as views de async_views.py."""
+    with override_settings(TMDB_ASYNC_VIEWS=True):
+        spec = importlib.util.find_spec('favorites.urls')
+        urls = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(urls)
+    urlconf = types.ModuleType('async_urlconf')
+    urlconf.urlpatterns = [path('api/', include(urls))]
+    return urlconf
+
+
+class MockTMDbTransport:
+    """
+    Transporte do httpx que responde como o TMDb falso (benchmarks/fake_tmdb.py), sem rede.
+    `queue_errors` programa as próximas respostas (status ou exceção); `fail` faz um caminho
+    sempre responder `status`.
+    """
+
+    def __init__(self):
+        self.request_log = []
+        self.queued = []
+        self.failing = {}
+        self.documents = {}
+
+    def queue_errors(self, *errors):
+        self.queued.extend(errors)
+
+    def fail(self, path, status):
+        self.failing[path] = status
+
+    def __call__(self, request):
+        path = request.url.path.removeprefix('/3')
+        self.request_log.append(path)
+        if self.queued:
+            error = self.queued.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return httpx.Response(error, json={'status_message': 'erro'})
+        if path in self.failing:
+            return httpx.Response(self.failing[path], json={'status_message': 'erro'})
+        query = {key: request.url.params.get_list(key) for key in request.url.params.keys()}
+        data = self.documents.get(path) or fake_tmdb.synthesize(path, query)
+        return httpx.Response(200 if data is not None else 404, json=data)
+
+
+@override_settings(
+    ROOT_URLCONF=async_urlconf(), TMDB_BASE_URL='https://tmdb.test/3', TMDB_MAX_RETRIES=1, TMDB_RETRY_BACKOFF=0,
+    TMDB_PREFETCH_NEXT_PAGE=False,
+)
+class AsyncTMDbViewTests(TestCase):
+    """Caminho ASGI: views de async_views.py, TMDbCache.afetch e AsyncTMDbClient contra um transporte httpx falso."""
+
+    def setUp(self):
+        self.tmdb = MockTMDbTransport()
+        transport = httpx.MockTransport(self.tmdb)
+        client_patch = mock.patch.object(async_tmdb_client, '_client', lambda: httpx.AsyncClient(transport=transport))
+        client_patch.start()
+        self.addCleanup(client_patch.stop)
+        breaker_patch = mock.patch.object(
+            async_tmdb_client, 'breaker', CircuitBreaker(failure_threshold=5, reset_timeout=0.2, metrics=tmdb_client.metrics)
+        )
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+        tmdb_client.limiter.paused_until = 0.0
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+
+    async def test_responses_are_cached(self):
+        first = await self.async_client.get('/api/tmdb/genres/')
+        second = await self.async_client.get('/api/tmdb/genres/')
+        self.assertEqual((first.status_code, first['X-Cache'], second['X-Cache']), (200, 'MISS', 'HIT'))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.tmdb.request_log, ['/genre/movie/list'])
+
+    async def test_client_retries_5xx_and_network_errors(self):
+        self.tmdb.queue_errors(500, httpx.ConnectError("conexão recusada"))
+        self.assertEqual((await self.async_client.get('/api/tmdb/genres/')).status_code, 503)
+        self.assertEqual(len(self.tmdb.request_log), 2)
+
+        self.tmdb.queue_errors(httpx.ConnectError("conexão recusada"))
+        response = await self.async_client.get('/api/tmdb/genres/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.tmdb.request_log), 4)
+
+    @override_settings(TMDB_MAX_RETRIES=3, TMDB_TOTAL_TIMEOUT=0)
+    async def test_client_does_not_retry_past_the_total_timeout(self):
+        self.tmdb.queue_errors(httpx.ConnectError("conexão recusada"), 500)
+        with self.assertRaises(httpx.ConnectError):
+            await async_tmdb_client.get('/genre/movie/list')
+        self.assertEqual(self.tmdb.request_log, ['/genre/movie/list'])
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await async_tmdb_client.get('/genre/movie/list')
+        self.assertEqual(len(self.tmdb.request_log), 2)
+
+    async def test_pages_serve_a_stale_copy_when_tmdb_fails(self):
+        fresh = await self.async_client.get('/api/tmdb/popular/', {'page': 2})
+        self.assertEqual(fresh.status_code, 200)
+        normalized = tmdb_cache.normalize(*movie_list_request('popular', page=2))
+        tmdb_cache.local.get(normalized).expires_at = time.time() - 10
+
+        self.tmdb.queue_errors(500, 502)
+        with override_settings(TMDB_CACHE_STALE_WHILE_REVALIDATE=0), self.assertLogs('favorites.tmdb_cache', 'WARNING'):
+            stale = await self.async_client.get('/api/tmdb/popular/', {'page': 2})
+        self.assertEqual((stale.status_code, stale['X-Cache']), (200, 'STALE'))
+        self.assertEqual(stale.content, fresh.content)
+
+    async def test_movie_detail_distinguishes_missing_movie_from_upstream_failure(self):
+        self.tmdb.fail('/movie/999', 404)
+        missing = await self.async_client.get('/api/tmdb/movie/999/')
+        self.assertEqual((missing.status_code, missing.json()), (404, {'error': 'Filme não encontrado.'}))
+
+        self.tmdb.queue_errors(500, 500)
+        failed = await self.async_client.get('/api/tmdb/movie/998/')
+        self.assertEqual(failed.status_code, 503)
+
+        found = await self.async_client.get('/api/tmdb/movie/550/', {'fields': 'id,title'})
+        self.assertEqual(found.json(), {'id': 550, 'title': fake_tmdb.movie_summary(550)['title']})
+
+    async def test_invalid_parameters_are_rejected_before_calling_tmdb(self):
+        for url in ('/api/tmdb/trending/mes/', '/api/search-tmdb/', '/api/tmdb/popular/?page=0',
+                    '/api/tmdb/movies/batch/?ids=abc'):
+            with self.subTest(url=url):
+                self.assertEqual((await self.async_client.get(url)).status_code, 400)
+        self.assertEqual(self.tmdb.request_log, [])
+
+    async def test_batch_reports_failures_by_id(self):
+        self.tmdb.fail('/movie/601', 404)
+        self.tmdb.fail('/movie/602/videos', 500)
+        response = await self.async_client.get('/api/tmdb/movies/batch/', {'ids': '551,601,602'})
+
+        self.assertEqual((response.status_code, response['Cache-Control']), (200, 'no-store'))
+        data = response.json()
+        self.assertEqual(list(data['results']), ['551', '602'])
+        self.assertEqual(data['results']['551']['trailer']['key'], 'trailer551')
+        self.assertIsNone(data['results']['602']['trailer'])
+        self.assertEqual(
+            {movie_id: (error['part'], error['status']) for movie_id, error in data['errors'].items()},
+            {'601': ('details', 404), '602': ('trailer', 503)},
+        )
+
+        self.tmdb.fail('/movie/603', 500)
+        failed = await self.async_client.get('/api/tmdb/movies/batch/', {'ids': '603'})
+        self.assertEqual((failed.status_code, failed['Cache-Control']), (503, 'no-store'))
+
+    async def test_sync_and_async_views_return_the_same_bytes(self):
+        self.tmdb.documents['/genre/movie/list'] = {
+            'genres': [{'id': 28, 'name': 'Ação'}, {'id': 99, 'name': 'linha\u2028separada\u2029'}],
+        }
+        async_response = await self.async_client.get('/api/tmdb/genres/')
+        with override_settings(ROOT_URLCONF='config.urls'):
+            sync_response = await sync_to_async(self.client.get)('/api/tmdb/genres/')
+
+        self.assertEqual((async_response['X-Cache'], sync_response['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(async_response.content, sync_response.content)
+        self.assertIn(b'\\u2028', async_response.content)
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+        self.assertEqual(async_response['Content-Type'], sync_response['Content-Type'])
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def test_followers_get_the_data_when_the_leader_is_cancelled(self):
+        flights = AsyncSingleFlight()
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.05)
+            return {'genres': []}
+
+        async def scenario():
+            leader = asyncio.ensure_future(flights.do('chave', load))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flights.do('chave', load)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            # O cliente da primeira requisição desconectou
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            self.assertTrue(leader.cancelled())
+            self.assertFalse(flights.in_flight('chave'))
+            return results
+
+        self.assertEqual(asyncio.run(scenario()), [{'genres': []}] * 3)
+        self.assertEqual(len(loads), 1)
+
+    def test_errors_reach_every_caller(self):
+        flights = AsyncSingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise requests.ConnectionError("fora do ar")
+
+        async def scenario():
+            return await asyncio.gather(*(flights.do('chave', load) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, requests.ConnectionError) for result in results))
+
+
+class UserMovieEntryRowSerializerTests(TestCase):
+    """O caminho rápido (.values() + FastJSONRenderer) gera a mesma saída do UserMovieEntrySerializer."""
+
+    def setUp(self):
+        self.user = User.objects.create(id='u1', email='u1@exemplo.com')
+        Movie.objects.create(tmdb_id=550, title="Clube da Luta", poster_path=None, vote_average=8.4)
+        Movie.objects.create(tmdb_id=680, title="Pulp Fiction – Tempo de Violência", poster_path='/p680.jpg', vote_average=7)
+        UserMovieEntry.objects.create(user=self.user, movie_id=550, is_favorite=True)
+        UserMovieEntry.objects.create(user=self.user, movie_id=680, is_watched=True)
+        # Microssegundos no added_at, para conferir o formato da data
+        UserMovieEntry.objects.filter(movie_id=680).update(
+            added_at=datetime.datetime(2024, 3, 5, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+        )
+        self.entries = UserMovieEntry.objects.filter(user=self.user).order_by('movie_id')
+
+    def both_ways(self):
+        expected = UserMovieEntrySerializer(self.entries.select_related('movie'), many=True).data
+        row_serializer = UserMovieEntryRowSerializer()
+        fast = row_serializer.many(row_serializer.values(self.entries))
+        return expected, fast
+
+    def test_rows_match_the_model_serializer(self):
+        for time_zone in ('UTC', 'America/Sao_Paulo'):
+            with self.subTest(time_zone=time_zone), override_settings(TIME_ZONE=time_zone):
+                expected, fast = self.both_ways()
+                self.assertEqual(fast, expected)
+                self.assertEqual([list(row) for row in fast], [list(row) for row in expected])
+        self.assertIsNone(fast[0]['poster_path'])
+        self.assertEqual(fast[0]['rating'], 8.4)
+
+    def test_title_poster_and_rating_come_from_the_catalog(self):
+        # rating é o vote_average do TMDb guardado em Movie, o mesmo para todos os usuários
+        Movie.objects.filter(tmdb_id=550).update(title="Fight Club", poster_path='/p550.jpg', vote_average=8.8)
+        other = User.objects.create(id='u2', email='u2@exemplo.com')
+        UserMovieEntry.objects.create(user=other, movie_id=550, is_watched=True)
+
+        expected, fast = self.both_ways()
+        for rows in (expected, fast):
+            self.assertEqual(
+                (rows[0]['title'], rows[0]['poster_path'], rows[0]['rating']), ("Fight Club", '/p550.jpg', 8.8)
+            )
+        other_entry = UserMovieEntrySerializer(UserMovieEntry.objects.get(user=other)).data
+        self.assertEqual(other_entry['rating'], 8.8)
+
+    def test_sparse_fields_keep_the_serializer_order(self):
+        row_serializer = UserMovieEntryRowSerializer(['rating', 'tmdb_id'])
+        rows = row_serializer.many(row_serializer.values(self.entries))
+        self.assertEqual(rows, [{'tmdb_id': 550, 'rating': 8.4}, {'tmdb_id': 680, 'rating': 7.0}])
+
+    def test_renderer_bytes_match_drf_with_and_without_orjson(self):
+        expected, fast = self.both_ways()
+        # U+2028 precisa sair escapado nos dois caminhos
+        data = fast + [{'title': 'linha\u2028separada'}]
+        drf_bytes = JSONRenderer().render(list(expected) + [{'title': 'linha\u2028separada'}])
+        self.assertEqual(FastJSONRenderer().render(data), drf_bytes)
+        with mock.patch('favorites.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), drf_bytes)
+
+
+class AuthenticatedAPITestCase(TestCase):
+    """Cliente autenticado como u1 pelo stub do Firebase, sem o que outros testes deixaram nos caches de auth."""
+
+    def setUp(self):
+        verified_tokens.clear()
+        user_cache.clear()
+        patcher = firebase_stub()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer u1')
+        self.user = User.objects.create(id='u1', email='u1@exemplo.com')
+
+    def entry_flags(self, tmdb_id):
+        return UserMovieEntry.objects.filter(user=self.user, movie_id=tmdb_id).values(
+            'is_favorite', 'is_watch_later', 'is_watched'
+        ).first()
+
+
+class SetMovieStatusTests(AuthenticatedAPITestCase):
+    def set_status(self, tmdb_id, list_type, value, **movie_data):
+        return self.client.post('/api/movie-status/', {
+            'tmdb_id': tmdb_id, 'list_type': list_type, 'status': value, 'movie_data': movie_data,
+        }, format='json')
+
+    def test_marking_creates_the_entry_and_the_catalog_movie(self):
+        saved = self.set_status(550, 'is_favorite', True, title='Clube da Luta', poster_path='/p.jpg', rating=8.4)
+        self.assertEqual(saved.status_code, 200)
+        self.assertEqual(
+            {key: saved.json()[key] for key in ('tmdb_id', 'is_favorite', 'is_watch_later', 'is_watched', 'title', 'rating')},
+            {'tmdb_id': 550, 'is_favorite': True, 'is_watch_later': False, 'is_watched': False,
+             'title': 'Clube da Luta', 'rating': 8.4},
+        )
+        self.assertEqual(Movie.objects.get(tmdb_id=550).poster_path, '/p.jpg')
+
+    def test_marking_a_catalog_movie_is_an_upsert_and_one_read(self):
+        Movie.objects.create(tmdb_id=550, title='Clube da Luta')
+        # Primeira requisição: autenticação (provisiona o usuário e guarda o token verificado)
+        self.client.get('/api/movies/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.set_status(550, 'is_favorite', True).status_code, 200)
+        statements = [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+        self.assertEqual(len(statements), 2, statements)
+        self.assertTrue(statements[0].startswith('INSERT INTO "favorites_usermovieentry"'))
+
+        # A entrada existente recebe a flag sem perder as outras
+        self.set_status(550, 'is_watched', True)
+        self.assertEqual(self.entry_flags(550), {'is_favorite': True, 'is_watch_later': False, 'is_watched': True})
+
+    def test_watch_later_and_watched_are_exclusive(self):
+        self.set_status(550, 'is_watch_later', True)
+        saved = self.set_status(550, 'is_watched', True)
+        self.assertEqual((saved.json()['is_watch_later'], saved.json()['is_watched']), (False, True))
+
+    def test_unmarking_one_flag_keeps_the_others(self):
+        self.set_status(550, 'is_favorite', True)
+        self.set_status(550, 'is_watched', True)
+        saved = self.set_status(550, 'is_favorite', False)
+        self.assertEqual(saved.status_code, 200)
+        self.assertEqual(self.entry_flags(550), {'is_favorite': False, 'is_watch_later': False, 'is_watched': True})
+        self.assertFalse(saved.json()['is_favorite'])
+
+    def test_unmarking_the_last_flag_deletes_the_entry(self):
+        self.set_status(550, 'is_favorite', True)
+        deleted = self.set_status(550, 'is_favorite', False)
+        self.assertEqual(deleted.json(), {'tmdb_id': 550, 'status': 'deleted'})
+        self.assertIsNone(self.entry_flags(550))
+
+    def test_invalid_input_is_rejected(self):
+        invalid = self.set_status(550, 'is_hated', True)
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(invalid.json(), {'error': 'list_type inválido.'})
+        self.assertEqual(self.set_status(0, 'is_favorite', True).status_code, 400)
+        self.assertFalse(UserMovieEntry.objects.exists())
+
+
+class BulkSetMovieStatusTests(AuthenticatedAPITestCase):
+    def bulk(self, *operations):
+        return self.client.post('/api/movie-status/bulk/', {'operations': [
+            {'tmdb_id': tmdb_id, 'list_type': list_type, 'status': value, 'movie_data': {'title': f"Filme {tmdb_id}"}}
+            for tmdb_id, list_type, value in operations
+        ]}, format='json')
+
+    def test_operations_on_the_same_movie_apply_in_order(self):
+        results = self.bulk(
+            (550, 'is_favorite', True),
+            (550, 'is_watch_later', True),
+            (550, 'is_watched', True),
+            (550, 'is_favorite', False),
+        ).json()['results']
+
+        self.assertEqual([result['status'] for result in results], ['saved'] * 4)
+        # A última operação vence; marcar is_watched desmarcou is_watch_later
+        self.assertEqual(
+            {key: results[-1][key] for key in ('is_favorite', 'is_watch_later', 'is_watched')},
+            {'is_favorite': False, 'is_watch_later': False, 'is_watched': True},
+        )
+        self.assertEqual(self.entry_flags(550), {'is_favorite': False, 'is_watch_later': False, 'is_watched': True})
+        self.assertEqual(Movie.objects.get(tmdb_id=550).title, "Filme 550")
+
+    def test_unmarking_deletes_and_keeps_the_other_entries(self):
+        self.bulk((550, 'is_favorite', True), (680, 'is_favorite', True), (680, 'is_watched', True))
+        results = self.bulk((550, 'is_favorite', False), (680, 'is_favorite', False), (13, 'is_favorite', False)).json()['results']
+
+        self.assertEqual([result['status'] for result in results], ['deleted', 'saved', 'deleted'])
+        self.assertIsNone(self.entry_flags(550))
+        self.assertEqual(self.entry_flags(680), {'is_favorite': False, 'is_watch_later': False, 'is_watched': True})
+        self.assertFalse(UserMovieEntry.objects.filter(movie_id=13).exists())
+
+    def test_mark_and_unmark_within_a_batch_leaves_no_entry(self):
+        results = self.bulk((550, 'is_favorite', True), (550, 'is_favorite', False)).json()['results']
+        self.assertEqual([result['status'] for result in results], ['saved', 'deleted'])
+        self.assertIsNone(self.entry_flags(550))
+
+    def test_invalid_items_get_their_own_error(self):
+        results = self.bulk((550, 'is_favorite', True), (680, 'is_hated', True)).json()['results']
+        self.assertEqual(results[0]['status'], 'saved')
+        self.assertEqual(results[1], {'index': 1, 'error': 'list_type inválido.'})
+
+    @override_settings(MOVIE_STATUS_BULK_MAX_OPERATIONS=2)
+    def test_batches_above_the_limit_are_rejected(self):
+        rejected = self.bulk(*[(movie_id, 'is_favorite', True) for movie_id in (1, 2, 3)])
+        self.assertEqual(rejected.status_code, 400)
+        self.assertEqual(rejected.json(), {'error': 'No máximo 2 operações por requisição.'})
+        self.assertFalse(UserMovieEntry.objects.exists())
+        self.assertEqual(self.bulk((1, 'is_favorite', True), (2, 'is_favorite', True)).status_code, 200)
+
+
+class PublicListSnapshotTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        caches[settings.PUBLIC_LIST_CACHE].clear()
+        self.shared_list = SharedList.objects.create(user=self.user)
+        self.url = f'/api/public-list/{self.shared_list.pk}/'
+        self.set_status(550, 'is_favorite', True)
+
+    def set_status(self, tmdb_id, list_type, value):
+        saved = self.client.post('/api/movie-status/', {
+            'tmdb_id': tmdb_id, 'list_type': list_type, 'status': value, 'movie_data': {'title': f"Filme {tmdb_id}"},
+        }, format='json')
+        self.assertEqual(saved.status_code, 200)
+
+    def test_unchanged_list_revalidates_with_304_from_the_cache(self):
+        first = APIClient().get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([entry['tmdb_id'] for entry in first.json()], [550])
+
+        with self.assertNumQueries(0):
+            revalidated = APIClient().get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], first['ETag'])
+
+    def test_owner_writes_invalidate_the_snapshot(self):
+        first = APIClient().get(self.url)
+        self.set_status(680, 'is_watched', True)
+
+        changed = APIClient().get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(sorted(entry['tmdb_id'] for entry in changed.json()), [550, 680])
+
+        # Edição em lote também troca a versão
+        self.client.post('/api/movie-status/bulk/', {'operations': [
+            {'tmdb_id': 550, 'list_type': 'is_favorite', 'status': False},
+        ]}, format='json')
+        after_bulk = APIClient().get(self.url, HTTP_IF_NONE_MATCH=changed['ETag'])
+        self.assertEqual(after_bulk.status_code, 200)
+        self.assertEqual([entry['tmdb_id'] for entry in after_bulk.json()], [680])
+
+    def test_other_users_writes_keep_the_snapshot(self):
+        first = APIClient().get(self.url)
+        public_lists.invalidate('outro')
+        self.assertEqual(APIClient().get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_deleted_list_is_not_served(self):
+        APIClient().get(self.url)
+        self.client.delete(f'/api/shared-lists/{self.shared_list.pk}/')
+        self.assertEqual(APIClient().get(self.url).status_code, 404)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+@mock.patch('favorites.middleware.brotli', None)
+class CompressionMiddlewareTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        caches[settings.PUBLIC_LIST_CACHE].clear()
+        for tmdb_id in range(1, 6):
+            Movie.objects.create(tmdb_id=tmdb_id, title=f"Filme {tmdb_id}")
+            UserMovieEntry.objects.create(user=self.user, movie_id=tmdb_id, is_favorite=True)
+        self.url = f'/api/public-list/{SharedList.objects.create(user=self.user).pk}/'
+        self.plain = APIClient().get(self.url)
+
+    def test_gzip_response_gets_a_suffixed_etag(self):
+        compressed = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='br;q=1, gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), self.plain.content)
+        self.assertEqual(compressed['ETag'], self.plain['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertIn('Accept-Encoding', self.plain['Vary'])
+
+    def test_revalidating_the_compressed_copy_returns_304(self):
+        compressed = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        revalidated = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], compressed['ETag'])
+        # A cópia sem compressão revalida com o ETag sem sufixo
+        revalidated = APIClient().get(self.url, HTTP_IF_NONE_MATCH=self.plain['ETag'])
+        self.assertEqual((revalidated.status_code, revalidated['ETag']), (304, self.plain['ETag']))
+
+    def test_brotli_is_preferred_when_installed(self):
+        with mock.patch('favorites.middleware.brotli', mock.Mock(compress=lambda content, quality: b'br')):
+            compressed = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual((compressed['Content-Encoding'], compressed.content), ('br', b'br'))
+        self.assertTrue(compressed['ETag'].endswith('-br"'))
+
+    def test_refused_encodings_and_small_responses_stay_uncompressed(self):
+        refused = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(refused['ETag'], self.plain['ETag'])
+        with override_settings(COMPRESSION_MIN_SIZE=len(self.plain.content) + 1):
+            small = APIClient().get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', small['Vary'])
+
+    def test_accepted_encodings_skip_zero_quality(self):
+        self.assertEqual(accepted_encodings('gzip;q=0, br; q=0.0, deflate;q=0.001, identity'), {'deflate', 'identity'})
+        self.assertEqual(accepted_encodings('GZIP;q=1.0'), {'gzip'})
+
+
+class UserMovieEntryListTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        same_time = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        flags = ['is_favorite', 'is_watch_later', 'is_watched']
+        for tmdb_id in range(1, 8):
+            Movie.objects.create(tmdb_id=tmdb_id, title=f"Filme {tmdb_id}", vote_average=7.0)
+            UserMovieEntry.objects.create(user=self.user, movie_id=tmdb_id, **{flags[tmdb_id % 3]: True})
+        # Empates em added_at (importação em lote) e um filme mais recente
+        UserMovieEntry.objects.exclude(movie_id=7).update(added_at=same_time)
+        UserMovieEntry.objects.filter(movie_id=7).update(added_at=same_time + datetime.timedelta(days=1))
+        # Autentica uma vez: as contagens de queries abaixo são só as da lista
+        self.client.get('/api/movies/')
+
+    def expected_order(self, **filters):
+        return list(
+            UserMovieEntry.objects.filter(user=self.user, **filters)
+            .order_by('-added_at', '-id').values_list('movie_id', flat=True)
+        )
+
+    def test_without_cursor_or_page_size_the_whole_list_comes_back(self):
+        with self.assertNumQueries(1):
+            listed = self.client.get('/api/movies/')
+        self.assertIsInstance(listed.json(), list)
+        self.assertEqual([entry['tmdb_id'] for entry in listed.json()], self.expected_order())
+        self.assertEqual(list(listed.json()[0]), UserMovieEntrySerializer.Meta.fields)
+
+    def test_cursor_pages_are_stable_across_ties(self):
+        seen, url = [], '/api/movies/?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [entry['tmdb_id'] for entry in page['results']]
+            url = page['next']
+        self.assertEqual(seen, self.expected_order())
+
+        # Voltar uma página devolve exatamente os mesmos filmes
+        first = self.client.get('/api/movies/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_list_type_and_fields_filter_the_rows(self):
+        listed = self.client.get('/api/movies/?list_type=is_watched&fields=tmdb_id,is_watched').json()
+        self.assertEqual(listed, [{'tmdb_id': tmdb_id, 'is_watched': True} for tmdb_id in self.expected_order(is_watched=True)])
+
+        self.assertEqual(self.client.get('/api/movies/?list_type=is_hated').status_code, 400)
+        self.assertEqual(self.client.get('/api/movies/?fields=tmdb_id,senha').status_code, 400)
+
+    def test_list_type_query_uses_its_composite_index(self):
+        # Conferido só no MySQL (produção): no SQLite o Django gera "WHERE flag", que o
+        # planejador não casa com a coluna do índice
+        if connection.vendor != 'mysql':
+            self.skipTest(f"sem EXPLAIN conferido para {connection.vendor}")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/movies/?list_type=is_favorite&page_size=2').status_code, 200)
+        (query,) = [q['sql'] for q in queries]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + query)
+            plan = ' '.join(str(column) for row in cursor.fetchall() for column in row)
+        self.assertIn('entry_user_favorite_added', plan)
+
+
+class VerifiedTokenCacheTests(TestCase):
+    def setUp(self):
+        verified_tokens.clear()
+        user_cache.clear()
+        patcher = firebase_stub()
+        self.verify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_movies(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client.get('/api/movies/')
+
+    def test_a_verified_token_is_not_verified_again(self):
+        self.assertEqual(self.get_movies('u1:a').status_code, 200)
+        self.assertEqual(self.get_movies('u1:a').status_code, 200)
+        self.assertEqual(self.verify.call_count, 1)
+        # Outro token do mesmo usuário é verificado
+        self.get_movies('u1:b')
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_expired_tokens_are_not_cached(self):
+        expired = dict(fake_verify_id_token('u1:a'), exp=time.time() - 1)
+        self.verify.side_effect = lambda token, *args, **kwargs: expired
+        self.get_movies('u1:a')
+        self.get_movies('u1:a')
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_invalid_tokens_are_not_cached(self):
+        self.verify.side_effect = ValueError("assinatura inválida")
+        self.assertEqual(self.get_movies('u1:a').status_code, 403)
+        self.assertIsNone(verified_tokens.get('u1:a'))
+
+    def test_changes_to_the_user_are_seen_while_the_token_is_cached(self):
+        self.get_movies('u1:a')
+        User.objects.get(id='u1').delete()
+
+        # O token continua em cache, mas o usuário apagado não volta da memória: é provisionado de novo
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_movies('u1:a').status_code, 200)
+        self.assertEqual(self.verify.call_count, 1)
+        self.assertTrue(any('favorites_user' in q['sql'] for q in queries))
+        self.assertEqual(User.objects.get(id='u1').name, 'Fulano')
+
+
+class SearchIndexTests(SimpleTestCase):
+    """Índice invertido da busca local, sem banco (as linhas já vêm em ordem de popularidade)."""
+
+    def build(self, *titles, overviews=None):
+        overviews = overviews or {}
+        return SearchIndex(
+            {'tmdb_id': tmdb_id, 'title': title, 'original_title': '', 'overview': overviews.get(tmdb_id, '')}
+            for tmdb_id, title in enumerate(titles, start=1)
+        )
+
+    def test_accents_and_case_are_folded(self):
+        self.assertEqual(tokenize("Coração VALENTE"), ['coracao', 'valente'])
+        index = self.build("Coração Valente", "Amélie")
+        self.assertEqual(index.search("coracao"), [1])
+        self.assertEqual(index.search("CORAÇÃO"), [1])
+        self.assertEqual(index.search("amelie"), [2])
+
+    def test_last_term_is_a_prefix(self):
+        index = self.build("Matrix", "Mad Max", "O Poderoso Chefão")
+        self.assertEqual(index.search("ma"), [1, 2])
+        self.assertEqual(index.search("mat"), [1])
+        self.assertEqual(index.search("mad ma"), [2])
+        # Só o último termo é prefixo: "ma" no meio da busca precisa ser um termo inteiro
+        self.assertEqual(index.search("ma max"), [])
+        # Uma letra só ainda não é tratada como prefixo
+        self.assertEqual(index.search("m"), [])
+
+    def test_title_matches_come_before_overview_matches_then_popularity(self):
+        index = self.build(
+            "Viagem", "Matrix Reloaded", "Outro filme", "Matrix",
+            overviews={1: "Uma viagem dentro da Matrix.", 3: "Neo volta para a Matrix."},
+        )
+        self.assertEqual(index.search("matrix"), [2, 4, 1, 3])
+
+    def test_every_term_must_match(self):
+        index = self.build("Matrix Reloaded", "Matrix")
+        self.assertEqual(index.search("matrix reloaded"), [1])
+        self.assertEqual(index.search("matrix inexistente"), [])
+        self.assertEqual(index.search("  "), [])
+
+
+class CatalogSearchTests(TestCase):
+    """/search/movie respondido pelo catálogo local durante a busca letra a letra, contra o TMDb falso."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        self.addCleanup(setattr, catalog_search, '_index', None)
+
+        # 45 filmes "Mad Max" e um "Matrix", bem menos que um catálogo de produção
+        now = timezone.now()
+        Movie.objects.bulk_create(
+            [Movie(tmdb_id=1000 + i, title=f"Mad Max {i}", popularity=100 - i, fetched_at=now) for i in range(45)]
+            + [Movie(tmdb_id=603, title="Matrix", popularity=1, fetched_at=now)]
+        )
+        catalog_search.rebuild()
+
+    def search(self, query, page=None):
+        params = {'query': query, 'language': 'pt-BR'}
+        if page is not None:
+            params['page'] = page
+        data, _ = tmdb_cache.fetch('/search/movie', params)
+        return data
+
+    def test_prefixes_that_fill_a_page_are_answered_locally(self):
+        for query in ("ma", "mad", "mad ma", "mad max"):
+            data = self.search(query)
+            self.assertEqual(len(data['results']), 20, query)
+            self.assertEqual(data['results'][0]['id'], 1000, query)
+        self.assertEqual(self.search("ma")['total_results'], 46)
+        self.assertEqual(self.server.request_count, 0)
+
+    def test_pages_the_catalog_cannot_fill_go_to_tmdb(self):
+        self.assertEqual(self.search("mad max", page=2)['results'][0]['id'], 1020)
+        self.assertEqual(self.server.request_count, 0)
+
+        # Página 3 tem só 5 filmes no catálogo; "matrix" encontra só 1
+        self.search("mad max", page=3)
+        self.search("matrix")
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_other_languages_go_to_tmdb(self):
+        tmdb_cache.fetch('/search/movie', {'query': 'mad max', 'language': 'en-US'})
+        self.assertEqual(self.server.request_count, 1)
+
+
+@override_settings(TMDB_DISCOVER_MIN_CATALOG=50, TMDB_DISCOVER_MIN_PROVIDER_COVERAGE=0.8)
+class CatalogDiscoverTests(TestCase):
+    """
+    /discover/movie respondido pelo catálogo local deve dar a mesma página que o TMDb daria:
+    os resultados são comparados com uma filtragem e ordenação diretas sobre os filmes.
+    """
+
+    GENRES = [28, 12, 35, 18]
+    SORTS = [
+        f"{field}.{direction}"
+        for field in ('popularity', 'vote_average', 'vote_count', 'primary_release_date', 'release_date')
+        for direction in ('desc', 'asc')
+    ]
+
+    def setUp(self):
+        self.addCleanup(setattr, catalog_discover, '_index', None)
+        rng = random.Random(7)
+        vote_averages = [round(i * 0.1, 1) for i in range(60)]
+        vote_counts = [i * 10 for i in range(60)]
+        release_dates = [datetime.date(2000, 1, 1) + datetime.timedelta(days=37 * i) for i in range(60)]
+        for values in (vote_averages, vote_counts, release_dates):
+            rng.shuffle(values)
+        now = timezone.now()
+        self.movies = Movie.objects.bulk_create([
+            Movie(
+                tmdb_id=i + 1, title=f"Filme {i}", popularity=1000 - i, fetched_at=now,
+                genre_ids=rng.sample(self.GENRES, rng.randint(1, 2)), original_language='en',
+                vote_average=vote_averages[i], vote_count=vote_counts[i],
+                # Alguns filmes sem data de lançamento: no TMDb eles vão para o fim
+                release_date=None if i % 10 == 9 else release_dates[i],
+            )
+            for i in range(60)
+        ])
+        catalog_discover.rebuild()
+
+    def discover(self, query_string):
+        return discover_source(*build_discover_request(QueryDict(query_string)))
+
+    def expected(self, with_genres='', without_genres='', sort_by='popularity.desc'):
+        movies = self.movies
+        if with_genres:
+            mode = any if '|' in with_genres else all
+            wanted = [int(genre) for genre in with_genres.replace('|', ',').split(',')]
+            movies = [m for m in movies if mode(genre in m.genre_ids for genre in wanted)]
+        if without_genres:
+            unwanted = {int(genre) for genre in without_genres.split(',')}
+            movies = [m for m in movies if not unwanted & set(m.genre_ids)]
+        field, _, direction = sort_by.rpartition('.')
+        attribute = {'primary_release_date': 'release_date'}.get(field, field)
+        with_value = [m for m in movies if getattr(m, attribute) is not None]
+        with_value.sort(key=lambda m: getattr(m, attribute), reverse=direction == 'desc')
+        return [m.tmdb_id for m in with_value + [m for m in movies if getattr(m, attribute) is None]]
+
+    def test_genre_and_sort_combinations_match_tmdb(self):
+        answered = fallbacks = 0
+        for with_genres in ('', '28', '28,12', '28|35', '12|35|18'):
+            for sort_by in self.SORTS:
+                expected = self.expected(with_genres=with_genres, sort_by=sort_by)
+                for page in (1, 2):
+                    with self.subTest(with_genres=with_genres, sort_by=sort_by, page=page):
+                        data = self.discover(f"with_genres={with_genres}&sort_by={sort_by}&page={page}")
+                        if len(expected) < page * 20:
+                            # Página incompleta: o TMDb pode ter filmes que o catálogo não tem
+                            self.assertIsNone(data)
+                            fallbacks += 1
+                            continue
+                        self.assertEqual([movie['id'] for movie in data['results']], expected[(page - 1) * 20:page * 20])
+                        self.assertEqual(data['total_results'], len(expected))
+                        answered += 1
+        self.assertGreater(answered, 0)
+        self.assertGreater(fallbacks, 0)
+
+    def test_without_genres_excludes_the_genre(self):
+        expected = self.expected(with_genres='12|35|18', without_genres='28', sort_by='vote_count.desc')
+        data = self.discover("with_genres=12|35|18&without_genres=28&sort_by=vote_count.desc")
+        self.assertEqual([movie['id'] for movie in data['results']], expected[:20])
+        self.assertEqual(data['total_results'], len(expected))
+
+    def test_defaults_to_popularity(self):
+        data = self.discover("")
+        self.assertEqual([movie['id'] for movie in data['results']], list(range(1, 21)))
+        self.assertEqual(data['total_results'], 60)
+
+    def test_queries_the_catalog_cannot_answer_go_to_tmdb(self):
+        self.assertIsNotNone(self.discover("with_genres=28"))
+        # Parâmetro que o índice não conhece, ordenação sem índice, valor inválido ou repetido
+        self.assertIsNone(self.discover("with_genres=28&with_keywords=9715"))
+        self.assertIsNone(self.discover("sort_by=revenue.desc"))
+        self.assertIsNone(self.discover("sort_by=popularity"))
+        self.assertIsNone(self.discover("primary_release_year=dois mil"))
+        self.assertIsNone(self.discover("with_genres=28&with_genres=12"))
+        self.assertIsNone(discover_source('/discover/movie', [('with_genres', '28'), ('language', 'en-US')]))
+        # Poucos filmes com provedores conhecidos: filtrar por provedor esconderia filmes
+        self.assertIsNone(self.discover("with_watch_providers=8"))
+        with override_settings(TMDB_DISCOVER_MIN_CATALOG=1000):
+            self.assertIsNone(self.discover("with_genres=28"))
+
+    def test_view_serves_local_pages_without_calling_tmdb(self):
+        server = FakeTMDbServer().start()
+        self.addCleanup(server.stop)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        with override_settings(TMDB_BASE_URL=server.url, TMDB_MAX_RETRIES=0, TMDB_PREFETCH_NEXT_PAGE=False):
+            response = self.client.get('/api/tmdb/discover/', {'sort_by': 'vote_average.desc'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([movie['id'] for movie in response.json()['results']],
+                             self.expected(sort_by='vote_average.desc')[:20])
+            self.assertEqual(server.request_count, 0)
+
+            self.client.get('/api/tmdb/discover/', {'sort_by': 'vote_average.desc', 'with_keywords': '9715'})
+            self.assertEqual(server.request_count, 1)
+
+
+def migrate_to_latest():
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class MovieCatalogMigrationTests(TransactionTestCase):
+    """Migração 0002: os metadados que cada entrada guardava passam para o catálogo (Movie)."""
+
+    before = [('favorites', '0001_initial')]
+    after = [('favorites', '0002_movie_catalog')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.addCleanup(migrate_to_latest)
+        old_apps = executor.loader.project_state(self.before).apps
+        OldUser = old_apps.get_model('favorites', 'User')
+        OldEntry = old_apps.get_model('favorites', 'UserMovieEntry')
+        users = [OldUser.objects.create(id=f'u{i}', email=f'u{i}@exemplo.com') for i in (1, 2)]
+        entries = [
+            (users[0], 550, "Clube da Luta", '/antigo.jpg', 7.0, datetime.datetime(2024, 1, 1)),
+            (users[1], 550, "Clube da Luta (2)", '/novo.jpg', 8.4, datetime.datetime(2024, 6, 1)),
+            (users[0], 680, "Pulp Fiction", None, 8.5, datetime.datetime(2024, 3, 1)),
+        ]
+        for user, tmdb_id, title, poster_path, rating, added_at in entries:
+            entry = OldEntry.objects.create(
+                user=user, tmdb_id=tmdb_id, title=title, poster_path=poster_path, rating=rating, is_favorite=True
+            )
+            OldEntry.objects.filter(pk=entry.pk).update(added_at=added_at.replace(tzinfo=datetime.timezone.utc))
+
+    def test_copies_metadata_from_the_most_recent_entry(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        new_apps = executor.loader.project_state(self.after).apps
+        NewMovie = new_apps.get_model('favorites', 'Movie')
+        NewEntry = new_apps.get_model('favorites', 'UserMovieEntry')
+
+        movies = {movie.tmdb_id: movie for movie in NewMovie.objects.all()}
+        self.assertEqual(set(movies), {550, 680})
+        # Entradas com valores diferentes para o mesmo filme: vale a mais recente
+        self.assertEqual(
+            (movies[550].title, movies[550].poster_path, movies[550].vote_average), ("Clube da Luta (2)", '/novo.jpg', 8.4)
+        )
+        self.assertEqual((movies[680].title, movies[680].poster_path, movies[680].vote_average), ("Pulp Fiction", None, 8.5))
+        self.assertIsNone(movies[550].fetched_at)
+        self.assertFalse(NewEntry.objects.exclude(movie_id=models.F('tmdb_id')).exists())
+        self.assertEqual(NewEntry.objects.count(), 3)
+
+    def test_reverse_copies_the_catalog_back_to_the_entries(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        new_apps = executor.loader.project_state(self.after).apps
+        new_apps.get_model('favorites', 'Movie').objects.filter(tmdb_id=680).update(title="Pulp Fiction (1994)")
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldEntry = executor.loader.project_state(self.before).apps.get_model('favorites', 'UserMovieEntry')
+        self.assertEqual(
+            sorted(OldEntry.objects.values_list('user_id', 'tmdb_id', 'title', 'poster_path', 'rating')),
+            [
+                ('u1', 550, "Clube da Luta (2)", '/novo.jpg', 8.4),
+                ('u1', 680, "Pulp Fiction (1994)", None, 8.5),
+                ('u2', 550, "Clube da Luta (2)", '/novo.jpg', 8.4),
+            ],
+        )
+
+
+class SingleMovieKeyMigrationTests(TransactionTestCase):
+    """Migração 0006: o filme da entrada fica só na chave estrangeira, na coluna tmdb_id."""
+
+    before = [('favorites', '0005_movie_trailer')]
+    after = [('favorites', '0006_user_movie_entry_single_movie_key')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.addCleanup(migrate_to_latest)
+        old_apps = executor.loader.project_state(self.before).apps
+        user = old_apps.get_model('favorites', 'User').objects.create(id='u1', email='u1@exemplo.com')
+        for tmdb_id in (550, 680):
+            old_apps.get_model('favorites', 'Movie').objects.create(tmdb_id=tmdb_id, title=f"Filme {tmdb_id}")
+            old_apps.get_model('favorites', 'UserMovieEntry').objects.create(
+                user=user, tmdb_id=tmdb_id, movie_id=tmdb_id, is_favorite=True
+            )
+
+    def test_entries_keep_their_movie_both_ways(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        NewEntry = executor.loader.project_state(self.after).apps.get_model('favorites', 'UserMovieEntry')
+        self.assertEqual(sorted(NewEntry.objects.values_list('movie_id', flat=True)), [550, 680])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        OldEntry = executor.loader.project_state(self.before).apps.get_model('favorites', 'UserMovieEntry')
+        self.assertEqual(sorted(OldEntry.objects.values_list('tmdb_id', 'movie_id')), [(550, 550), (680, 680)])
+
+
+@override_settings(TMDB_MAX_RETRIES=0, TMDB_BATCH_CONCURRENCY=1)
+class TMDbMovieBatchTests(TransactionTestCase):
+    """
+    /api/tmdb/movies/batch/ contra o TMDb falso: a falha de um id vai para "errors" sem derrubar
+    o lote. Com TMDB_BATCH_CONCURRENCY=1 as chamadas saem na ordem dos jobs (detalhes, depois vídeos).
+    """
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        breaker_patch = mock.patch.object(
+            tmdb_client, 'breaker', CircuitBreaker(failure_threshold=5, reset_timeout=0.2, metrics=tmdb_client.metrics)
+        )
+        breaker_patch.start()
+        self.addCleanup(breaker_patch.stop)
+        tmdb_client.limiter.paused_until = 0.0
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        # 551 já está em cache (detalhes e vídeos): só os outros ids chamam o TMDb
+        self.client.get('/api/tmdb/movies/batch/', {'ids': '551'})
+        self.server.request_log.clear()
+
+    def batch(self, ids, expected_status=200, cache_control='no-store'):
+        result = self.client.get('/api/tmdb/movies/batch/', {'ids': ids})
+        self.assertEqual(result.status_code, expected_status)
+        # Falhas não podem ficar no cache do navegador ou da CDN depois que o TMDb voltar
+        self.assertEqual(result['Cache-Control'], cache_control)
+        return result.json()
+
+    def test_complete_batch_is_cacheable(self):
+        data = self.batch('551', cache_control=settings.API_CACHE_CONTROL['tmdb-movie-batch'])
+        self.assertEqual((list(data['results']), data['errors']), (['551'], {}))
+
+    def test_missing_movie_is_reported_by_id(self):
+        self.server.queue_errors(404)
+        data = self.batch('551,601')
+
+        self.assertEqual(self.server.request_log, ['/movie/601', '/movie/601/videos'])
+        self.assertEqual(set(data['results']), {'551'})
+        self.assertEqual(data['results']['551']['details']['id'], 551)
+        self.assertEqual(set(data['errors']), {'601'})
+        self.assertEqual((data['errors']['601']['part'], data['errors']['601']['status']), ('details', 404))
+
+    def test_trailer_failure_keeps_the_details(self):
+        tmdb_cache.fetch(*movie_detail_request(602))
+        self.server.request_log.clear()
+        self.server.queue_errors(500)
+        data = self.batch('602,551')
+
+        self.assertEqual(self.server.request_log, ['/movie/602/videos'])
+        self.assertEqual(list(data['results']), ['602', '551'])
+        self.assertEqual(data['results']['602']['details']['id'], 602)
+        self.assertIsNone(data['results']['602']['trailer'])
+        self.assertEqual(data['results']['551']['trailer']['key'], 'trailer551')
+        self.assertEqual(set(data['errors']), {'602'})
+        self.assertEqual((data['errors']['602']['part'], data['errors']['602']['status']), ('trailer', 503))
+
+    def test_upstream_outage_fails_every_uncached_id_but_not_the_batch(self):
+        self.server.queue_errors(500, count=4)
+        data = self.batch('551,603,604')
+        self.assertEqual(list(data['results']), ['551'])
+        self.assertEqual({movie_id: error['part'] for movie_id, error in data['errors'].items()},
+                         {'603': 'details', '604': 'details'})
+        self.assertEqual({error['status'] for error in data['errors'].values()}, {503})
+
+    def test_batch_without_any_movie_is_an_error(self):
+        self.server.queue_errors(500, count=4)
+        data = self.batch('603,604', expected_status=503)
+        self.assertEqual((data['results'], set(data['errors'])), ({}, {'603', '604'}))
+
+        # Nenhum dos ids existe no TMDb
+        self.server.queue_errors(404, count=2)
+        self.batch('605', expected_status=404)
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ('', '551,abc', ','.join(str(i) for i in range(1, settings.TMDB_BATCH_MAX_IDS + 2))):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.client.get('/api/tmdb/movies/batch/', {'ids': ids}).status_code, 400)
+        self.assertEqual(self.server.request_count, 0)
+
+
+class MovieDetailProjectionTests(TestCase):
+    """Projeção dos detalhes do filme (projections.py) e ?fields= de /api/tmdb/movie/<id>/, contra o TMDb falso."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        projections_patch = mock.patch.object(projections, '_projections', LRUCache(100))
+        projections_patch.start()
+        self.addCleanup(projections_patch.stop)
+
+    @override_settings(TMDB_DETAIL_CAST_SIZE=5)
+    def test_projection_keeps_main_cast_shown_crew_and_brazil(self):
+        data = fake_tmdb.movie_detail(550)
+        data['credits']['cast'].reverse()
+        data['credits']['crew'][1]['job'] = 'Original Music Composer'
+        original = json.dumps(data, sort_keys=True)
+
+        projected = projections.project_movie_detail(data)
+
+        self.assertEqual([person['order'] for person in projected['credits']['cast']], [0, 1, 2, 3, 4])
+        self.assertEqual(set(projected['credits']['cast'][0]), set(projections.CAST_FIELDS))
+        self.assertEqual([person['job'] for person in projected['credits']['crew']], ['Director', 'Original Music Composer'])
+        self.assertEqual(list(projected['watch/providers']['results']), ['BR'])
+        self.assertEqual([entry['iso_3166_1'] for entry in projected['release_dates']['results']], ['BR'])
+        # Os outros campos passam como vieram, e o documento do cache não é alterado
+        self.assertEqual(projected['title'], data['title'])
+        self.assertEqual(projected['genres'], data['genres'])
+        self.assertEqual(json.dumps(data, sort_keys=True), original)
+
+    def test_documents_without_appended_parts_are_left_alone(self):
+        data = {'id': 550, 'title': "Clube da Luta", 'watch/providers': {'results': {'US': {}}}}
+        projected = projections.project_movie_detail(data)
+        self.assertEqual(projected, {'id': 550, 'title': "Clube da Luta", 'watch/providers': {'results': {}}})
+
+    def test_fields_selects_top_level_keys(self):
+        self.assertEqual(projections.parse_fields(' id, title,,credits '), ['id', 'title', 'credits'])
+        response = self.client.get('/api/tmdb/movie/550/', {'fields': 'id,title,credits,inexistente'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'id', 'title', 'credits'})
+        self.assertEqual(len(response.json()['credits']['cast']), settings.TMDB_DETAIL_CAST_SIZE)
+
+        full = self.client.get('/api/tmdb/movie/550/', {'fields': ''}).json()
+        self.assertIn('runtime', full)
+        self.assertEqual(full['credits'], response.json()['credits'])
+
+    def test_projection_is_computed_once_per_cache_entry(self):
+        with mock.patch.object(projections, 'project_movie_detail', wraps=projections.project_movie_detail) as project:
+            for fields in ('', 'id,title', 'credits'):
+                self.client.get('/api/tmdb/movie/550/', {'fields': fields})
+            self.assertEqual(project.call_count, 1)
+
+            # Entrada nova no cache (outro objeto): a projeção é refeita, mesmo com o mesmo id
+            tmdb_cache.clear()
+            Movie.objects.filter(tmdb_id=550).update(details_fetched_at=None)
+            self.client.get('/api/tmdb/movie/550/')
+            self.assertEqual(project.call_count, 2)
+            self.assertEqual(self.server.request_count, 2)
+
+
+class TrailerIndexTests(TestCase):
+    """O índice de trailers (trailers.py) devolve o mesmo trailer que pick_official_trailer escolhe na lista do TMDb."""
+
+    def video(self, key, type='Trailer', official=True):
+        return {'id': f'v-{key}', 'key': key, 'name': key, 'site': 'YouTube', 'type': type, 'official': official}
+
+    def test_lookup_matches_pick_official_trailer(self):
+        video_lists = {
+            1: [self.video('teaser', 'Teaser'), self.video('extra', official=False), self.video('oficial')],
+            2: [self.video('primeiro', official=False), self.video('segundo', official=False)],
+            3: [self.video('teaser', 'Teaser'), self.video('clip', 'Clip')],
+            4: [],
+        }
+        for movie_id, results in video_lists.items():
+            trailer_index.record_videos(movie_id, {'id': movie_id, 'results': results})
+
+        found = trailer_index.lookup(list(video_lists) + [5])
+        self.assertEqual(set(found), set(video_lists))
+        for movie_id, results in video_lists.items():
+            with self.subTest(movie_id=movie_id):
+                expected = pick_official_trailer({'results': results})
+                self.assertEqual(found[movie_id], expected)
+                # O documento montado do índice leva pick_official_trailer ao mesmo vídeo
+                self.assertEqual(pick_official_trailer(videos_document(movie_id, found[movie_id])), expected)
+        self.assertEqual((found[1]['key'], found[2]['key'], found[3], found[4]), ('oficial', 'primeiro', None, None))
+
+    @override_settings(TMDB_TRAILER_INDEX_TTL=3600, TMDB_TRAILER_INDEX_NEGATIVE_TTL=60)
+    def test_expired_entries_are_not_returned(self):
+        trailer_index.store({1: self.video('oficial'), 2: None})
+        MovieTrailer.objects.update(fetched_at=timezone.now() - datetime.timedelta(seconds=120))
+        # O cache negativo vence antes do trailer
+        self.assertEqual(set(trailer_index.lookup([1, 2])), {1})
+
+    def test_videos_view_gives_the_same_trailer_from_tmdb_and_from_the_index(self):
+        server = FakeTMDbServer().start()
+        self.addCleanup(server.stop)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        with override_settings(TMDB_BASE_URL=server.url, TMDB_MAX_RETRIES=0):
+            # 601: oficial; 603: trailer não oficial (603 % 3 == 0)
+            for movie_id in (601, 603):
+                from_tmdb = self.client.get(f'/api/tmdb/movie/{movie_id}/videos/')
+                self.assertEqual(from_tmdb['X-Cache'], 'MISS')
+                tmdb_cache.clear()
+                from_index = self.client.get(f'/api/tmdb/movie/{movie_id}/videos/')
+                self.assertEqual(from_index['X-Cache'], 'HIT-DB')
+                self.assertEqual(from_index.json(), from_tmdb.json())
+                self.assertEqual(from_index.json(), pick_official_trailer(fake_tmdb.movie_videos(movie_id)))
+            self.assertEqual(server.request_count, 2)
+
+
+class PrewarmCommandTests(TransactionTestCase):
+    """Comando prewarm_tmdb contra o TMDb falso (as threads do comando gravam no catálogo)."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        # Sem o pré-carregamento da página 2, para contar só as chamadas do comando
+        settings_override = override_settings(
+            TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0, TMDB_PREFETCH_NEXT_PAGE=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+        tmdb_cache.access.clear()
+        self.addCleanup(tmdb_cache.access.clear)
+
+    def prewarm(self, *args):
+        out = io.StringIO()
+        call_command('prewarm_tmdb', '--jitter', '0', '--workers', '1', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_warms_lists_and_their_details_until_they_near_expiry(self):
+        self.prewarm('--details', '5')
+
+        lists = {'/movie/popular', '/movie/now_playing', '/movie/top_rated', '/movie/upcoming',
+                 '/trending/movie/day', '/trending/movie/week'}
+        self.assertEqual(set(self.server.request_log) & lists, lists)
+        details = [path for path in self.server.request_log if re.fullmatch(r'/movie/\d+', path)]
+        self.assertEqual(len(details), 5)
+        self.assertEqual(APIClient().get('/api/tmdb/popular/')['X-Cache'], 'HIT')
+
+        # Tudo ainda válido: nada vai ao TMDb
+        self.prewarm('--details', '5')
+        self.assertEqual(self.server.request_count, 11)
+
+        # Perto de vencer (--ahead maior que o TTL): renova; os detalhes saem do catálogo no banco
+        output = self.prewarm('--details', '5', '--ahead', str(24 * 3600))
+        self.assertEqual(self.server.request_count, 17)
+        self.assertIn("11 entradas aquecidas", output)
+
+    def test_warms_the_most_requested_keys(self):
+        client = APIClient()
+        for _ in range(3):
+            client.get('/api/tmdb/genres/')
+        client.get('/api/tmdb/languages/')
+        tmdb_cache.access.flush()
+        self.assertEqual(
+            [path for path, _, _ in tmdb_cache.access.hottest(2)], ['/genre/movie/list', '/configuration/languages']
+        )
+
+        tmdb_cache.clear()
+        self.server.request_log.clear()
+        self.prewarm('--details', '0', '--hot', '1')
+        self.assertIn('/genre/movie/list', self.server.request_log)
+        self.assertNotIn('/configuration/languages', self.server.request_log)
+
+
+@override_settings(TMDB_TRAILER_INDEX_TTL=3600, TMDB_TRAILER_INDEX_NEGATIVE_TTL=60)
+class RefreshTrailersCommandTests(TestCase):
+    """Comando refresh_trailers contra o TMDb falso: renova o índice de trailers e indexa os filmes que faltam."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        now = timezone.now()
+        # 601 e 602: com trailer; 603 e 604: sem trailer (o cache negativo vence em 60s)
+        entries = {601: (True, 7200), 602: (True, 1800), 603: (False, 120), 604: (False, 10)}
+        for tmdb_id, (has_trailer, age) in entries.items():
+            MovieTrailer.objects.create(
+                tmdb_id=tmdb_id,
+                trailer={'key': f'antigo-{tmdb_id}'} if has_trailer else None,
+                fetched_at=now - datetime.timedelta(seconds=age),
+            )
+        # Catálogo: 601 já está no índice; 611, 622 e 633 ainda não
+        for tmdb_id, popularity in ((601, 100), (611, 5), (622, 50), (633, 1)):
+            Movie.objects.create(tmdb_id=tmdb_id, title=f"Filme {tmdb_id}", popularity=popularity)
+
+    def refresh(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('refresh_trailers', '--workers', '1', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_due_movie_ids(self):
+        command = RefreshTrailersCommand()
+        # Vencidos (os mais antigos primeiro), depois os mais populares sem entrada
+        self.assertEqual(command.due_movie_ids(ahead=0, missing=2, limit=10), [601, 603, 622, 611])
+        self.assertEqual(command.due_movie_ids(ahead=0, missing=10, limit=3), [601, 603, 622])
+        self.assertEqual(command.due_movie_ids(ahead=0, missing=0, limit=10), [601, 603])
+        # Com --ahead, entram também as entradas que vencem nos próximos N segundos
+        self.assertEqual(command.due_movie_ids(ahead=3600, missing=0, limit=10), [601, 602, 603, 604])
+
+    def test_refreshes_due_entries_and_indexes_missing_movies(self):
+        fetched_before = dict(MovieTrailer.objects.values_list('tmdb_id', 'fetched_at'))
+        # Com um worker as chamadas saem na ordem da fila: 601 some do TMDb, 603 falha
+        self.server.queue_errors(404)
+        self.server.queue_errors(500)
+        out, err = self.refresh('--ahead', '0', '--missing', '2')
+
+        self.assertEqual(
+            self.server.request_log,
+            ['/movie/601/videos', '/movie/603/videos', '/movie/622/videos', '/movie/611/videos'],
+        )
+        self.assertIn("3 trailers indexados", out)
+        self.assertIn("1 falhas", out)
+        self.assertIn("Falha nos vídeos de 603", err)
+
+        trailers = {row.tmdb_id: row for row in MovieTrailer.objects.all()}
+        self.assertEqual(set(trailers), {601, 602, 603, 604, 611, 622})
+        # 404: o filme fica no índice como "sem trailer"
+        self.assertIsNone(trailers[601].trailer)
+        self.assertGreater(trailers[601].fetched_at, fetched_before[601])
+        # A falha não é gravada: a entrada antiga continua vencida e volta na próxima rodada
+        self.assertEqual(trailers[603].fetched_at, fetched_before[603])
+        for tmdb_id in (611, 622):
+            self.assertEqual(trailers[tmdb_id].trailer, pick_official_trailer(fake_tmdb.movie_videos(tmdb_id)))
+            self.assertIsNotNone(trailers[tmdb_id].trailer)
+        self.assertEqual(RefreshTrailersCommand().due_movie_ids(ahead=0, missing=0, limit=10), [603])
+
+
+class PagedListTests(TransactionTestCase):
+    """?page= nas listas do TMDb, com a página seguinte pré-carregada em background (que grava no catálogo)."""
+
+    def setUp(self):
+        self.server = FakeTMDbServer().start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(TMDB_BASE_URL=self.server.url, TMDB_MAX_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        tmdb_cache.clear()
+        self.addCleanup(tmdb_cache.clear)
+
+    def wait_for_upstream(self, path, page):
+        deadline = time.monotonic() + 5
+        while tmdb_cache.get_entry(tmdb_cache.normalize(path, {'language': 'pt-BR', 'page': page})) is None:
+            self.assertLess(time.monotonic(), deadline, f"{path} página {page} não foi pré-carregada")
+            time.sleep(0.01)
+
+    def test_next_page_is_prefetched(self):
+        client = APIClient()
+        first = client.get('/api/tmdb/top-rated/', {'page': 2})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['page'], 2)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        self.wait_for_upstream('/movie/top_rated', 3)
+        self.assertEqual(client.get('/api/tmdb/top-rated/', {'page': 3})['X-Cache'], 'HIT')
+        # ...que por sua vez pré-carrega a 4
+        self.wait_for_upstream('/movie/top_rated', 4)
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_drops_movies_already_served_on_the_previous_page(self):
+        params = {'language': 'pt-BR'}
+        for page, ids in ((1, [1, 2, 3]), (2, [3, 4, 5])):
+            data = {'page': page, 'results': [{'id': movie_id} for movie_id in ids], 'total_pages': 2}
+            tmdb_cache.set_entry(tmdb_cache.normalize('/movie/popular', dict(params, page=page)), data, 60)
+
+        second = APIClient().get('/api/tmdb/popular/', {'page': 2})
+        self.assertEqual([movie['id'] for movie in second.json()['results']], [4, 5])
+        # A cópia em cache continua inteira
+        cached = tmdb_cache.get_entry(tmdb_cache.normalize('/movie/popular', dict(params, page=2)))
+        self.assertEqual(len(cached.data['results']), 3)
+
+    def test_invalid_page_is_rejected(self):
+        for page in ('0', '501', 'dois'):
+            self.assertEqual(APIClient().get('/api/tmdb/discover/', {'page': page}).status_code, 400)
+        self.assertEqual(self.server.request_count, 0)
+
+
+class FirstLoginTests(TransactionTestCase):
+    """Primeiro login com várias requisições simultâneas (o frontend dispara várias ao entrar)."""
+
+    concurrency = 20
+    # /api/movies/ lê das réplicas, quando configuradas
+    databases = '__all__'
+
+    def setUp(self):
+        verified_tokens.clear()
+        user_cache.clear()
+        patcher = firebase_stub()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_concurrently(self, target):
+        barrier = threading.Barrier(self.concurrency)
+        results, user_inserts = [], []
+
+        def count_inserts(execute, sql, params, many, context):
+            if re.match(r'INSERT INTO [`"]?favorites_user[`"]? ', sql):
+                user_inserts.append(sql)
+            result = execute(sql, params, many, context)
+            if sql.startswith('SELECT'):
+                # Latência de rede até o banco: alarga a janela entre ler e escrever, como em produção
+                time.sleep(0.01)
+            return result
+
+        def worker(i):
+            try:
+                with connection.execute_wrapper(count_inserts):
+                    barrier.wait()
+                    results.append(target(i))
+            except Exception as e:
+                results.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, user_inserts
+
+    def test_concurrent_first_requests_provision_the_user_once(self):
+        def request(i):
+            # Um token diferente por requisição, para nenhuma aproveitar o cache de tokens da outra
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer novo:{i}')
+            return client.get('/api/movies/').status_code
+
+        statuses, user_inserts = self.run_concurrently(request)
+
+        self.assertEqual(statuses, [200] * self.concurrency)
+        self.assertEqual(len(user_inserts), 1)
+        self.assertEqual(User.objects.filter(id='novo').count(), 1)
+
+    def test_concurrent_upserts_across_processes_do_not_fail(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("o SQLite em memória recusa (em vez de enfileirar) escritas concorrentes")
+        # Sem a coalescência do processo: cada thread faz o seu upsert, como workers diferentes
+        results, _ = self.run_concurrently(lambda i: upsert_user('outro', 'outro@exemplo.com', 'Fulano'))
+
+        self.assertTrue(all(isinstance(user, User) for user in results), results)
+        self.assertEqual(User.objects.filter(id='outro').count(), 1)
+
+    def test_email_change_updates_cached_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer u1:a:antigo@exemplo.com')
+        self.assertEqual(client.get('/api/movies/').status_code, 200)
+        self.assertEqual(user_cache.get('u1').email, 'antigo@exemplo.com')
+
+        client.credentials(HTTP_AUTHORIZATION='Bearer u1:b:novo@exemplo.com')
+        self.assertEqual(client.get('/api/movies/').status_code, 200)
+        self.assertEqual(User.objects.get(id='u1').email, 'novo@exemplo.com')
+        self.assertEqual(user_cache.get('u1').email, 'novo@exemplo.com')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DB_READ_YOUR_WRITES_CACHE='default')
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.addCleanup(use_replicas, False)
+        self.addCleanup(read_your_writes.cache.delete, read_your_writes.key('u1'))
+
+    def test_reads_use_the_primary_unless_the_view_allows_replicas(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Movie))
+        use_replicas()
+        self.assertEqual(router.db_for_read(Movie), 'replica1')
+        self.assertEqual(router.db_for_write(Movie), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'favorites'))
+
+    def test_pin_keeps_the_user_on_the_primary(self):
+        self.assertFalse(read_your_writes.is_pinned('u1'))
+        read_your_writes.pin('u1')
+        self.assertTrue(read_your_writes.is_pinned('u1'))
+
+    @override_settings(DB_READ_YOUR_WRITES_CACHE=None)
+    def test_without_a_shared_cache_users_stay_on_the_primary(self):
+        read_your_writes.pin('u1')
+        self.assertTrue(read_your_writes.is_pinned('u1'))
+        self.assertTrue(read_your_writes.is_pinned('u2'))
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertFalse(read_your_writes.is_pinned('u2'))
+
+
+@unittest.skipUnless(settings.DATABASE_REPLICAS, "sem réplicas configuradas (DB_REPLICA_HOSTS)")
+@override_settings(DB_READ_YOUR_WRITES_CACHE='default')
+class ReplicaReadTests(TransactionTestCase):
+    """Com réplicas (nos testes, espelhos do primário): GETs nelas, o usuário que escreveu no primário."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        verified_tokens.clear()
+        user_cache.clear()
+        patcher = firebase_stub()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Outros testes também escrevem como u1
+        read_your_writes.cache.delete(read_your_writes.key('u1'))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer u1')
+
+    def entry_queries(self, alias):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            self.assertEqual(self.client.get('/api/movies/').status_code, 200)
+        return [q['sql'] for q in queries if 'favorites_usermovieentry' in q['sql']]
+
+    def test_reads_go_to_the_replica_until_the_user_writes(self):
+        replica = settings.DATABASE_REPLICAS[0]
+        # Primeira requisição cria o usuário (no primário)
+        self.client.get('/api/movies/')
+        self.assertTrue(self.entry_queries(replica))
+
+        saved = self.client.post('/api/movie-status/', {
+            'tmdb_id': 550, 'list_type': 'is_favorite', 'status': True,
+            'movie_data': {'title': 'Clube da Luta'},
+        }, format='json')
+        self.assertEqual(saved.status_code, 200, saved.content)
+        self.assertFalse(self.entry_queries(replica))
 
-# Create your tests here.
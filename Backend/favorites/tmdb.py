@@ -0,0 +1,685 @@
+import asyncio
+import contextlib
+import logging
+import re
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import record_upstream
+
+logger = logging.getLogger(__name__)
+
+# Status do TMDb que valem uma nova tentativa (rate limit e falhas do servidor).
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def build_discover_request(query_params):
+    """
+    Traduz os parâmetros de /tmdb/discover/ para (endpoint, params) do TMDb:
+    com "query" vira uma busca por texto, sem ela um discover restrito ao Brasil.
+    """
+    query_params = query_params.copy()
+    query = query_params.pop('query', None)
+    if query:
+        endpoint = "/search/movie"
+        params = [("query", query[0])]
+    else:
+        endpoint = "/discover/movie"
+        params = [("watch_region", "BR"), ("certification_country", "BR")]
+    for key, values in query_params.lists():
+        params += [(key, value) for value in values]
+    params.append(("language", "pt-BR"))
+    return endpoint, params
+
+
+def parse_movie_ids(values, max_ids):
+    """
+    Lê ids de filmes de ?ids=1,2,3 (ou ?ids=1&ids=2), sem repetições e na ordem recebida.
+    Levanta ValueError com a mensagem para o cliente quando a lista é inválida.
+    """
+    movie_ids = []
+    for value in values:
+        for raw_id in value.split(','):
+            raw_id = raw_id.strip()
+            if not raw_id:
+                continue
+            if not raw_id.isdigit():
+                raise ValueError(f"Id de filme inválido: '{raw_id}'.")
+            if int(raw_id) not in movie_ids:
+                movie_ids.append(int(raw_id))
+    if not movie_ids:
+        raise ValueError("O parâmetro 'ids' é obrigatório.")
+    if len(movie_ids) > max_ids:
+        raise ValueError(f"No máximo {max_ids} ids por requisição.")
+    return movie_ids
+
+
+# O TMDb não responde páginas depois da 500
+MAX_PAGE = 500
+
+
+def parse_page(value):
+    """Lê ?page= (padrão 1). Levanta ValueError com a mensagem para o cliente quando é inválido."""
+    if value in (None, ''):
+        return 1
+    if not str(value).isdigit() or not 1 <= int(value) <= MAX_PAGE:
+        raise ValueError(f"page deve ser um número entre 1 e {MAX_PAGE}.")
+    return int(value)
+
+
+def with_page(params, page):
+    """Parâmetros de uma chamada paginada do TMDb apontando para a página `page`."""
+    if isinstance(params, dict):
+        params = params.items()
+    return [(key, value) for key, value in params or [] if key != 'page'] + [('page', page)]
+
+
+def drop_repeated_results(data, previous_page):
+    """
+    Página sem os filmes que já vieram na página anterior: as listas do TMDb mudam entre uma
+    chamada e outra, e o scroll infinito mostraria o mesmo filme duas vezes.
+    """
+    seen = {movie.get('id') for movie in previous_page.get('results', [])}
+    results = [movie for movie in data.get('results', []) if movie.get('id') not in seen]
+    if len(results) == len(data.get('results', [])):
+        return data
+    return dict(data, results=results)
+
+
+# Listas de filmes servidas pelas views (/movie/popular etc.) e janelas do trending
+MOVIE_LISTS = ("popular", "now_playing", "top_rated", "upcoming")
+TRENDING_WINDOWS = ("day", "week")
+
+# Endpoints do TMDb chamados pelo projeto, com os ids como {id}. Nas métricas, qualquer outro
+# caminho vira OTHER_ENDPOINT, para o número de séries não crescer com o que vem na URL
+TMDB_ENDPOINTS = frozenset(
+    [f"/movie/{name}" for name in MOVIE_LISTS]
+    + [f"/trending/movie/{window}" for window in TRENDING_WINDOWS]
+    + ["/movie/{id}", "/movie/{id}/videos", "/search/movie", "/discover/movie",
+       "/genre/movie/list", "/configuration/languages", "/watch/providers/movie"]
+)
+OTHER_ENDPOINT = "other"
+
+
+def movie_list_request(list_name, page=1):
+    return f"/movie/{list_name}", {"language": "pt-BR", "page": page}
+
+
+def trending_request(time_window):
+    """Levanta ValueError com a mensagem para o cliente quando a janela não é "day" nem "week"."""
+    if time_window not in TRENDING_WINDOWS:
+        raise ValueError(f"time_window deve ser um de: {', '.join(TRENDING_WINDOWS)}.")
+    return f"/trending/movie/{time_window}", {"language": "pt-BR"}
+
+
+def movie_detail_request(movie_id):
+    # Detalhes completos numa chamada só (elenco, onde assistir e classificação indicativa)
+    return f"/movie/{movie_id}", {
+        "language": "pt-BR",
+        "append_to_response": "credits,watch/providers,release_dates",
+    }
+
+
+def movie_videos_request(movie_id):
+    return f"/movie/{movie_id}/videos", {"language": "pt-BR"}
+
+
+def upstream_status(exc, default=503):
+    # Status devolvido pelo TMDb (ex: 404 para um id inexistente), ou `default` em falhas de rede
+    upstream_response = getattr(exc, 'response', None)
+    if upstream_response is not None and upstream_response.status_code == 404:
+        return 404
+    return default
+
+
+def pick_official_trailer(videos):
+    # Prefere o trailer oficial; senão, o primeiro trailer qualquer (numa passada só)
+    first_trailer = None
+    for video in videos.get('results', []):
+        if video['type'] == 'Trailer':
+            if video['official']:
+                return video
+            if first_trailer is None:
+                first_trailer = video
+    return first_trailer
+
+
+def build_batch_response(movie_ids, fetched):
+    """
+    Monta a resposta de /tmdb/movies/batch/. `fetched` mapeia (movie_id, "details" | "videos")
+    para (data, erro). Falhas são reportadas por id em "errors", sem derrubar o lote inteiro.
+    """
+    results, errors = {}, {}
+    for movie_id in movie_ids:
+        details, details_error = fetched[(movie_id, "details")]
+        videos, videos_error = fetched[(movie_id, "videos")]
+        if details_error is not None:
+            errors[movie_id] = {
+                "part": "details",
+                "status": upstream_status(details_error),
+                "error": f"Filme não encontrado ou falha na API: {details_error}",
+            }
+            continue
+        results[movie_id] = {
+            "details": details,
+            "trailer": pick_official_trailer(videos) if videos is not None else None,
+        }
+        if videos_error is not None:
+            errors[movie_id] = {
+                "part": "trailer",
+                "status": upstream_status(videos_error),
+                "error": f"Falha na API do TMDb: {videos_error}",
+            }
+    return {"results": results, "errors": errors}
+
+
+def batch_status(batch):
+    """
+    (status HTTP, cabeçalhos) da resposta de build_batch_response. Com erros a resposta não vai
+    para cache (senão navegador e CDN guardariam as falhas depois que o TMDb voltasse); sem
+    nenhum filme encontrado é 503, ou 404 se o TMDb disse que nenhum dos ids existe.
+    """
+    errors = batch["errors"]
+    if not errors:
+        return 200, {}
+    headers = {"Cache-Control": "no-store"}
+    if batch["results"]:
+        return 200, headers
+    if all(error["status"] == 404 for error in errors.values()):
+        return 404, headers
+    return 503, headers
+
+
+def retry_delay(attempt):
+    return settings.TMDB_RETRY_BACKOFF * (2 ** attempt)
+
+
+def parse_retry_after(value):
+    """Segundos pedidos no Retry-After (só o formato numérico), ou None."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Chamadas ao TMDb recusadas antes de sair do processo. São RequestException para que as
+# views e o tmdb_cache as tratem como qualquer falha do TMDb (servindo a cópia em cache, se houver).
+class TMDbUnavailable(requests.RequestException):
+    pass
+
+
+class RateLimitExceeded(TMDbUnavailable):
+    """O limite de chamadas por segundo (ou um Retry-After do TMDb) faria a requisição esperar demais."""
+
+
+class CircuitOpenError(TMDbUnavailable):
+    """O TMDb falhou seguidamente; as chamadas falham na hora até a próxima tentativa de teste."""
+
+
+# Métricas de latência das chamadas ao TMDb, agregadas por endpoint (por processo).
+class TMDbMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._counters = {}
+
+    @staticmethod
+    def endpoint_name(path):
+        # "/movie/550/videos" -> "/movie/{id}/videos", para não explodir o número de chaves
+        name = re.sub(r'/\d+', '/{id}', path)
+        return name if name in TMDB_ENDPOINTS else OTHER_ENDPOINT
+
+    def record(self, path, elapsed, status_code=None):
+        name = self.endpoint_name(path)
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'count': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'last_status': None,
+            })
+            elapsed_ms = elapsed * 1000
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['last_status'] = status_code
+            if status_code is None or status_code >= 400:
+                stats['errors'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                result[name] = dict(stats, avg_ms=stats['total_ms'] / stats['count'])
+            return result
+
+    def increment(self, counter, amount=1):
+        # Eventos do limitador e do circuito: throttled, throttled_seconds, rejected, rate_limited,
+        # retries, retries_out_of_time, circuit_opened e short_circuited
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._counters.clear()
+
+
+# Token bucket: até `rate` chamadas por segundo, com rajadas de até `capacity`.
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """Consome `tokens` se houver saldo; senão retorna quantos segundos faltam para haver."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+# Limite de chamadas por segundo ao TMDb para o processo inteiro (token bucket) ou, com
+# TMDB_RATE_LIMIT_CACHE, para todos os workers: nesse caso a contagem é uma janela de um segundo
+# no cache compartilhado (incr atômico no Redis). Um 429 com Retry-After pausa o limitador.
+class TMDbRateLimiter:
+    def __init__(self, rate=None, burst=None, cache_alias=None, metrics=None):
+        self.rate = settings.TMDB_RATE_LIMIT if rate is None else rate
+        self.bucket = TokenBucket(self.rate, settings.TMDB_RATE_LIMIT_BURST if burst is None else burst)
+        self.cache_alias = settings.TMDB_RATE_LIMIT_CACHE if cache_alias is None else cache_alias
+        self.metrics = metrics
+        self.paused_until = 0.0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _count(self, counter, amount=1):
+        if self.metrics is not None:
+            self.metrics.increment(counter, amount)
+
+    def pause_remaining(self):
+        paused_until = self.paused_until
+        shared = self.shared
+        if shared is not None:
+            paused_until = max(paused_until, shared.get('tmdb-rate:paused-until') or 0.0)
+        return max(0.0, paused_until - time.time())
+
+    def pause(self, seconds):
+        """Segura todas as chamadas por `seconds` (Retry-After de um 429)."""
+        until = time.time() + seconds
+        self.paused_until = max(self.paused_until, until)
+        shared = self.shared
+        if shared is not None:
+            shared.set('tmdb-rate:paused-until', until, int(seconds) + 1)
+
+    def try_acquire(self):
+        """0 se a chamada pode sair agora; senão, quantos segundos esperar."""
+        paused = self.pause_remaining()
+        if paused:
+            return paused
+        shared = self.shared
+        if shared is None:
+            return self.bucket.try_acquire()
+        now = time.time()
+        window = int(now)
+        key = f'tmdb-rate:{window}'
+        shared.add(key, 0, 5)
+        try:
+            count = shared.incr(key)
+        except ValueError:
+            # A chave expirou entre o add e o incr
+            shared.add(key, 1, 5)
+            count = 1
+        if count <= max(1, self.rate):
+            return 0.0
+        return window + 1 - now
+
+    def acquire(self, max_wait=None):
+        """Espera a vez da chamada; levanta RateLimitExceeded se a espera passaria de `max_wait`."""
+        max_wait = settings.TMDB_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                break
+            if waited + wait > max_wait:
+                self._count('rejected')
+                raise RateLimitExceeded(f"Limite de chamadas ao TMDb atingido (próxima vaga em {wait:.1f}s)")
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            self._count('throttled')
+            self._count('throttled_seconds', waited)
+
+    async def aacquire(self, max_wait=None):
+        max_wait = settings.TMDB_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        # Com cache compartilhado, a contagem faz I/O: sai do event loop
+        try_acquire = sync_to_async(self.try_acquire) if self.shared is not None else self.try_acquire
+        waited = 0.0
+        while True:
+            wait = await try_acquire() if self.shared is not None else try_acquire()
+            if not wait:
+                break
+            if waited + wait > max_wait:
+                self._count('rejected')
+                raise RateLimitExceeded(f"Limite de chamadas ao TMDb atingido (próxima vaga em {wait:.1f}s)")
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            self._count('throttled')
+            self._count('throttled_seconds', waited)
+
+
+# Circuit breaker do TMDb (por processo): depois de TMDB_CIRCUIT_FAILURE_THRESHOLD falhas
+# seguidas (rede, 429 ou 5xx) o circuito abre e as chamadas falham na hora, sem esperar timeouts;
+# o tmdb_cache serve a cópia que tiver. Passados TMDB_CIRCUIT_RESET_TIMEOUT segundos, uma única
+# chamada de teste decide se o circuito fecha ou volta a abrir.
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=None, reset_timeout=None, metrics=None):
+        self.failure_threshold = failure_threshold or settings.TMDB_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = settings.TMDB_CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.metrics = metrics
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        if self.metrics is not None:
+            self.metrics.increment(counter)
+
+    def before_call(self):
+        """Levanta CircuitOpenError se a chamada não deve sair."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Esta chamada é o teste; as demais continuam falhando na hora até ela terminar
+                self.state = self.HALF_OPEN
+                return
+        self._count('short_circuited')
+        raise CircuitOpenError("TMDb indisponível (circuito aberto)")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                opened = True
+            else:
+                opened = False
+        if opened:
+            self._count('circuit_opened')
+            logger.warning("Circuito do TMDb aberto depois de %d falhas seguidas", self.failures)
+
+    def record_response(self, status_code):
+        # 429 e 5xx contam como falha do TMDb; 404 e afins são respostas normais
+        if status_code == 429 or status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    @contextlib.contextmanager
+    def resolve_call(self):
+        """
+        Envolve a chamada ao TMDb até haver uma resposta HTTP (que vai para record_response).
+        Qualquer exceção antes disso resolve a chamada, para a de teste nunca deixar o circuito
+        preso em HALF_OPEN: falhas de rede, respostas truncadas ou corrompidas e redirects em
+        excesso contam como falha; limite de taxa e cancelamento (cliente ASGI que desconectou)
+        devolvem a vez ao próximo pedido.
+        """
+        try:
+            yield
+        except RateLimitExceeded:
+            self.record_skipped()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_skipped()
+            raise
+
+    def record_skipped(self):
+        # A chamada de teste nem saiu (ex: limite de taxa): o próximo pedido vira o teste
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = 0.0
+
+
+# Cliente HTTP único para o TMDb: pool de conexões keep-alive, timeouts, retries com backoff,
+# limite de chamadas por segundo e circuit breaker.
+class TMDbClient:
+    def __init__(self):
+        self.metrics = TMDbMetrics()
+        self.limiter = TMDbRateLimiter(metrics=self.metrics)
+        self.breaker = CircuitBreaker(metrics=self.metrics)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return settings.TMDB_BASE_URL.rstrip('/')
+
+    @property
+    def timeout(self):
+        return (settings.TMDB_CONNECT_TIMEOUT, settings.TMDB_READ_TIMEOUT)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        # Os retries ficam em _get_with_retries: cada tentativa passa pelo limitador
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.TMDB_POOL_MAXSIZE,
+            pool_block=False,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept': 'application/json'})
+        return session
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _get_with_retries(self, url, query):
+        retries = settings.TMDB_MAX_RETRIES
+        deadline = time.monotonic() + settings.TMDB_TOTAL_TIMEOUT
+        for attempt in range(retries + 1):
+            self.limiter.acquire()
+            try:
+                tmdb_response = self.session.get(url, params=query, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = None if attempt == retries else retry_wait(self.limiter, self.metrics, None, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                if tmdb_response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return tmdb_response
+                delay = retry_wait(self.limiter, self.metrics, tmdb_response, attempt, deadline)
+                if delay is None:
+                    return tmdb_response
+            time.sleep(delay)
+
+    def get(self, path, params=None):
+        """
+        Faz um GET em `path` (ex: "/movie/popular") e retorna o JSON decodificado.
+        `params` pode ser um dict ou uma lista de tuplas (para parâmetros repetidos).
+        Levanta requests.RequestException em qualquer falha de rede ou status >= 400, e
+        TMDbUnavailable quando o limitador ou o circuito recusam a chamada.
+        """
+        if isinstance(params, dict):
+            params = list(params.items())
+        query = list(params or []) + [('api_key', settings.TMDB_API_KEY)]
+
+        self.breaker.before_call()
+        status_code = None
+        start = time.perf_counter()
+        try:
+            with self.breaker.resolve_call():
+                tmdb_response = self._get_with_retries(f"{self.base_url}{path}", query)
+            status_code = tmdb_response.status_code
+            self.breaker.record_response(status_code)
+            tmdb_response.raise_for_status()
+            return tmdb_response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(path, elapsed, status_code)
+            record_upstream(self.metrics.endpoint_name(path), elapsed, status_code)
+            logger.debug("TMDb GET %s -> %s em %.1fms", path, status_code, elapsed * 1000)
+
+
+def retry_wait(limiter, metrics, tmdb_response, attempt, deadline):
+    """
+    Segundos até a próxima tentativa depois de uma falha, ou None para desistir. O Retry-After
+    de um 429 pausa o limitador (a próxima tentativa espera nele, junto com as demais chamadas);
+    se passar de TMDB_RATE_LIMIT_MAX_WAIT, não vale a pena esperar. Também desiste quando a
+    espera mais o pior caso da próxima tentativa (connect + read timeout) passariam de
+    `deadline` (time.monotonic() do fim do prazo TMDB_TOTAL_TIMEOUT).
+    """
+    delay = wait = retry_delay(attempt)
+    if tmdb_response is not None and tmdb_response.status_code == 429:
+        metrics.increment('rate_limited')
+        retry_after = parse_retry_after(tmdb_response.headers.get('Retry-After'))
+        if retry_after is not None:
+            limiter.pause(retry_after)
+            if retry_after > settings.TMDB_RATE_LIMIT_MAX_WAIT:
+                return None
+            delay, wait = 0.0, retry_after
+    if time.monotonic() + wait + settings.TMDB_CONNECT_TIMEOUT + settings.TMDB_READ_TIMEOUT > deadline:
+        metrics.increment('retries_out_of_time')
+        return None
+    metrics.increment('retries')
+    return delay
+
+
+# Versão assíncrona do cliente (views ASGI): httpx.AsyncClient com HTTP/2 e pool de conexões.
+# O httpx.AsyncClient fica preso ao event loop em que foi criado, então há um cliente por loop.
+class AsyncTMDbClient:
+    def __init__(self, metrics, limiter, breaker):
+        # Métricas, limitador e circuito são os do cliente síncrono: os limites valem para o processo
+        self.metrics = metrics
+        self.limiter = limiter
+        self.breaker = breaker
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=settings.TMDB_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.TMDB_ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TMDB_POOL_MAXSIZE,
+                ),
+                timeout=httpx.Timeout(settings.TMDB_READ_TIMEOUT, connect=settings.TMDB_CONNECT_TIMEOUT),
+                headers={'Accept': 'application/json'},
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def _get_with_retries(self, url, query):
+        client = self._client()
+        retries = settings.TMDB_MAX_RETRIES
+        deadline = time.monotonic() + settings.TMDB_TOTAL_TIMEOUT
+        for attempt in range(retries + 1):
+            await self.limiter.aacquire()
+            try:
+                tmdb_response = await client.get(url, params=query)
+            except httpx.TransportError:
+                delay = None if attempt == retries else retry_wait(self.limiter, self.metrics, None, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                if tmdb_response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return tmdb_response
+                delay = retry_wait(self.limiter, self.metrics, tmdb_response, attempt, deadline)
+                if delay is None:
+                    return tmdb_response
+            await asyncio.sleep(delay)
+
+    async def get(self, path, params=None):
+        """Mesmo contrato de TMDbClient.get, mas levanta httpx.HTTPError nas falhas (e TMDbUnavailable)."""
+        if isinstance(params, dict):
+            params = list(params.items())
+        query = list(params or []) + [('api_key', settings.TMDB_API_KEY)]
+
+        self.breaker.before_call()
+        status_code = None
+        start = time.perf_counter()
+        try:
+            with self.breaker.resolve_call():
+                tmdb_response = await self._get_with_retries(f"{settings.TMDB_BASE_URL.rstrip('/')}{path}", query)
+            status_code = tmdb_response.status_code
+            self.breaker.record_response(status_code)
+            tmdb_response.raise_for_status()
+            return tmdb_response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(path, elapsed, status_code)
+            record_upstream(self.metrics.endpoint_name(path), elapsed, status_code)
+            logger.debug("TMDb GET (async) %s -> %s em %.1fms", path, status_code, elapsed * 1000)
+
+
+tmdb_client = TMDbClient()
+async_tmdb_client = AsyncTMDbClient(tmdb_client.metrics, tmdb_client.limiter, tmdb_client.breaker)
@@ -0,0 +1,605 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .instrumentation import record_cache
+from .tmdb import MAX_PAGE, TMDbMetrics, async_tmdb_client, drop_repeated_results, tmdb_client, with_page
+
+logger = logging.getLogger(__name__)
+
+CACHE_HIT = 'HIT'
+CACHE_MISS = 'MISS'
+CACHE_STALE = 'STALE'
+# Resposta montada por uma fonte local (ex: catálogo no banco), sem chamar o TMDb
+CACHE_HIT_DB = 'HIT-DB'
+
+# Erros do cliente síncrono (requests) e do assíncrono (httpx)
+UPSTREAM_ERRORS = (requests.RequestException, httpx.HTTPError)
+
+
+class CacheEntry:
+    __slots__ = ('data', 'stored_at', 'expires_at')
+
+    def __init__(self, data, stored_at, expires_at):
+        self.data = data
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+    def stale_for(self, now=None):
+        return max(0.0, (now or time.time()) - self.expires_at)
+
+
+# LRU em memória, limitado por número de entradas e seguro entre threads.
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Garante uma única execução em andamento por chave; chamadas concorrentes esperam o resultado dela.
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+# Versão asyncio do SingleFlight. As tasks pertencem a um event loop, então há um mapa por loop.
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+
+    def _loop_calls(self):
+        return self._calls.setdefault(asyncio.get_running_loop(), {})
+
+    def in_flight(self, key):
+        return key in self._loop_calls()
+
+    async def do(self, key, coro_fn):
+        calls = self._loop_calls()
+        task = calls.get(key)
+        if task is None:
+            # A busca roda numa task própria: se a requisição que a iniciou for cancelada (cliente
+            # que desconectou), ela continua para as demais que esperam a mesma chave
+            task = calls[key] = asyncio.get_running_loop().create_task(coro_fn())
+            task.add_done_callback(lambda done: self._finish(calls, key, done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _finish(calls, key, task):
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            task.exception()  # marca como consumida caso ninguém esteja esperando
+
+
+# Frequência de acesso por chave, usada pelo comando prewarm_tmdb para renovar as entradas mais
+# pedidas antes de vencerem. Cada processo conta localmente e, a cada TMDB_PREWARM_FLUSH_INTERVAL
+# segundos, soma as contagens num ranking único no cache (o compartilhado, com REDIS_URL). O
+# ranking decai com meia-vida de TMDB_PREWARM_HALF_LIFE segundos, para refletir o que é pedido agora.
+class AccessTracker:
+    ranking_key = 'tmdb-access:ranking'
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    @property
+    def cache(self):
+        return caches[settings.TMDB_PREWARM_CACHE]
+
+    def record(self, normalized, path, params):
+        """Conta um acesso. Retorna True quando é hora de chamar flush()."""
+        if not settings.TMDB_PREWARM_TRACK:
+            return False
+        with self._lock:
+            counted = self._counts.get(normalized)
+            if counted is None:
+                if len(self._counts) >= settings.TMDB_PREWARM_TRACK_MAX_KEYS:
+                    return False
+                if isinstance(params, dict):
+                    params = params.items()
+                query = tuple((str(k), str(v)) for k, v in (params or []) if k != 'api_key')
+                counted = self._counts[normalized] = [path, query, 0]
+            counted[2] += 1
+            now = time.monotonic()
+            if now - self._flushed_at < settings.TMDB_PREWARM_FLUSH_INTERVAL:
+                return False
+            self._flushed_at = now
+            return True
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return
+        cache = self.cache
+        lock_key = self.ranking_key + ':lock'
+        deadline = time.monotonic() + 1
+        while not cache.add(lock_key, 1, 5):
+            if time.monotonic() > deadline:
+                # Outro processo demorou: as contagens ficam para o próximo flush
+                with self._lock:
+                    for normalized, (path, query, count) in counts.items():
+                        self._counts.setdefault(normalized, [path, query, 0])[2] += count
+                return
+            time.sleep(0.05)
+        try:
+            ranking = self.decayed(cache.get(self.ranking_key))
+            for normalized, (path, query, count) in counts.items():
+                ranking.setdefault(normalized, [path, query, 0.0])[2] += count
+            top = sorted(ranking.items(), key=lambda item: item[1][2], reverse=True)
+            keys = dict(top[:settings.TMDB_PREWARM_TRACK_MAX_KEYS])
+            cache.set(self.ranking_key, {'updated_at': time.time(), 'keys': keys}, 7 * 24 * 3600)
+        finally:
+            cache.delete(lock_key)
+
+    @staticmethod
+    def decayed(stored, now=None):
+        if not stored:
+            return {}
+        factor = 0.5 ** (((now or time.time()) - stored['updated_at']) / settings.TMDB_PREWARM_HALF_LIFE)
+        return {normalized: [path, query, score * factor] for normalized, (path, query, score) in stored['keys'].items()}
+
+    def hottest(self, limit):
+        """As `limit` chaves mais pedidas em todos os processos: [(path, params, pontuação), ...]."""
+        ranking = self.decayed(self.cache.get(self.ranking_key))
+        top = sorted(ranking.values(), key=lambda item: item[2], reverse=True)
+        return [(path, list(query), score) for path, query, score in top[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+        self.cache.delete(self.ranking_key)
+
+
+def is_upstream_failure(exc):
+    # TMDb fora do ar, timeout, 429 ou 5xx. Um 404 é uma resposta legítima, não uma falha.
+    upstream_response = getattr(exc, 'response', None)
+    if isinstance(exc, (requests.HTTPError, httpx.HTTPStatusError)) and upstream_response is not None:
+        return upstream_response.status_code == 429 or upstream_response.status_code >= 500
+    return True
+
+
+# Cache em dois níveis para as respostas do TMDb: LRU local + backend de cache do Django (opcional).
+# Entradas expiradas continuam guardadas por um tempo: são servidas enquanto um refresh roda
+# em background (stale-while-revalidate) e como última cópia boa quando o TMDb falha (stale-if-error).
+#
+# Extensões: "sources" respondem um endpoint localmente antes de ir ao TMDb (retornando None
+# para seguir adiante) e "listeners" recebem cada resposta nova do TMDb. Ambos são síncronos
+# e podem acessar o banco.
+class TMDbCache:
+    def __init__(self, client, async_client):
+        self.client = client
+        self.async_client = async_client
+        self.local = LRUCache(settings.TMDB_CACHE_MAX_ENTRIES)
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+        self.sources = {}
+        self.listeners = []
+        self.access = AccessTracker()
+        self._background_tasks = set()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def add_source(self, endpoint, source):
+        """`source(path, params)` responde `endpoint` (ex: "/movie/{id}") localmente, ou retorna None."""
+        self.sources[endpoint] = source
+
+    def add_listener(self, listener):
+        """`listener(path, params, data)` é chamado a cada resposta nova vinda do TMDb."""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def _from_source(self, path, params):
+        source = self.sources.get(TMDbMetrics.endpoint_name(path))
+        if source is None:
+            return None
+        try:
+            return source(path, params)
+        except Exception:
+            logger.warning("Falha na fonte local de %s", path, exc_info=True)
+            return None
+
+    def _notify(self, path, params, data):
+        for listener in self.listeners:
+            try:
+                listener(path, params, data)
+            except Exception:
+                logger.warning("Falha no listener %r para %s", listener, path, exc_info=True)
+
+    @property
+    def shared(self):
+        alias = settings.TMDB_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.TMDB_CACHE_REFRESH_WORKERS,
+                        thread_name_prefix='tmdb-refresh',
+                    )
+        return self._executor
+
+    @staticmethod
+    def normalize(path, params=None):
+        # URL do upstream sem a api_key e com os parâmetros ordenados
+        if isinstance(params, dict):
+            params = params.items()
+        query = sorted((str(k), str(v)) for k, v in (params or []) if k != 'api_key')
+        return f"{path}?{urlencode(query)}" if query else path
+
+    @staticmethod
+    def shared_key(normalized):
+        return 'tmdb:' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def ttl_for(path):
+        ttls = settings.TMDB_CACHE_TTLS
+        return ttls.get(TMDbMetrics.endpoint_name(path), ttls['default'])
+
+    def get_entry(self, normalized):
+        """Retorna a entrada mais recente (fresca ou expirada) dos dois níveis, ou None."""
+        entry = self.local.get(normalized)
+        if entry is not None and entry.is_fresh():
+            return entry
+
+        shared = self.shared
+        if shared is not None:
+            stored = shared.get(self.shared_key(normalized))
+            if stored is not None:
+                shared_entry = CacheEntry(*stored)
+                if entry is None or shared_entry.stored_at > entry.stored_at:
+                    self.local.set(normalized, shared_entry)
+                    entry = shared_entry
+        return entry
+
+    def set_entry(self, normalized, data, ttl):
+        now = time.time()
+        entry = CacheEntry(data, now, now + ttl)
+        self.local.set(normalized, entry)
+        shared = self.shared
+        if shared is not None:
+            shared.set(
+                self.shared_key(normalized),
+                (entry.data, entry.stored_at, entry.expires_at),
+                ttl + settings.TMDB_CACHE_STALE_IF_ERROR,
+            )
+        return entry
+
+    def _load(self, normalized, path, params, ttl):
+        """Busca a entrada na fonte local ou no TMDb. Retorna (entry, status_do_cache)."""
+        ttl = self.ttl_for(path) if ttl is None else ttl
+        data = self._from_source(path, params)
+        if data is not None:
+            return self.set_entry(normalized, data, ttl), CACHE_HIT_DB
+
+        shared = self.shared
+        lock_key = None
+        if shared is not None:
+            # Coalescência entre workers: só quem pega a trava vai ao TMDb; os demais esperam
+            # a entrada nova aparecer no cache compartilhado (e buscam sozinhos se demorar demais).
+            lock_key = self.shared_key(normalized) + ':lock'
+            if not shared.add(lock_key, 1, settings.TMDB_READ_TIMEOUT):
+                lock_key = None
+                started = time.time()
+                deadline = started + settings.TMDB_CACHE_LOCK_WAIT
+                while time.time() < deadline:
+                    time.sleep(0.05)
+                    entry = self.get_entry(normalized)
+                    if entry is not None and entry.is_fresh() and entry.stored_at >= started:
+                        return entry, CACHE_HIT
+        try:
+            data = self.client.get(path, params)
+            entry = self.set_entry(normalized, data, ttl)
+        finally:
+            if lock_key is not None:
+                shared.delete(lock_key)
+        self._notify(path, params, data)
+        return entry, CACHE_MISS
+
+    def _refresh_in_background(self, normalized, path, params, ttl):
+        if self.flights.in_flight(normalized):
+            return
+
+        def refresh():
+            try:
+                self.flights.do(normalized, lambda: self._load(normalized, path, params, ttl))
+            except Exception:
+                logger.warning("Falha ao revalidar %s no TMDb", normalized, exc_info=True)
+            finally:
+                close_old_connections()
+
+        self.executor.submit(refresh)
+
+    def fetch(self, path, params=None, ttl=None):
+        """
+        Retorna (data, status_do_cache) para um GET no TMDb, onde o status é HIT, MISS ou STALE.
+        Erros do upstream só sobem para a view quando não há nenhuma cópia anterior para servir.
+        """
+        data, cache_status = self._fetch(path, params, ttl)
+        record_cache(cache_status)
+        return data, cache_status
+
+    def _track_access(self, normalized, path, params):
+        if self.access.record(normalized, path, params):
+            self.executor.submit(self._flush_access)
+
+    def _flush_access(self):
+        try:
+            self.access.flush()
+        except Exception:
+            logger.warning("Falha ao gravar o ranking de acessos do TMDb", exc_info=True)
+
+    def _fetch(self, path, params, ttl):
+        normalized = self.normalize(path, params)
+        self._track_access(normalized, path, params)
+        entry = self.get_entry(normalized)
+        if entry is not None:
+            if entry.is_fresh():
+                return entry.data, CACHE_HIT
+            if entry.stale_for() <= settings.TMDB_CACHE_STALE_WHILE_REVALIDATE:
+                self._refresh_in_background(normalized, path, params, ttl)
+                return entry.data, CACHE_STALE
+
+        try:
+            fresh, cache_status = self.flights.do(normalized, lambda: self._load(normalized, path, params, ttl))
+        except UPSTREAM_ERRORS as e:
+            if self._can_serve_stale(entry, e):
+                logger.warning("TMDb indisponível, servindo cópia expirada de %s: %s", normalized, e)
+                return entry.data, CACHE_STALE
+            raise
+        return fresh.data, cache_status
+
+    def prefetch(self, path, params=None):
+        """Busca em background uma entrada que ainda não está no cache (ex: a próxima página de uma lista)."""
+        normalized = self.normalize(path, params)
+        entry = self.local.get(normalized)
+        if (entry is not None and entry.is_fresh()) or self.flights.in_flight(normalized):
+            return
+
+        def load():
+            try:
+                entry = self.get_entry(normalized)
+                if entry is None or not entry.is_fresh():
+                    self.flights.do(normalized, lambda: self._load(normalized, path, params, None))
+            except Exception:
+                logger.warning("Falha ao pré-carregar %s do TMDb", normalized, exc_info=True)
+            finally:
+                close_old_connections()
+
+        self.executor.submit(load)
+
+    def fetch_page(self, path, params, page):
+        """
+        fetch() da página `page` de uma lista do TMDb, sem os filmes que já vieram na página
+        anterior e com a página seguinte pré-carregada em background (para o scroll infinito).
+        """
+        data, cache_status = self.fetch(path, with_page(params, page))
+        if page > 1:
+            previous = self.get_entry(self.normalize(path, with_page(params, page - 1)))
+            if previous is not None:
+                data = drop_repeated_results(data, previous.data)
+        if settings.TMDB_PREFETCH_NEXT_PAGE and page < min(data.get('total_pages') or 0, MAX_PAGE):
+            self.prefetch(path, with_page(params, page + 1))
+        return data, cache_status
+
+    def warm(self, path, params=None, ahead=0):
+        """
+        Recarrega a entrada (fonte local ou TMDb) se ela falta ou vence nos próximos `ahead`
+        segundos. Retorna (data, status_do_cache), com status None quando a entrada ainda vale.
+        """
+        normalized = self.normalize(path, params)
+        entry = self.get_entry(normalized)
+        if entry is not None and entry.expires_at - time.time() > ahead:
+            return entry.data, None
+        fresh, cache_status = self.flights.do(normalized, lambda: self._load(normalized, path, params, None))
+        return fresh.data, cache_status
+
+    @staticmethod
+    def _can_serve_stale(entry, exc):
+        if entry is None or entry.stale_for() > settings.TMDB_CACHE_STALE_IF_ERROR:
+            return False
+        return is_upstream_failure(exc)
+
+    # --- Caminho assíncrono (views ASGI) ---
+    # Mesma política do fetch() síncrono. A coalescência é feita dentro do processo (um worker
+    # ASGI atende centenas de requisições concorrentes), sem a trava no cache compartilhado.
+
+    async def aget_entry(self, normalized):
+        entry = self.local.get(normalized)
+        if entry is not None and entry.is_fresh():
+            return entry
+
+        shared = self.shared
+        if shared is not None:
+            stored = await shared.aget(self.shared_key(normalized))
+            if stored is not None:
+                shared_entry = CacheEntry(*stored)
+                if entry is None or shared_entry.stored_at > entry.stored_at:
+                    self.local.set(normalized, shared_entry)
+                    entry = shared_entry
+        return entry
+
+    async def aset_entry(self, normalized, data, ttl):
+        now = time.time()
+        entry = CacheEntry(data, now, now + ttl)
+        self.local.set(normalized, entry)
+        shared = self.shared
+        if shared is not None:
+            await shared.aset(
+                self.shared_key(normalized),
+                (entry.data, entry.stored_at, entry.expires_at),
+                ttl + settings.TMDB_CACHE_STALE_IF_ERROR,
+            )
+        return entry
+
+    async def _aload(self, normalized, path, params, ttl):
+        ttl = self.ttl_for(path) if ttl is None else ttl
+        if TMDbMetrics.endpoint_name(path) in self.sources:
+            data = await sync_to_async(self._from_source)(path, params)
+            if data is not None:
+                return await self.aset_entry(normalized, data, ttl), CACHE_HIT_DB
+
+        data = await self.async_client.get(path, params)
+        entry = await self.aset_entry(normalized, data, ttl)
+        if self.listeners:
+            await sync_to_async(self._notify)(path, params, data)
+        return entry, CACHE_MISS
+
+    def _arefresh_in_background(self, normalized, path, params, ttl):
+        if self.async_flights.in_flight(normalized):
+            return
+
+        async def refresh():
+            try:
+                await self.async_flights.do(normalized, lambda: self._aload(normalized, path, params, ttl))
+            except Exception:
+                logger.warning("Falha ao revalidar %s no TMDb", normalized, exc_info=True)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def afetch(self, path, params=None, ttl=None):
+        data, cache_status = await self._afetch(path, params, ttl)
+        record_cache(cache_status)
+        return data, cache_status
+
+    async def _afetch(self, path, params, ttl):
+        normalized = self.normalize(path, params)
+        self._track_access(normalized, path, params)
+        entry = await self.aget_entry(normalized)
+        if entry is not None:
+            if entry.is_fresh():
+                return entry.data, CACHE_HIT
+            if entry.stale_for() <= settings.TMDB_CACHE_STALE_WHILE_REVALIDATE:
+                self._arefresh_in_background(normalized, path, params, ttl)
+                return entry.data, CACHE_STALE
+
+        try:
+            fresh, cache_status = await self.async_flights.do(
+                normalized, lambda: self._aload(normalized, path, params, ttl)
+            )
+        except UPSTREAM_ERRORS as e:
+            if self._can_serve_stale(entry, e):
+                logger.warning("TMDb indisponível, servindo cópia expirada de %s: %s", normalized, e)
+                return entry.data, CACHE_STALE
+            raise
+        return fresh.data, cache_status
+
+    def aprefetch(self, path, params=None):
+        normalized = self.normalize(path, params)
+        entry = self.local.get(normalized)
+        if (entry is not None and entry.is_fresh()) or self.async_flights.in_flight(normalized):
+            return
+
+        async def load():
+            try:
+                entry = await self.aget_entry(normalized)
+                if entry is None or not entry.is_fresh():
+                    await self.async_flights.do(normalized, lambda: self._aload(normalized, path, params, None))
+            except Exception:
+                logger.warning("Falha ao pré-carregar %s do TMDb", normalized, exc_info=True)
+
+        task = asyncio.get_running_loop().create_task(load())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def afetch_page(self, path, params, page):
+        data, cache_status = await self.afetch(path, with_page(params, page))
+        if page > 1:
+            previous = await self.aget_entry(self.normalize(path, with_page(params, page - 1)))
+            if previous is not None:
+                data = drop_repeated_results(data, previous.data)
+        if settings.TMDB_PREFETCH_NEXT_PAGE and page < min(data.get('total_pages') or 0, MAX_PAGE):
+            self.aprefetch(path, with_page(params, page + 1))
+        return data, cache_status
+
+    def clear(self):
+        self.local.clear()
+
+
+tmdb_cache = TMDbCache(tmdb_client, async_tmdb_client)
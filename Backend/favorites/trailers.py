@@ -0,0 +1,91 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import MovieTrailer
+from .movie_status import chunks
+from .tmdb import TMDbMetrics, movie_videos_request, pick_official_trailer
+from .tmdb_cache import TMDbCache, tmdb_cache
+
+# Índice tmdb_id -> trailer escolhido (modelo MovieTrailer). A escolha do trailer é
+# determinística e quase nunca muda: em vez de baixar e percorrer a lista de vídeos a cada
+# requisição, /movie/{id}/videos é respondido do índice, preenchido sob demanda (a cada resposta
+# nova do TMDb) e renovado pelo comando refresh_trailers. Filmes sem trailer também ficam no
+# índice, por menos tempo (TMDB_TRAILER_INDEX_NEGATIVE_TTL).
+
+
+def videos_document(movie_id, trailer):
+    """Lista de vídeos no formato do TMDb com só o trailer escolhido (pick_official_trailer o devolve de novo)."""
+    return {"id": movie_id, "results": [trailer] if trailer is not None else []}
+
+
+class TrailerIndex:
+    @staticmethod
+    def ttl(trailer):
+        seconds = settings.TMDB_TRAILER_INDEX_TTL if trailer is not None else settings.TMDB_TRAILER_INDEX_NEGATIVE_TTL
+        return datetime.timedelta(seconds=seconds)
+
+    def lookup(self, movie_ids):
+        """{tmdb_id: trailer} dos ids com entrada válida no índice (trailer None = filme sem trailer)."""
+        now = timezone.now()
+        found = {}
+        for chunk in chunks(list(movie_ids)):
+            rows = MovieTrailer.objects.filter(tmdb_id__in=chunk).values_list('tmdb_id', 'trailer', 'fetched_at')
+            for tmdb_id, trailer, fetched_at in rows:
+                if now - fetched_at < self.ttl(trailer):
+                    found[tmdb_id] = trailer
+        return found
+
+    def store(self, trailers, batch_size=500):
+        """Grava {tmdb_id: trailer ou None} num INSERT ... ON DUPLICATE KEY UPDATE por lote."""
+        if not trailers:
+            return 0
+        now = timezone.now()
+        options = {}
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['tmdb_id']
+        MovieTrailer.objects.bulk_create(
+            [MovieTrailer(tmdb_id=tmdb_id, trailer=trailer, fetched_at=now) for tmdb_id, trailer in trailers.items()],
+            batch_size=batch_size, update_conflicts=True, update_fields=['trailer', 'fetched_at'], **options,
+        )
+        return len(trailers)
+
+    def record_videos(self, movie_id, videos):
+        trailer = pick_official_trailer(videos)
+        self.store({movie_id: trailer})
+        return trailer
+
+
+trailer_index = TrailerIndex()
+
+
+def is_standard_videos_request(path, params):
+    # Só a chamada padrão (mesmo idioma) vai para o índice
+    movie_id = path.split('/')[2]
+    return movie_id.isdigit() and TMDbCache.normalize(path, params) == TMDbCache.normalize(
+        *movie_videos_request(int(movie_id))
+    )
+
+
+def record_tmdb_videos(path, params, data):
+    """Listener do tmdb_cache: atualiza o índice com cada lista de vídeos nova do TMDb."""
+    if TMDbMetrics.endpoint_name(path) == '/movie/{id}/videos' and is_standard_videos_request(path, params):
+        trailer_index.record_videos(int(path.split('/')[2]), data)
+
+
+def videos_source(path, params):
+    """Fonte do tmdb_cache para /movie/{id}/videos: responde do índice enquanto a entrada é válida."""
+    if not is_standard_videos_request(path, params):
+        return None
+    movie_id = int(path.split('/')[2])
+    found = trailer_index.lookup([movie_id])
+    if movie_id not in found:
+        return None
+    return videos_document(movie_id, found[movie_id])
+
+
+def connect():
+    tmdb_cache.add_listener(record_tmdb_videos)
+    tmdb_cache.add_source('/movie/{id}/videos', videos_source)
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     UserMovieEntryListView,
     SetMovieStatusView,
+    BulkSetMovieStatusView,
     SharedListViewSet, 
     TMDbSearchAPIView, 
     PublicSharedListAPIView, 
@@ -17,6 +19,27 @@ from .views import (
     TMDbMovieVideosView,
     TMDbLanguagesView,
     TMDbWatchProvidersView, 
+    TMDbMovieBatchView,
+    TMDbHealthView,
+    MetricsView,
+    )
+
+if settings.TMDB_ASYNC_VIEWS:
+    # Deploy ASGI: as rotas do TMDb passam a usar as views assíncronas (httpx.AsyncClient)
+    from .async_views import (
+        AsyncTMDbSearchView as TMDbSearchAPIView,
+        AsyncTMDbNowPlayingView as TMDbNowPlayingAPIView,
+        AsyncTMDbPopularView as TMDbPopularAPIView,
+        AsyncTMDbGenreListView as TMDbGenreListView,
+        AsyncTMDbDiscoverView as TMDbDiscoverAPIView,
+        AsyncTMDbMovieDetailView as TMDbMovieDetailView,
+        AsyncTMDbTopRatedView as TMDbTopRatedAPIView,
+        AsyncTMDbTrendingView as TMDbTrendingAPIView,
+        AsyncTMDbUpcomingView as TMDbUpcomingAPIView,
+        AsyncTMDbMovieVideosView as TMDbMovieVideosView,
+        AsyncTMDbLanguagesView as TMDbLanguagesView,
+        AsyncTMDbWatchProvidersView as TMDbWatchProvidersView,
+        AsyncTMDbMovieBatchView as TMDbMovieBatchView,
     )
 
 router = DefaultRouter()
@@ -35,8 +58,12 @@ urlpatterns = [
     path('tmdb/trending/<str:time_window>/', TMDbTrendingAPIView.as_view(), name='tmdb-trending'),
     path('tmdb/upcoming/', TMDbUpcomingAPIView.as_view(), name='tmdb-upcoming'),
     path('tmdb/movie/<int:movie_id>/videos/', TMDbMovieVideosView.as_view(), name='tmdb-movie-videos'),
+    path('tmdb/movies/batch/', TMDbMovieBatchView.as_view(), name='tmdb-movie-batch'),
+    path('tmdb/health/', TMDbHealthView.as_view(), name='tmdb-health'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('movies/', UserMovieEntryListView.as_view(), name='user-movie-list'),
     path('movie-status/', SetMovieStatusView.as_view(), name='movie-status-set'),
+    path('movie-status/bulk/', BulkSetMovieStatusView.as_view(), name='movie-status-bulk'),
     path('tmdb/languages/', TMDbLanguagesView.as_view(), name='tmdb-languages'),
     path('tmdb/watch-providers/', TMDbWatchProvidersView.as_view(), name='tmdb-watch-providers'),
 
@@ -1,86 +1,180 @@
 from rest_framework import generics, viewsets, views, response, status
 from .models import User, UserMovieEntry, SharedList
-from .serializers import UserSerializer, UserMovieEntrySerializer, SharedListSerializer
+from .serializers import (
+    UserSerializer,
+    UserMovieEntrySerializer,
+    UserMovieEntryRowSerializer,
+    SharedListSerializer,
+    MovieStatusSerializer,
+)
 import requests
-from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from .auth import FirebaseAuthentication
+from .db_router import ReplicaReadMixin, read_your_writes
+from .instrumentation import render_metrics
+from .movie_status import LIST_TYPES, apply_movie_status_operations, set_movie_status
+from .pagination import UserMovieEntryCursorPagination
+from .projections import movie_detail_projection, parse_fields, select_fields
+from .public_lists import public_lists
+from .renderers import FastJSONRenderer
+from .tmdb import (
+    batch_status,
+    build_batch_response,
+    build_discover_request,
+    movie_detail_request,
+    movie_list_request,
+    movie_videos_request,
+    parse_movie_ids,
+    parse_page,
+    pick_official_trailer,
+    tmdb_client,
+    trending_request,
+    upstream_status,
+)
+from .tmdb_cache import tmdb_cache
+from .trailers import trailer_index, videos_document
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.db import connections
 from django.db.models import Q
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 
 
 # --- API para o Requisito 1 (Listar Filmes Favoritos, Assistir Depois, Já Assistidos) ---
-class UserMovieEntryListView(generics.ListAPIView):
+class UserMovieEntryListView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = UserMovieEntrySerializer
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # Só pagina com ?cursor ou ?page_size (ver UserMovieEntryCursorPagination)
+    pagination_class = UserMovieEntryCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        list_type = request.query_params.get('list_type')
+        if list_type is not None and list_type not in LIST_TYPES:
+            return response.Response({"error": "list_type inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        fields = self.requested_fields()
+        unknown = set(fields) - set(UserMovieEntrySerializer.Meta.fields)
+        if unknown:
+            return response.Response(
+                {"error": f"Campo(s) desconhecido(s) em fields: {', '.join(sorted(unknown))}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Leitura rápida: linhas de .values() direto para dicts, sem instanciar os modelos
+        row_serializer = UserMovieEntryRowSerializer(fields)
+        rows = row_serializer.values(self.get_queryset())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.many(page))
+        return response.Response(row_serializer.many(rows.iterator(chunk_size=2000)))
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields', '')
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
     def get_queryset(self):
         user = self.request.user
-        return UserMovieEntry.objects.filter(
-            Q(is_favorite=True) | Q(is_watch_later=True) | Q(is_watched=True),
-            user=user
-        )
-        
+        list_type = self.request.query_params.get('list_type')
+        # Com list_type o filtro é uma única flag, atendida pelos índices (user, flag, added_at)
+        flags = Q(**{list_type: True}) if list_type else Q(is_favorite=True) | Q(is_watch_later=True) | Q(is_watched=True)
+        return UserMovieEntry.objects.filter(flags, user=user).order_by('-added_at', '-id')
 
 
 # --- API para o Requisito 2 (Marcar/Desmarcar Filmes) ---
+def movie_status_error(errors):
+    # Mensagem única, no formato {"error": ...} que o frontend já trata
+    if any(errors[field][0].code in ('required', 'null') for field in ('tmdb_id', 'list_type') if field in errors):
+        return "tmdb_id e list_type são obrigatórios."
+    if 'tmdb_id' in errors:
+        return "tmdb_id inválido."
+    if 'list_type' in errors:
+        return "list_type inválido."
+    if 'status' in errors:
+        return "status deve ser true ou false."
+    if 'movie_data' in errors:
+        return "movie_data inválido."
+    return "Operação inválida."
+
+
 class SetMovieStatusView(views.APIView):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        tmdb_id = request.data.get('tmdb_id')
-        list_type = request.data.get('list_type') 
-        new_value = request.data.get('status') 
-        movie_data = request.data.get('movie_data', {})
-
-        if not tmdb_id or not list_type:
+        serializer = MovieStatusSerializer(data=request.data)
+        if not serializer.is_valid():
             return response.Response(
-                {"error": "tmdb_id e list_type são obrigatórios."}, 
+                {"error": movie_status_error(serializer.errors)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        entry, created = UserMovieEntry.objects.get_or_create(
-            user=request.user,
-            tmdb_id=tmdb_id,
-            defaults={
-                'title': movie_data.get('title', 'N/A'),
-                'poster_path': movie_data.get('poster_path', ''),
-                'rating': movie_data.get('rating', 0),
-            }
-        )
-        if list_type == 'is_favorite':
-            entry.is_favorite = new_value
-            
-        elif list_type == 'is_watch_later':
-            entry.is_watch_later = new_value
-            if new_value: 
-                entry.is_watched = False
-
-        elif list_type == 'is_watched':
-            entry.is_watched = new_value
-            if new_value: 
-                entry.is_watch_later = False
-        
-        else:
-            return response.Response(
-                {"error": "list_type inválido."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        if not entry.is_favorite and not entry.is_watch_later and not entry.is_watched:
-            entry.delete()
+        data = serializer.validated_data
+        tmdb_id = data['tmdb_id']
+
+        entry = set_movie_status(request.user, tmdb_id, data['list_type'], data['status'], data['movie_data'])
+        public_lists.invalidate(request.user.pk)
+        read_your_writes.pin(request.user.pk)
+        if entry is None:
             return response.Response(
                 {"tmdb_id": tmdb_id, "status": "deleted"}, 
                 status=status.HTTP_200_OK
             )
         else:
-            entry.save()
             serializer = UserMovieEntrySerializer(entry)
             return response.Response(serializer.data, status=status.HTTP_200_OK)
 
+# --- API para marcar/desmarcar vários filmes de uma vez (importações, sincronização offline) ---
+class BulkSetMovieStatusView(views.APIView):
+    authentication_classes = [FirebaseAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        # Aceita {"operations": [...]} ou a lista de operações direto no corpo
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(operations, list) or not operations:
+            return response.Response(
+                {"error": "operations deve ser uma lista não vazia."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_operations = settings.MOVIE_STATUS_BULK_MAX_OPERATIONS
+        if len(operations) > max_operations:
+            return response.Response(
+                {"error": f"No máximo {max_operations} operações por requisição."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Operações inválidas recebem o erro no próprio item; as demais são aplicadas
+        results = [None] * len(operations)
+        valid = []
+        for index, operation in enumerate(operations):
+            serializer = MovieStatusSerializer(data=operation)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "error": movie_status_error(serializer.errors)}
+
+        states = apply_movie_status_operations(request.user, [data for _, data in valid]) if valid else []
+        if valid:
+            public_lists.invalidate(request.user.pk)
+            read_your_writes.pin(request.user.pk)
+        for (index, data), flags in zip(valid, states):
+            if flags is None:
+                results[index] = {"index": index, "tmdb_id": data['tmdb_id'], "status": "deleted"}
+            else:
+                results[index] = {"index": index, "tmdb_id": data['tmdb_id'], "status": "saved", **flags}
+        return response.Response({"results": results}, status=status.HTTP_200_OK)
+
 # -- API para o Requisito 2 (Listas Compartilhadas) ---
-class SharedListViewSet(viewsets.ModelViewSet):
+class SharedListViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     serializer_class = SharedListSerializer
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsAuthenticated]
+    replica_actions = {'list', 'retrieve'}
 
     def get_queryset(self):
         user = self.request.user
@@ -88,6 +182,11 @@ class SharedListViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        read_your_writes.pin(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        read_your_writes.pin(self.request.user.pk)
 
 
 # --- APIs para o Requisito 3 (Integração com a API do TMDb) ---
@@ -102,15 +201,9 @@ class TMDbSearchAPIView(views.APIView):
                 {"error": "O parâmetro 'query' é obrigatório."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        api_key = settings.TMDB_API_KEY
-
-        url = f"https://api.themoviedb.org/3/search/movie?api_key={api_key}&query={query}&language=pt-BR"
-
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status() 
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch("/search/movie", {"query": query, "language": "pt-BR"})
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
             return response.Response(
                 {"error": f"Falha ao contatar API do TMDb: {e}"},
@@ -118,7 +211,7 @@ class TMDbSearchAPIView(views.APIView):
             )
         
 # --- API para o Requisito 2 (Acessar Lista Compartilhada Publicamente) ---
-class PublicSharedListAPIView(generics.RetrieveAPIView):
+class PublicSharedListAPIView(ReplicaReadMixin, generics.RetrieveAPIView):
     authentication_classes = []
     permission_classes = []
         
@@ -126,23 +219,34 @@ class PublicSharedListAPIView(generics.RetrieveAPIView):
     serializer_class = SharedListSerializer
 
     def retrieve(self, request, *args, **kwargs):
-        try:
-            shared_list_instance = self.get_object()
-
-            user_of_list = shared_list_instance.user
-                
-            favorites = UserMovieEntry.objects.filter(user=user_of_list)
-                
-            serializer = UserMovieEntrySerializer(favorites, many=True)
-                
-            return response.Response(serializer.data, status=status.HTTP_200_OK)
-                
-        except Exception:
+        # JSON já pronto do cache (ver public_lists.py); só é remontado quando o dono altera as listas
+        snapshot = public_lists.get(kwargs['pk'])
+        if snapshot is None:
             return response.Response(
                 {"error": "Lista não encontrada."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        last_modified = snapshot.version[1]
+        content = HttpResponse(snapshot.content, content_type='application/json')
+        content['ETag'] = snapshot.etag
+        content['Last-Modified'] = http_date(last_modified)
+        # O navegador guarda a cópia, mas revalida a cada visita (If-None-Match -> 304)
+        patch_cache_control(content, public=True, no_cache=True)
+        return get_conditional_response(request, snapshot.etag, int(last_modified), content)
+
+def tmdb_page_response(request, endpoint, params):
+    """Página ?page= de uma lista do TMDb (ver TMDbCache.fetch_page)."""
+    try:
+        page = parse_page(request.query_params.get('page'))
+    except ValueError as e:
+        return response.Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        data, cache_status = tmdb_cache.fetch_page(endpoint, params, page)
+        return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
+    except requests.RequestException as e:
+        return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
 #-- API para obter filmes "Popular" ---
 class TMDbPopularAPIView(views.APIView):
 
@@ -150,15 +254,7 @@ class TMDbPopularAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/popular?api_key={api_key}&language=pt-BR&page=1"
-        try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
-        except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return tmdb_page_response(request, *movie_list_request("popular"))
 
 #-- API para obter filmes "Top Rated" ---
 class TMDbNowPlayingAPIView(views.APIView):
@@ -167,15 +263,7 @@ class TMDbNowPlayingAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/now_playing?api_key={api_key}&language=pt-BR&page=1"
-        try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
-        except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return tmdb_page_response(request, *movie_list_request("now_playing"))
         
 #-- API para obter a lista de gêneros de filmes ---
 class TMDbGenreListView(views.APIView):
@@ -183,13 +271,9 @@ class TMDbGenreListView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/genre/movie/list?api_key={api_key}&language=pt-BR"
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch("/genre/movie/list", {"language": "pt-BR"})
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
             return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
@@ -199,42 +283,16 @@ class TMDbDiscoverAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        base_url = "https://api.themoviedb.org/3"
-        query_params = request.query_params.copy()
-        query = query_params.pop('query', None)
-        
-        try:
-            if query:
-                endpoint = f"/search/movie?query={query[0]}"
-            else:
-                endpoint = f"/discover/movie?"
-                endpoint += "&watch_region=BR&certification_country=BR"
-            if query_params:
-                endpoint += f"&{query_params.urlencode()}"
-
-            url = f"{base_url}{endpoint}&api_key={api_key}&language=pt-BR"
-            
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
-            
-        except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return tmdb_page_response(request, *build_discover_request(request.query_params))
 
 #-- API para obter a lista de idiomas suportados pelo TMDb ---
 class TMDbLanguagesView(views.APIView):
     authentication_classes = []
     permission_classes = []
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/configuration/languages?api_key={api_key}"
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch("/configuration/languages")
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
             return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
@@ -242,13 +300,9 @@ class TMDbWatchProvidersView(views.APIView):
     authentication_classes = []
     permission_classes = []
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/watch/providers/movie?api_key={api_key}&language=pt-BR&watch_region=BR"
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch("/watch/providers/movie", {"language": "pt-BR", "watch_region": "BR"})
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
             return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
@@ -259,16 +313,17 @@ class TMDbMovieDetailView(views.APIView):
     permission_classes = []
 
     def get(self, request, movie_id):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={api_key}&language=pt-BR&append_to_response=credits,watch/providers,release_dates"
-
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch(*movie_detail_request(movie_id))
+            # Só o que a página do filme usa (ver projections.py), opcionalmente só os campos de ?fields=
+            data = select_fields(movie_detail_projection(movie_id, data), parse_fields(request.query_params.get('fields')))
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
-            return response.Response({"error": f"Filme não encontrado ou falha na API: {e}"}, status=status.HTTP_404_NOT_FOUND)
+            # 404 só quando o TMDb diz que o filme não existe; falhas do TMDb são 503
+            error_status = upstream_status(e)
+            if error_status == status.HTTP_404_NOT_FOUND:
+                return response.Response({"error": "Filme não encontrado."}, status=error_status)
+            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=error_status)
         
 #-- API para obter filmes "Top Rated" ---
 class TMDbTopRatedAPIView(views.APIView):
@@ -276,15 +331,7 @@ class TMDbTopRatedAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/top_rated?api_key={api_key}&language=pt-BR&page=1"
-        try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
-        except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return tmdb_page_response(request, *movie_list_request("top_rated"))
 
 #-- API para obter filmes "Trending" ---
 class TMDbTrendingAPIView(views.APIView):
@@ -292,13 +339,13 @@ class TMDbTrendingAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request, time_window): 
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/trending/movie/{time_window}?api_key={api_key}&language=pt-BR"
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
+            endpoint, params = trending_request(time_window)
+        except ValueError as e:
+            return response.Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data, cache_status = tmdb_cache.fetch(endpoint, params)
+            return response.Response(data, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
             return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
@@ -308,15 +355,7 @@ class TMDbUpcomingAPIView(views.APIView):
     permission_classes = []
 
     def get(self, request):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/upcoming?api_key={api_key}&language=pt-BR&page=1"
-        try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            return response.Response(data, status=status.HTTP_200_OK)
-        except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return tmdb_page_response(request, *movie_list_request("upcoming"))
 
 #-- API para obter vídeos (trailers) de um filme específico ---
 class TMDbMovieVideosView(views.APIView):
@@ -324,24 +363,92 @@ class TMDbMovieVideosView(views.APIView):
     permission_classes = []
 
     def get(self, request, movie_id):
-        api_key = settings.TMDB_API_KEY
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}/videos?api_key={api_key}&language=pt-BR"
-        
         try:
-            tmdb_response = requests.get(url)
-            tmdb_response.raise_for_status()
-            data = tmdb_response.json()
-            official_trailer = None
-            for video in data.get('results', []):
-                if video['type'] == 'Trailer' and video['official']:
-                    official_trailer = video
-                    break
-            if not official_trailer:
-                for video in data.get('results', []):
-                    if video['type'] == 'Trailer':
-                        official_trailer = video
-                        break
-
-            return response.Response(official_trailer, status=status.HTTP_200_OK)
+            data, cache_status = tmdb_cache.fetch(*movie_videos_request(movie_id))
+            official_trailer = pick_official_trailer(data)
+            return response.Response(official_trailer, status=status.HTTP_200_OK, headers={"X-Cache": cache_status})
         except requests.RequestException as e:
-            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
\ No newline at end of file
+            return response.Response({"error": f"Falha na API do TMDb: {e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+#-- API para obter detalhes + trailer de vários filmes numa só requisição ---
+class TMDbMovieBatchView(views.APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        try:
+            movie_ids = parse_movie_ids(request.query_params.getlist('ids'), settings.TMDB_BATCH_MAX_IDS)
+        except ValueError as e:
+            return response.Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Trailers já indexados saem de uma consulta só; o resto (detalhes e vídeos) em paralelo
+        # (limitado), e ids já em cache voltam na hora
+        indexed = trailer_index.lookup(movie_ids)
+        jobs = [(movie_id, "details") for movie_id in movie_ids]
+        jobs += [(movie_id, "videos") for movie_id in movie_ids if movie_id not in indexed]
+
+        def fetch(job):
+            movie_id, part = job
+            request_for = movie_detail_request if part == "details" else movie_videos_request
+            try:
+                data, _ = tmdb_cache.fetch(*request_for(movie_id))
+                if part == "details":
+                    data = movie_detail_projection(movie_id, data)
+                return data, None
+            except requests.RequestException as e:
+                return None, e
+            finally:
+                # O catálogo pode ter aberto uma conexão nesta thread auxiliar
+                connections.close_all()
+
+        # Cada job roda numa cópia do contexto da requisição, para o Server-Timing contar as chamadas
+        contexts = [contextvars.copy_context() for _ in jobs]
+        with ThreadPoolExecutor(max_workers=min(settings.TMDB_BATCH_CONCURRENCY, len(jobs))) as executor:
+            fetched = dict(zip(jobs, executor.map(lambda context, job: context.run(fetch, job), contexts, jobs)))
+        for movie_id, trailer in indexed.items():
+            fetched[(movie_id, "videos")] = videos_document(movie_id, trailer), None
+
+        batch = build_batch_response(movie_ids, fetched)
+        http_status, headers = batch_status(batch)
+        return response.Response(batch, status=http_status, headers=headers)
+
+def metrics_authorized(request):
+    """As rotas de operação exigem Authorization: Bearer <METRICS_TOKEN>; sem METRICS_TOKEN ficam fechadas."""
+    return bool(settings.METRICS_TOKEN) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {settings.METRICS_TOKEN}"
+    )
+
+#-- Estado das chamadas ao TMDb: circuito, limite de taxa e métricas do processo ---
+class TMDbHealthView(views.APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        breaker, limiter, metrics = tmdb_client.breaker, tmdb_client.limiter, tmdb_client.metrics
+        # 503 com o circuito aberto, para health checks do balanceador
+        http_status = status.HTTP_503_SERVICE_UNAVAILABLE if breaker.state == breaker.OPEN else status.HTTP_200_OK
+        if not metrics_authorized(request):
+            # Sem o token, só o status: os detalhes mostram a configuração e o tráfego do processo
+            data = {"status": "ok" if http_status == status.HTTP_200_OK else "unavailable"}
+            return response.Response(data, status=http_status, headers={"Cache-Control": "no-store"})
+        data = {
+            "circuit": {"state": breaker.state, "consecutive_failures": breaker.failures},
+            "rate_limit": {
+                "rate": limiter.rate,
+                "shared": limiter.cache_alias is not None,
+                "paused_seconds": round(limiter.pause_remaining(), 3),
+            },
+            "counters": metrics.counters(),
+            "endpoints": metrics.snapshot(),
+        }
+        return response.Response(data, status=http_status, headers={"Cache-Control": "no-store"})
+
+#-- Métricas do processo no formato de texto do Prometheus (histogramas por rota, TMDb, cache e auth) ---
+class MetricsView(views.APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        if not metrics_authorized(request):
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,41 @@
+# Configuração do Gunicorn (usada com: gunicorn -c gunicorn.conf.py <app>)
+#
+# WSGI (padrão, workers síncronos: 1 requisição por vez por worker):
+#     gunicorn -c gunicorn.conf.py config.wsgi:application
+#
+# ASGI (workers Uvicorn: centenas de chamadas ao TMDb em espera por worker):
+#     GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker TMDB_ASYNC_VIEWS=True \
+#         gunicorn -c gunicorn.conf.py config.asgi:application
+#
+# No modo ASGI, TMDB_ASYNC_VIEWS=True troca as rotas /api/tmdb/* pelas views de
+# favorites/async_views.py. As demais rotas (DRF, banco) continuam síncronas e o
+# Django as executa em threads, então poucos workers por CPU já bastam.
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+_async_worker = worker_class != 'sync'
+# Workers síncronos: 2 x CPU + 1 (recomendação do Gunicorn). Workers ASGI: 1 por CPU.
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() if _async_worker else multiprocessing.cpu_count() * 2 + 1,
+))
+
+# Uma chamada lenta ao TMDb não pode prender o worker além do timeout do cliente (TMDB_READ_TIMEOUT)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla os workers periodicamente (com jitter, para não reiniciarem todos juntos)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = 500
+
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    # Baixa as chaves públicas do Firebase antes da primeira requisição autenticada do worker
+    from favorites.auth import prewarm_public_keys
+    prewarm_public_keys()